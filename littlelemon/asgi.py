@@ -12,5 +12,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'littlelemon.settings')
+# Serves the read-heavy API views with their async versions (settings.ASYNC_READ_VIEWS), set it to 0 to keep the sync ones
+os.environ.setdefault('LITTLELEMON_ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Builds the in-memory menu search index and suggestions before the first request
+from restaurant.search import warm_search_index  # noqa: E402
+
+warm_search_index()
+
+# Closes past bookings every BOOKING_STATUS_INTERVAL seconds, when it's set
+from restaurant.booking_status import start_booking_status_updater  # noqa: E402
+
+start_booking_status_updater()
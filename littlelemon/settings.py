@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from django.contrib.messages import constants as messages
 
@@ -83,6 +84,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'littlelemon.wsgi.application'
 
+# Serve the read-heavy API views (menu, categories, category, search, current reservations) with their async versions,
+# see restaurant/async_views.py. littlelemon/asgi.py turns this on, WSGI servers (and runserver) keep the sync views
+ASYNC_READ_VIEWS = os.environ.get('LITTLELEMON_ASYNC_READ_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -102,6 +107,106 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# LocMemCache is per process. When running several workers, switch to a shared backend
+# (e.g. 'django.core.cache.backends.redis.RedisCache') so cache invalidation reaches every worker
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'littlelemon',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Menu table change counters, see restaurant/menu_cache.py. Every process compares its search index and menu
+    # snapshots against them, so they must be shared between workers and never evicted: set LITTLELEMON_REDIS_URL to keep
+    # them in Redis (configured with maxmemory-policy noeviction), otherwise they're kept per process and never culled
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['LITTLELEMON_REDIS_URL'],
+        'KEY_PREFIX': 'versions',
+        'TIMEOUT': None,
+    } if os.environ.get('LITTLELEMON_REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'littlelemon-versions',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2 ** 31,
+        },
+    },
+    # Deny-list of revoked access tokens, see restaurant/access_tokens.py. A revocation must reach every worker and an
+    # entry must never be evicted before it expires, or a revoked token works again: set LITTLELEMON_REDIS_URL to keep it
+    # in Redis (with maxmemory-policy noeviction), otherwise it's kept per process and never culled
+    'access-deny': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['LITTLELEMON_REDIS_URL'],
+        'KEY_PREFIX': 'access-deny',
+    } if os.environ.get('LITTLELEMON_REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'littlelemon-access-deny',
+        'OPTIONS': {
+            'MAX_ENTRIES': 2 ** 31,
+        },
+    },
+}
+
+# Cache holding the menu table change counters, see restaurant/menu_cache.py
+TABLE_VERSION_CACHE = 'versions'
+
+# Cache holding the access token deny-list, see restaurant/access_tokens.py
+ACCESS_DENY_CACHE = 'access-deny'
+
+# Cache holding the request throttling counters, see restaurant/throttles.py
+# Point it at a shared cache (e.g. Redis) when running several workers, or each worker allows the full rate
+THROTTLE_CACHE = 'default'
+
+# Seconds a user's group names (roles) are kept in the cache, see restaurant/roles.py
+ROLES_CACHE_TIMEOUT = 60 * 15
+
+# Seconds an API token is valid for after it's issued, see restaurant/authentication.py
+AUTH_TOKEN_TTL = 60 * 60 * 24 * 7
+
+# Seconds a signed access token from /restaurant/api/token/refresh is valid for, see restaurant/access_tokens.py
+# Role changes reach them through a deny-list, but keep it short
+ACCESS_TOKEN_TTL = 60 * 5
+
+# In-process cache of API tokens and their users, entries are kept for AUTH_TOKEN_CACHE_TTL seconds, see restaurant/token_cache.py
+# Other workers only see a revoked token or a role change once their entry expires, so keep it short
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60
+
+# Seconds a cached menu snapshot is kept, snapshots are also replaced whenever the menu changes, see restaurant/menu_cache.py
+MENU_CACHE_TIMEOUT = 60 * 60
+
+# Minutes stock stays held for items in an untouched cart, see restaurant/inventory.py
+INVENTORY_HOLD_MINUTES = 15
+
+# Shift analytics, see restaurant/shifts.py
+# Pay periods are PAY_PERIOD_DAYS long and one of them starts on PAY_PERIOD_START
+PAY_PERIOD_START = '2024-01-01'
+PAY_PERIOD_DAYS = 14
+# Hours after which a day or a week counts as overtime, pay periods use the weekly limit per week
+OVERTIME_DAILY_HOURS = 8
+OVERTIME_WEEKLY_HOURS = 40
+
+# Length of a reservation slot in minutes, each location seats Location.seats guests per slot, see restaurant/capacity.py
+BOOKING_SLOT_MINUTES = 60
+
+# Seconds a day of booking availability is kept, days are also replaced whenever one of their slots is booked, see restaurant/availability.py
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds between runs of the in-process job that marks past bookings completed/missed, see restaurant/booking_status.py
+# None turns it off, run python manage.py close_past_bookings from cron instead
+BOOKING_STATUS_INTERVAL = 5 * 60
+
+# Order status events (server-sent events at /restaurant/api/orders/events), see restaurant/order_events.py
+# Seconds between keep-alive comments on an idle stream, and events kept for a client that falls behind
+ORDER_EVENTS_KEEPALIVE = 15
+ORDER_EVENTS_QUEUE_SIZE = 100
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -146,7 +251,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication', # Can remove when going into production
-        'rest_framework.authentication.TokenAuthentication',
+        'restaurant.authentication.CachedTokenAuthentication', # TokenAuthentication with expiring tokens and an in-process cache
+        'restaurant.authentication.AccessTokenAuthentication', # Short-lived signed "Bearer" tokens, checked without database access
     ],
     
     'DEFAULT_RENDERER_CLASSES': [
@@ -160,15 +266,32 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ],
     
+    # Views pick their scopes with @throttle_classes / @throttle_view, these apply to the rest (djoser, /restaurant/api/token)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'restaurant.throttles.DefaultRateThrottle',
+        'restaurant.throttles.AuthRateThrottle',
+    ],
+    
+    # Requests per user (or per IP address for anonymous users) in each scope, see restaurant/throttles.py
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '5/minute',
-        'user': '5/minute',
+        'default': '60/minute',
+        'menu': '120/minute',
+        'search': '30/minute',
+        'suggest': '120/minute',
+        'cart': '30/minute',
+        'orders': '5/minute',
+        'auth': '10/minute',
+        'staff': '120/minute',
     },
     
 }
 
 DJOSER = {
     "USER_ID_FIELD" : "username",
+    # Replaces expired tokens on token/login, see restaurant/authentication.py
+    "SERIALIZERS": {
+        "token_create": "restaurant.serializers.TokenCreateSerializer",
+    },
 }
 
 # Redirects to login page for unauthenticated users trying to access something that needs authentication
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'littlelemon.settings')
 
 application = get_wsgi_application()
+
+# Builds the in-memory menu search index and suggestions before the first request
+from restaurant.search import warm_search_index  # noqa: E402
+
+warm_search_index()
+
+# Closes past bookings every BOOKING_STATUS_INTERVAL seconds, when it's set
+from restaurant.booking_status import start_booking_status_updater  # noqa: E402
+
+start_booking_status_updater()
@@ -0,0 +1,87 @@
+import secrets
+import time
+from datetime import datetime, timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+
+# Short-lived signed access tokens, sent as "Authorization: Bearer <token>" (see authentication.py)
+# The token carries the user id, username, superuser/staff flags and roles, signed with HMAC using SECRET_KEY
+# (django.core.signing), so checking it needs no Token, User or group query. They're issued by
+# POST /restaurant/api/token/refresh in exchange for the regular API token and expire after ACCESS_TOKEN_TTL seconds.
+# Because the roles are baked in, revocation goes through a deny-list in the ACCESS_DENY_CACHE cache: a single token
+# (by its id), or every token a user was issued before a point in time (logout, password change, token rotation,
+# deactivation, group changes). Entries only need to outlive the tokens they deny, so they're kept for ACCESS_TOKEN_TTL
+# seconds. The cache must be shared by every worker and must not evict entries early, see CACHES in settings.py.
+ACCESS_TOKEN_TTL = getattr(settings, 'ACCESS_TOKEN_TTL', 60 * 5)
+ACCESS_DENY_CACHE = getattr(settings, 'ACCESS_DENY_CACHE', 'default')
+ACCESS_TOKEN_SALT = 'restaurant.access_token'
+
+
+class AccessTokenError(Exception):
+    pass
+
+
+def denied_token_key(token_id):
+    return f'restaurant:access-denied:{token_id}'
+
+
+def denied_user_key(user_id):
+    return f'restaurant:access-denied-user:{user_id}'
+
+
+# Returns a new access token for the user and the time it expires
+def issue_access_token(user, roles):
+    issued = time.time()
+    payload = {
+        'uid': user.pk,
+        'usr': user.get_username(),
+        'su': user.is_superuser,
+        'st': user.is_staff,
+        'roles': sorted(roles),
+        'jti': secrets.token_urlsafe(8),
+        'iat': issued,
+    }
+    expires = datetime.fromtimestamp(issued + ACCESS_TOKEN_TTL, tz=timezone.utc)
+    return signing.dumps(payload, salt=ACCESS_TOKEN_SALT, compress=True), expires
+
+
+# Checks the signature, expiry and deny-list, returns the token's payload or raises AccessTokenError
+def read_access_token(token):
+    try:
+        payload = signing.loads(token, salt=ACCESS_TOKEN_SALT, max_age=ACCESS_TOKEN_TTL)
+    except signing.SignatureExpired:
+        raise AccessTokenError('Access token has expired.')
+    except signing.BadSignature:
+        raise AccessTokenError('Invalid access token.')
+
+    token_key, user_key = denied_token_key(payload['jti']), denied_user_key(payload['uid'])
+    denied = caches[ACCESS_DENY_CACHE].get_many([token_key, user_key])
+    if token_key in denied or payload['iat'] <= denied.get(user_key, 0):
+        raise AccessTokenError('Access token has been revoked.')
+    return payload
+
+
+# Builds the request user from a token's payload, an unsaved User instance whose roles are already loaded
+# It works in queries (filter(user=request.user)) and permission checks, but only has the fields in the token
+def access_token_user(payload):
+    User = get_user_model()
+    user = User(pk=payload['uid'], is_superuser=payload['su'], is_staff=payload['st'], is_active=True)
+    setattr(user, User.USERNAME_FIELD, payload['usr'])
+    user._state.adding = False
+    user._state.db = 'default'
+    user._roles = frozenset(payload['roles'])
+    return user
+
+
+def revoke_access_token(payload):
+    caches[ACCESS_DENY_CACHE].set(denied_token_key(payload['jti']), True, ACCESS_TOKEN_TTL)
+
+
+# Denies every access token issued to the users so far, once the surrounding transaction commits
+def revoke_user_access_tokens(user_ids):
+    keys = [denied_user_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: caches[ACCESS_DENY_CACHE].set_many(dict.fromkeys(keys, time.time()), ACCESS_TOKEN_TTL))
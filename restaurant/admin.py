@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Logger, UserComments, Category, MenuItem, Booking, Cart, Order, OrderItem
+from .models import CustomUser, Logger, UserComments, Category, MenuItem, Booking, Location, Cart, Order, OrderItem
 
 # Register your models here.
 @admin.register(CustomUser)
@@ -22,4 +22,5 @@ admin.site.register(MenuItem)
 admin.site.register(Cart)
 admin.site.register(Order)
 admin.site.register(OrderItem)
-admin.site.register(Booking)
\ No newline at end of file
+admin.site.register(Booking)
+admin.site.register(Location)
\ No newline at end of file
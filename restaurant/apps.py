@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RestaurantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurant'
+
+    # Connects the signal handlers in signals.py
+    def ready(self):
+        from . import signals
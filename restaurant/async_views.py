@@ -0,0 +1,269 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, PermissionDenied, Throttled
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+from . import views
+from .models import Category, MenuItem, Booking, Order
+from .menu_cache import MENU_CACHE_TIMEOUT, MENUITEM_TABLE, CATEGORY_TABLE, menu_snapshot_key, table_conditions
+from .pagination import IdCursorPagination, BookingCursorPagination
+from .permissions import IsAdminOrEmployeeButNotDeliveryCrew
+from .search import asearch_menu
+from .serializers import CategorySerializer, MenuItemSerializer, BookingSerializer
+from .throttles import DefaultRateThrottle, MenuRateThrottle, SearchRateThrottle, StaffRateThrottle
+from .order_events import ORDER_EVENTS_KEEPALIVE, STAFF_CHANNEL, order_events, order_channels, order_event, format_event
+
+# Async versions of the read-heavy API views, used when the app is served through ASGI (see littlelemon/asgi.py and urls.py)
+# GET and HEAD requests are handled here with the async ORM (aget, async for), so a worker can keep many of them in
+# flight while it waits on the database. Any other method goes to the sync view in views.py.
+# DRF has no async function views, so authentication, permissions and throttling use the same DRF classes as the
+# sync views, run together in one trip to a worker thread (check_request), and responses are always JSON.
+# Benchmark against the WSGI views with: python manage.py benchmark_read_views
+
+
+# Serves GET and HEAD with the decorated async view, every other method with the sync DRF view in a worker thread
+# (which also answers 405 for methods neither allows). DRF views are CSRF exempt and SessionAuthentication checks it itself
+def async_reads(sync_view):
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Renders a DRF Response as JSON without going through APIView
+def render_response(response):
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = 'application/json'
+    response.renderer_context = {}
+    return response.render()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return render_response(Response(data, status=status))
+
+
+# Same response DRF's APIView.handle_exception gives: 401 with WWW-Authenticate when the first authentication
+# class has a header for it, otherwise 403, and Retry-After for throttled requests
+def error_response(request, exc):
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        auth_header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    return render_response(exception_handler(exc, {'request': request, 'view': None}))
+
+
+# Authenticates the request and applies the permission and throttle classes, in the same order as APIView.initial
+# Returns (DRF request, None), or (DRF request, error response) when the request is refused
+def _check_request(request, permission_classes, throttle_classes):
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        request.user
+        for permission_class in permission_classes:
+            if not permission_class().has_permission(request, None):
+                if request.authenticators and not request.successful_authenticator:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+        for throttle_class in throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, None):
+                raise Throttled(throttle.wait())
+    except APIException as exc:
+        return request, error_response(request, exc)
+    return request, None
+
+
+# Token lookups, sessions, roles and throttle counters are sync (cache and ORM) calls, so they run in a worker thread
+async def check_request(request, permission_classes, throttle_classes):
+    return await sync_to_async(_check_request)(request, permission_classes, throttle_classes)
+
+
+# Allows anyone to view the menu
+    # GET: Displays menu, 200
+# Endpoint: /restaurant/api/menu
+# View type: Function based, async api
+@async_reads(views.menu_api_view)
+@vary_on_headers('Accept')
+async def menu_api_view(request):
+    request, error = await check_request(request, [AllowAny], [MenuRateThrottle])
+    if error is not None:
+        return error
+    return await menu_page(request)
+
+
+# ETag and Last-Modified are checked only once the request has been let through, so a 304 can't skip the throttle
+@condition(*table_conditions(MENUITEM_TABLE))
+async def menu_page(request):
+    # Shares the menu snapshots of the sync view (see menu_cache.py), the counters are read from the event loop like @condition does
+    key = menu_snapshot_key('json', request)
+    content = await cache.aget(key)
+    if content is None:
+        paginator = IdCursorPagination()
+        page = await paginator.apaginate_queryset(MenuItem.objects.all(), request)
+        serializer = MenuItemSerializer(page, many=True, context={'request': request})
+        content = JSONRenderer().render(paginator.get_paginated_response(serializer.data).data)
+        await cache.aset(key, content, MENU_CACHE_TIMEOUT)
+    return HttpResponse(content, content_type='application/json')
+
+
+# Allows anyone to view categories
+    # GET: Displays categories, 200
+# Endpoint: /restaurant/api/categories
+# View type: Function based, async api
+@async_reads(views.categories_api_view)
+@vary_on_headers('Accept')
+async def categories_api_view(request):
+    request, error = await check_request(request, [AllowAny], [MenuRateThrottle])
+    if error is not None:
+        return error
+    return await categories_page(request)
+
+
+# Only reached once check_request let the request through, see menu_page
+@condition(*table_conditions(CATEGORY_TABLE))
+async def categories_page(request):
+    categories = [category async for category in Category.objects.all()]
+    serializer = CategorySerializer(categories, many=True, context={'request': request})
+    return json_response(serializer.data)
+
+
+# Allows anyone to view the items in each category
+    # GET: Displays items in category, 200
+# Endpoint: /restaurant/api/category
+# View type: Function based, async api
+@async_reads(views.category_details_api_view)
+@vary_on_headers('Accept')
+async def category_details_api_view(request):
+    request, error = await check_request(request, [AllowAny], [MenuRateThrottle])
+    if error is not None:
+        return error
+    return await category_details_page(request)
+
+
+# Only reached once check_request let the request through, see menu_page
+@condition(*table_conditions(CATEGORY_TABLE, MENUITEM_TABLE))
+async def category_details_page(request):
+    category_slug = request.GET.get('slug')
+    if not category_slug:
+        return json_response({"message": "Category slug is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        category = await Category.objects.aget(slug=category_slug)
+    except Category.DoesNotExist:
+        return json_response({"message": "Category not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    menu_items = [menu_item async for menu_item in MenuItem.objects.filter(category=category)]
+    category_serializer = CategorySerializer(category, context={'request': request})
+    menu_item_serializer = MenuItemSerializer(menu_items, many=True, context={'request': request})
+
+    return json_response({
+        "category": category_serializer.data,
+        "menu_items": menu_item_serializer.data
+    })
+
+
+# Allows anyone to search for titles from MenuItem and Category
+    # GET: Displays search results, 200
+# Endpoint: /restaurant/api/search
+# View Type: Function based, async api
+@async_reads(views.search_api_view)
+async def search_api_view(request):
+    request, error = await check_request(request, [AllowAny], [SearchRateThrottle])
+    if error is not None:
+        return error
+
+    query = request.GET.get('search')
+    if not query:
+        return json_response({"detail": "Search query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    menuitem_results, category_results = await asearch_menu(query)
+
+    menuitem_serializer = MenuItemSerializer(menuitem_results, many=True, context={'request': request})
+    category_serializer = CategorySerializer(category_results, many=True, context={'request': request})
+
+    return json_response({
+        'menu_items': menuitem_serializer.data,
+        'categories': category_serializer.data
+    })
+
+
+# Allows only Admin or Employees (excluding Delivery Crew) to view current reservations that have been made
+    # GET: Displays currently booked reservations, 200
+# Endpoint: /restaurant/api/reservations
+# View type: Function based, async api
+@async_reads(views.reservations_api_view)
+async def reservations_api_view(request):
+    request, error = await check_request(request, [IsAuthenticated, IsAdminOrEmployeeButNotDeliveryCrew], [StaffRateThrottle])
+    if error is not None:
+        return error
+
+    # The location is serialized with each booking, and can't be lazy loaded in async code
+    bookings = Booking.objects.filter(reservation_status='current').select_related('location')
+    paginator = BookingCursorPagination()
+    page = await paginator.apaginate_queryset(bookings, request)
+    if not page and not paginator.has_previous:
+        return json_response({"message": "No current reservations."})
+    serializer = BookingSerializer(page, many=True, context={'request': request})
+    return json_response(paginator.get_paginated_response(serializer.data).data)
+
+
+# Streams order status events to the authenticated user as server-sent events, see order_events.py
+# Customers get their own orders, Delivery Crew the orders assigned to them, Admin and Employees every order
+    # GET: Opens a text/event-stream, starting with the current status of the user's undelivered orders, 200
+    # Each "order" event's data is {order_id, order_status, ready_for_delivery, delivery_crew}, a comment is sent every
+    # ORDER_EVENTS_KEEPALIVE seconds so proxies keep the connection open. Only served through ASGI, 501 under WSGI
+# Endpoint: /restaurant/api/orders/events
+# View type: Function based, async api
+async def order_events_api_view(request):
+    if not isinstance(request, ASGIRequest):
+        return json_response({"detail": "Order events are only served by the ASGI application."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    if request.method != 'GET':
+        return json_response({"detail": f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    request, error = await check_request(request, [IsAuthenticated], [DefaultRateThrottle])
+    if error is not None:
+        return error
+
+    user = request.user
+    channels = await sync_to_async(order_channels)(user)
+    # Same orders as the channels: every undelivered order for staff, otherwise the user's own and assigned ones
+    open_orders = Order.objects.filter(order_status=False).select_related('delivery_crew').order_by('-id')
+    if STAFF_CHANNEL not in channels:
+        open_orders = open_orders.filter(Q(user=user) | Q(delivery_crew=user))
+    # Subscribed before reading the snapshot, so an update made in between isn't missed
+    subscription = order_events.subscribe(channels)
+
+    async def stream():
+        try:
+            # The whole snapshot, however many orders are open, streamed in chunks rather than loaded at once
+            async for order in open_orders.aiterator():
+                yield format_event(order_event(order))
+            while True:
+                event = await subscription.get(ORDER_EVENTS_KEEPALIVE)
+                yield format_event(event) if event is not None else ': keep-alive\n\n'
+        finally:
+            order_events.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
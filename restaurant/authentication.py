@@ -0,0 +1,111 @@
+import copy
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from .access_tokens import AccessTokenError, read_access_token, access_token_user
+from .roles import load_roles
+from .token_cache import token_cache
+
+User = get_user_model()
+
+# API tokens (rest_framework.authtoken) that expire AUTH_TOKEN_TTL seconds after they're created
+# An expired token is replaced by a new one the next time the user logs in (/restaurant/api/token, djoser's token/login),
+# and POST /restaurant/api/token/rotate swaps a valid token for a new one. Tokens are deleted on logout and on
+# password change (see signals.py), which also drops them from the token cache.
+AUTH_TOKEN_TTL = getattr(settings, 'AUTH_TOKEN_TTL', 60 * 60 * 24 * 7)
+
+
+def token_expires_at(created):
+    return created + timedelta(seconds=AUTH_TOKEN_TTL)
+
+
+def is_token_expired(created):
+    return token_expires_at(created) <= timezone.now()
+
+
+# Returns the user's token, replacing it with a new one if it has expired
+def get_valid_token(user):
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and is_token_expired(token.created):
+        token = rotate_token(user)
+    return token
+
+
+# Deletes the user's token and returns a new one
+def rotate_token(user):
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        return Token.objects.create(user=user)
+
+
+# Drops tokens from the token cache once the transaction that deleted them commits
+def forget_tokens(keys):
+    transaction.on_commit(lambda: token_cache.forget_tokens(keys))
+
+
+# Token authentication backed by the in-process token cache (see token_cache.py)
+# Same "Authorization: Token <key>" header as rest_framework's TokenAuthentication, but a cached token needs
+# no Token + User query and its user comes with their roles already loaded, and tokens expire
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        entry = token_cache.get_token(key)
+        if entry is None:
+            token = Token.objects.select_related('user').filter(key=key).first()
+            if token is None:
+                raise AuthenticationFailed('Invalid token.')
+            user_id, created = token.user_id, token.created
+            token_cache.set_token(key, user_id, created)
+            token_cache.set_user(token.user, load_roles(token.user))
+        else:
+            user_id, created = entry
+
+        if is_token_expired(created):
+            raise AuthenticationFailed('Token has expired.')
+
+        cached_user = token_cache.get_user(user_id)
+        if cached_user is None:
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                token_cache.forget_tokens([key])
+                raise AuthenticationFailed('Invalid token.')
+            cached_user = (user, load_roles(user))
+            token_cache.set_user(*cached_user)
+
+        user, roles = cached_user
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        # Each request gets its own copy, views and get_roles() set attributes on request.user
+        user = copy.copy(user)
+        user._roles = roles
+        return (user, key)
+
+
+# Authentication with the signed access tokens from access_tokens.py, "Authorization: Bearer <token>"
+# Verifying the token is an HMAC check and one cache lookup for the deny-list, there's no database access,
+# request.auth is the token's payload
+class AccessTokenAuthentication(BaseAuthentication):
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid access token header.')
+
+        try:
+            payload = read_access_token(auth[1].decode())
+        except UnicodeError:
+            raise AuthenticationFailed('Invalid access token.')
+        except AccessTokenError as e:
+            raise AuthenticationFailed(str(e))
+        return (access_token_user(payload), payload)
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,64 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import SlotOccupancy
+from .menu_cache import get_table_versions
+from .capacity import day_slots, occupancy_table
+
+# Availability calendar: every bookable slot in a date range with the seats it has left
+# The slots come from BUSINESS_HOURS and the guests already booked from the SlotOccupancy counters (see capacity.py),
+# which hold one row per booked slot, so a day is a handful of rows rather than a scan over its bookings.
+# Each day's booked guests are cached under that day's occupancy counter, so a booking only makes its own day stale,
+# and a month of availability is two cache round trips (counters, days) when nothing changed.
+# Remaining seats are worked out from Location.seats on every request, so changing a location's seats needs no invalidation.
+AVAILABILITY_CACHE_TIMEOUT = getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Longest date range one request can cover
+MAX_AVAILABILITY_DAYS = 62
+
+
+def _day_bounds(first_day, last_day):
+    start = timezone.make_aware(datetime.combine(first_day, time()))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time()))
+    return start, end
+
+
+# Returns {day: {slot: guests booked}} for the given days, read from the cache or, for the days that aren't cached,
+# from one query over SlotOccupancy that's then cached per day
+def booked_guests(location, days):
+    tables = {day: occupancy_table(location.id, day) for day in days}
+    versions = get_table_versions(*tables.values())
+    keys = {day: f'restaurant:availability:{location.id}:{day.isoformat()}:{versions[tables[day]][0]}' for day in days}
+    cached = cache.get_many(list(keys.values()))
+
+    booked = {day: cached[keys[day]] for day in days if keys[day] in cached}
+    missing = [day for day in days if day not in booked]
+    if missing:
+        fetched = {day: {} for day in missing}
+        start, end = _day_bounds(missing[0], missing[-1])
+        for slot, guests in SlotOccupancy.objects.filter(location=location, slot__gte=start, slot__lt=end, guests__gt=0).values_list('slot', 'guests'):
+            day = timezone.localtime(slot).date()
+            if day in fetched:
+                fetched[day][slot] = guests
+        cache.set_many({keys[day]: guests for day, guests in fetched.items()}, AVAILABILITY_CACHE_TIMEOUT)
+        booked.update(fetched)
+    return booked
+
+
+# Returns [{'date', 'slots': [{'slot', 'remaining'}]}] for every day from first_day to last_day (inclusive)
+# Slots that have already started are left out
+def availability(location, first_day, last_day):
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    booked = booked_guests(location, days)
+    now = timezone.now()
+    return [
+        {
+            'date': day,
+            'slots': [
+                {'slot': slot, 'remaining': max(location.seats - booked[day].get(slot, 0), 0)}
+                for slot in day_slots(day) if slot > now
+            ],
+        }
+        for day in days
+    ]
@@ -0,0 +1,51 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Booking
+from .capacity import SLOT_LENGTH, WAITLISTED
+
+# Moves bookings whose slot is over out of 'current', so the current reservations only hold today's and future bookings
+# Current bookings become 'completed' and waitlisted ones that never got a seat become 'missed'. Both are single
+# UPDATE ... WHERE reservation_status = ... AND booking_date < ... statements on the (reservation_status, booking_date)
+# index, and neither changes the seats held in the slot occupancy counters (see capacity.py).
+# Run it from cron with python manage.py close_past_bookings, or let each server process run it every
+# BOOKING_STATUS_INTERVAL seconds (see littlelemon/wsgi.py and asgi.py). Running it twice at once is harmless.
+BOOKING_STATUS_INTERVAL = getattr(settings, 'BOOKING_STATUS_INTERVAL', None)
+
+logger = logging.getLogger(__name__)
+
+_updater = None
+
+
+# Returns {'completed': n, 'missed': n}, the number of bookings moved to each status
+def close_past_bookings(now=None):
+    cutoff = (now or timezone.now()) - SLOT_LENGTH
+    with transaction.atomic():
+        completed = Booking.objects.filter(reservation_status='current', booking_date__lt=cutoff).update(reservation_status='completed')
+        missed = Booking.objects.filter(reservation_status=WAITLISTED, booking_date__lt=cutoff).update(reservation_status='missed')
+    return {'completed': completed, 'missed': missed}
+
+
+# Starts a daemon thread running close_past_bookings every interval seconds, once per process
+def start_booking_status_updater(interval=BOOKING_STATUS_INTERVAL):
+    global _updater
+    if not interval or _updater is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                close_past_bookings()
+            except Exception:
+                # Logged and tried again on the next run, an error must not stop the thread
+                logger.exception('Closing past bookings failed')
+            finally:
+                # The thread's connection would otherwise stay open between runs
+                connection.close()
+
+    _updater = threading.Thread(target=run, name='booking-status-updater', daemon=True)
+    _updater.start()
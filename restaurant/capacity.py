@@ -0,0 +1,184 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import Booking, Location, SlotOccupancy
+from .menu_cache import invalidate_table
+
+# Reservation capacity
+# Bookings are grouped into BOOKING_SLOT_MINUTES long slots and each location seats Location.seats guests per slot.
+# SlotOccupancy keeps the number of guests booked per (location, slot). It's changed in the same transaction as
+# the booking (see Booking.save and the booking signals), and seats are taken with one conditional
+# UPDATE ... SET guests = guests + n WHERE guests <= seats - n on that row, so checking capacity never counts bookings
+# and two requests can't both get the last seats. Waitlisted (and missed) bookings don't hold seats, waitlisted ones are
+# moved to 'current' in the order they were made when seats in their slot free up.
+BOOKING_SLOT_MINUTES = getattr(settings, 'BOOKING_SLOT_MINUTES', 60)
+SLOT_LENGTH = timedelta(minutes=BOOKING_SLOT_MINUTES)
+
+WAITLISTED = 'waitlisted'
+# Bookings with these statuses hold seats in their slot
+HOLDING_STATUSES = ('current', 'completed')
+
+# How far ahead next_available_slots looks
+NEXT_AVAILABLE_DAYS = 30
+
+# Business hours dictionary with days as keys and tuples of open and close hours as values
+BUSINESS_HOURS = {
+    0: (11, 21), # Monday
+    1: (11, 21), # Tuesday
+    2: (11, 21), # Wednesday
+    3: (11, 21), # Thursday
+    4: (11, 21), # Friday
+    5: (11, 22), # Saturday
+    6: (12, 20) # Sunday
+}
+
+
+# Raised when a slot doesn't have enough seats left for a booking
+class SlotFullError(Exception):
+    def __init__(self, slot, remaining):
+        self.slot = slot
+        self.remaining = remaining
+        super().__init__(f"Only {remaining} seat(s) left at {slot:%Y-%m-%d %H:%M}.")
+
+
+# Bookings can be made during business hours, up to an hour before closing
+def is_bookable(moment):
+    open_hour, close_hour = BUSINESS_HOURS[moment.weekday()]
+    return open_hour <= moment.hour < close_hour - 1
+
+
+# Slots are laid out every BOOKING_SLOT_MINUTES from the day's opening hour, the same grid for booking and availability
+def _first_slot(day):
+    open_hour, _ = BUSINESS_HOURS[day.weekday()]
+    return timezone.make_aware(datetime.combine(day, time(open_hour)))
+
+
+# Returns the start of the slot a booking time falls in, in the current time zone
+def slot_start(moment):
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment)
+    else:
+        moment = timezone.make_aware(moment)
+    first = _first_slot(moment.date())
+    return first + SLOT_LENGTH * ((moment - first) // SLOT_LENGTH)
+
+
+# Returns the start of every bookable slot on the given day
+def day_slots(day):
+    open_hour, close_hour = BUSINESS_HOURS[day.weekday()]
+    first = _first_slot(day)
+    count = (close_hour - 1 - open_hour) * 60 // BOOKING_SLOT_MINUTES
+    return [first + SLOT_LENGTH * i for i in range(count)]
+
+
+# Location used by bookings that don't name one
+def default_location_id():
+    return Location.objects.order_by('id').values_list('id', flat=True).first()
+
+
+# Each location's day has its own change counter (see menu_cache.py), bumped whenever a slot's occupancy changes,
+# so the cached availability of other days stays valid, see availability.py
+def occupancy_table(location_id, day):
+    return f'occupancy:{location_id}:{day.isoformat()}'
+
+
+def _occupancy_changed(location_id, slot):
+    invalidate_table(occupancy_table(location_id, slot.date()))
+
+
+# Takes seats in a slot, raises SlotFullError if there aren't enough left
+def take_seats(location_id, slot, guests):
+    seats = Location.objects.filter(pk=location_id).values_list('seats', flat=True).first() or 0
+    SlotOccupancy.objects.bulk_create([SlotOccupancy(location_id=location_id, slot=slot)], ignore_conflicts=True)
+    updated = SlotOccupancy.objects.filter(location_id=location_id, slot=slot, guests__lte=seats - guests).update(guests=F('guests') + guests)
+    if not updated:
+        booked = SlotOccupancy.objects.filter(location_id=location_id, slot=slot).values_list('guests', flat=True).first() or 0
+        raise SlotFullError(slot, max(seats - booked, 0))
+    _occupancy_changed(location_id, slot)
+
+
+def release_seats(location_id, slot, guests):
+    SlotOccupancy.objects.filter(location_id=location_id, slot=slot).update(guests=F('guests') - guests)
+    _occupancy_changed(location_id, slot)
+
+
+# Moves waitlisted bookings in a slot to 'current', oldest first, as long as their party still fits
+def promote_waitlist(location_id, slot):
+    waiting = Booking.objects.filter(
+        location_id=location_id, reservation_status=WAITLISTED, booking_date__gte=slot, booking_date__lt=slot + SLOT_LENGTH
+    ).order_by('id').values_list('id', 'no_of_guests')
+    for booking_id, guests in waiting:
+        try:
+            take_seats(location_id, slot, guests)
+        except SlotFullError:
+            continue
+        # A queryset update, so the booking doesn't go through the pre_save signal and take its seats twice
+        Booking.objects.filter(pk=booking_id).update(reservation_status='current')
+
+
+# (location, slot, guests) held by a booking, None for bookings that don't hold seats
+# A booking marked missed gives its seats back, so walk-ins or the waitlist can have them
+def _held_seats(location_id, booking_date, guests, reservation_status):
+    if location_id is None or reservation_status not in HOLDING_STATUSES:
+        return None
+    return location_id, slot_start(booking_date), guests
+
+
+# Brings the occupancy counters in line with a booking that's about to be saved, called from the Booking pre_save signal
+# Raises SlotFullError (and the booking isn't saved) when its slot can't seat it
+# Moving a booking, or changing its party size, gives back the seats it held before taking the new ones
+def update_occupancy(booking):
+    if booking.location_id is None:
+        booking.location_id = default_location_id()
+
+    old = None
+    if booking.pk:
+        previous = Booking.objects.select_for_update().filter(pk=booking.pk).values_list(
+            'location_id', 'booking_date', 'no_of_guests', 'reservation_status'
+        ).first()
+        old = _held_seats(*previous) if previous else None
+    new = _held_seats(booking.location_id, booking.booking_date, booking.no_of_guests, booking.reservation_status)
+
+    # Status changes between current and completed keep the same seats
+    if old == new:
+        return
+    if old:
+        release_seats(*old)
+    if new:
+        take_seats(*new)
+    if old:
+        promote_waitlist(*old[:2])
+
+
+# Gives back the seats of a deleted booking, called from the Booking post_delete signal
+def release_booking(booking):
+    held = _held_seats(booking.location_id, booking.booking_date, booking.no_of_guests, booking.reservation_status)
+    if held:
+        release_seats(*held)
+        promote_waitlist(*held[:2])
+
+
+# Returns the next bookable slots with room for the party, soonest first: [{'slot', 'location', 'remaining'}]
+# Reads the occupancy of the next NEXT_AVAILABLE_DAYS with one query, slots nobody booked have every seat left
+def next_available_slots(guests, location=None, after=None, limit=5):
+    location = location or Location.objects.order_by('id').first()
+    if location is None:
+        return []
+    after = after or timezone.now()
+    first_day = timezone.localtime(after).date() if timezone.is_aware(after) else after.date()
+    days = [first_day + timedelta(days=i) for i in range(NEXT_AVAILABLE_DAYS)]
+
+    booked = dict(SlotOccupancy.objects.filter(
+        location=location, slot__gte=slot_start(after), slot__lt=timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time()))
+    ).values_list('slot', 'guests'))
+
+    available = []
+    for day in days:
+        for slot in day_slots(day):
+            remaining = location.seats - booked.get(slot, 0)
+            if slot >= after and remaining >= guests:
+                available.append({'slot': slot, 'location': location.slug, 'remaining': remaining})
+                if len(available) == limit:
+                    return available
+    return available
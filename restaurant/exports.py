@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from itertools import groupby
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from .models import Logger, UserComments, Booking, OrderItem
+
+# Streaming data exports for managers, as CSV or NDJSON (one JSON object per line)
+# Rows are read with values_list(...).iterator(chunk_size=...) and written out a chunk at a time, so no model instances
+# or serializers are built, memory use doesn't grow with the size of the export, and the header goes out straight away
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+ORDER_COLUMNS = [
+    ('order_id', 'order_id'),
+    ('username', 'order__user__username'),
+    ('delivery_crew', 'order__delivery_crew__username'),
+    ('date', 'order__time'),
+    ('delivered', 'order__order_status'),
+    ('ready_for_delivery', 'order__ready_for_delivery'),
+    ('subtotal', 'order__subtotal'),
+    ('tax', 'order__tax'),
+    ('total', 'order__total'),
+]
+ORDER_ITEM_COLUMNS = [
+    ('menuitem', 'menuitem__title'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'unit_price'),
+]
+
+# Each export is the model, a list of (column name, values_list lookup) and the ordering to read the rows in
+EXPORTS = {
+    # One row per order item, each carrying its order's columns. The NDJSON export nests the items in their order instead
+    'orders': (OrderItem, ORDER_COLUMNS + ORDER_ITEM_COLUMNS, ('order_id', 'id')),
+    # user_id and date identify the employee and the day worked, names are kept for logs written before they were recorded
+    'logs': (Logger, [
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('date', 'date'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('log_type', 'log_type'),
+        ('start_time', 'start_time'),
+        ('end_time', 'end_time'),
+    ], ('id',)),
+    'bookings': (Booking, [
+        ('id', 'id'),
+        ('name', 'name'),
+        ('no_of_guests', 'no_of_guests'),
+        ('booking_date', 'booking_date'),
+        ('reservation_status', 'reservation_status'),
+    ], ('booking_date', 'id')),
+    'comments': (UserComments, [
+        ('id', 'id'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('comment', 'comment'),
+        ('created_at', 'created_at'),
+    ], ('created_at', 'id')),
+}
+
+
+def export_rows(name):
+    model, columns, ordering = EXPORTS[name]
+    return model.objects.order_by(*ordering).values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_columns(name):
+    return [column for column, _ in EXPORTS[name][1]]
+
+
+# Orders export as NDJSON: one line per order with its items nested, rows arrive sorted by order so they can be grouped as they stream
+def order_records(rows):
+    order_columns = [column for column, _ in ORDER_COLUMNS]
+    item_columns = [column for column, _ in ORDER_ITEM_COLUMNS]
+    for _, order_rows in groupby(rows, key=lambda row: row[0]):
+        order_rows = list(order_rows)
+        record = dict(zip(order_columns, order_rows[0]))
+        record['items'] = [dict(zip(item_columns, row[len(order_columns):])) for row in order_rows]
+        yield record
+
+
+def stream_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(records):
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, cls=DjangoJSONEncoder))
+        if len(lines) == EXPORT_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+# Returns a StreamingHttpResponse downloading the named export ('orders', 'logs', 'bookings', 'comments') as 'csv' or 'ndjson'
+def export_response(name, export_format):
+    rows = export_rows(name)
+    columns = export_columns(name)
+
+    if export_format == 'csv':
+        stream = stream_csv(columns, rows)
+    elif name == 'orders':
+        stream = stream_ndjson(order_records(rows))
+    else:
+        stream = stream_ndjson(dict(zip(columns, row)) for row in rows)
+
+    response = StreamingHttpResponse(stream, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+    return response
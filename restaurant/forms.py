@@ -1,7 +1,8 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import Logger, UserComments, Category, MenuItem, Cart, Order, Booking
-import datetime
+from .capacity import is_bookable
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.forms import AuthenticationForm
 
@@ -67,7 +68,7 @@ class LoginForm(AuthenticationForm):
 class LogForm(forms.ModelForm):
     class Meta:
         model = Logger
-        fields = ['first_name', 'last_name', 'log_type', 'start_time', 'end_time']
+        fields = ['first_name', 'last_name', 'date', 'log_type', 'start_time', 'end_time']
 
         
 # For searching employee logs
@@ -197,27 +198,16 @@ class OrderAssignDeliveryCrewForm(forms.Form):
 class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
-        fields = ['name', 'no_of_guests', 'booking_date']
+        # Location can be left empty, the booking then goes to the first location (see capacity.py)
+        fields = ['name', 'no_of_guests', 'booking_date', 'location']
         
     def clean_booking_date(self):
         booking_date = self.cleaned_data['booking_date']
-        days_of_week = booking_date.weekday()
-        BUSINESS_HOURS = {
-            0: (11, 21), # Monday
-            1: (11, 21), # Tuesday
-            2: (11, 21), # Wednesday
-            3: (11, 21), # Thursday
-            4: (11, 21), # Friday
-            5: (11, 22), # Saturday
-            6: (12, 20) # Sunday
-        }
-        
-        open_hour, close_hour = BUSINESS_HOURS[days_of_week]
         
-        if not (open_hour <= booking_date.hour < close_hour -1):
+        if not is_bookable(booking_date):
             raise forms.ValidationError("Bookings can only be made during business hours and up to an hour before closing.")
         
-        if booking_date < datetime.datetime.now():
+        if booking_date < timezone.now():
             raise forms.ValidationError("Booking date must be in the future.")
         
         return booking_date
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, When, Value, F, IntegerField
+from django.utils import timezone
+from .models import MenuItem, Cart
+from .menu_cache import MENUITEM_TABLE, invalidate_table
+
+# Stock is held for a user as soon as an item goes into their cart, so checkout can't oversell
+# MenuItem.inventory is what's still available to others, Cart.reserved_quantity is how much of it the cart row holds
+# and Cart.hold_expires_at is when an untouched hold goes back on sale (see release_expired_holds)
+# Stock is taken with one conditional UPDATE ... SET inventory = inventory - n WHERE inventory >= n, so busy items
+# don't queue up behind SELECT ... FOR UPDATE row locks, and a failed take changes nothing
+# Holds only bump the menu table counter (see menu_cache.py) when an item sells out or comes back into stock, so
+# ordinary cart changes don't throw away the cached menu snapshots and ETags. Whether an item is in stock is always
+# current in the menu API, but the stock count of an item that's still available can stay at an older value until the
+# menu next changes: a client revalidating with If-None-Match keeps getting 304 for it, not only for MENU_CACHE_TIMEOUT.
+# The checks here always use the live value. Staff edits to an item's stock still go through its post_save signal.
+INVENTORY_HOLD_MINUTES = getattr(settings, 'INVENTORY_HOLD_MINUTES', 15)
+
+
+# Raised when there isn't enough stock for some menu items, titles holds the items that are short
+class OutOfStockError(Exception):
+    def __init__(self, titles):
+        self.titles = titles
+        super().__init__(f"Not enough stock for: {', '.join(titles)}")
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(minutes=INVENTORY_HOLD_MINUTES)
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(id=menuitem_id, then=Value(quantity)) for menuitem_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+# Takes {menuitem_id: quantity} out of stock with a single conditional UPDATE, all or nothing
+# Raises OutOfStockError naming the items that are short
+def take_stock(quantities):
+    quantities = {menuitem_id: quantity for menuitem_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    try:
+        with transaction.atomic():
+            updated = MenuItem.objects.filter(id__in=quantities, inventory__gte=_quantity_case(quantities)).update(
+                inventory=F('inventory') - _quantity_case(quantities)
+            )
+            if updated != len(quantities):
+                # Raising rolls back the items that did have enough stock
+                raise OutOfStockError([])
+    except OutOfStockError:
+        raise OutOfStockError(_short_titles(quantities))
+    if MenuItem.objects.filter(id__in=quantities, inventory=0).exists():
+        # Sold out
+        invalidate_table(MENUITEM_TABLE)
+
+
+# Puts {menuitem_id: quantity} back in stock with a single UPDATE
+def return_stock(quantities):
+    quantities = {menuitem_id: quantity for menuitem_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    MenuItem.objects.filter(id__in=quantities).update(inventory=F('inventory') + _quantity_case(quantities))
+    if MenuItem.objects.filter(id__in=quantities, inventory=_quantity_case(quantities)).exists():
+        # Back in stock, it was at 0 before
+        invalidate_table(MENUITEM_TABLE)
+
+
+# Only bad input or a sold out item gets here, so naming the short items doesn't slow down normal requests
+def _short_titles(quantities):
+    return [
+        menuitem.title for menuitem in MenuItem.objects.filter(id__in=quantities).only('title', 'inventory').order_by('title')
+        if menuitem.inventory < quantities[menuitem.id]
+    ]
+
+
+# Puts the stock held by carts whose hold has expired back on sale, returns the number of cart rows released
+# The cart rows stay, their stock is taken again when they're updated or checked out
+# Rows locked by a checkout in progress are skipped rather than waited for
+# Run from cron with: python manage.py release_inventory_holds
+def release_expired_holds(now=None):
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    return _release_holds(Cart.objects.select_for_update(skip_locked=skip_locked).filter(hold_expires_at__lte=now or timezone.now()))
+
+
+# Puts the stock held by a user's cart back on sale, used when the user is deleted (the cart goes with them)
+def release_user_holds(user_id):
+    return _release_holds(Cart.objects.select_for_update().filter(user_id=user_id))
+
+
+def _release_holds(carts):
+    with transaction.atomic():
+        holds = list(carts.filter(reserved_quantity__gt=0).values_list('id', 'menuitem_id', 'reserved_quantity'))
+        if not holds:
+            return 0
+
+        released = {}
+        for _, menuitem_id, reserved_quantity in holds:
+            released[menuitem_id] = released.get(menuitem_id, 0) + reserved_quantity
+        return_stock(released)
+        Cart.objects.filter(id__in=[cart_id for cart_id, _, _ in holds]).update(reserved_quantity=0, hold_expires_at=None)
+    return len(holds)
@@ -0,0 +1,115 @@
+import http.client
+import itertools
+import statistics
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.models import Category, MenuItem
+from restaurant.search import tokenize
+
+
+# Compares the read-heavy API views served through WSGI (sync views) and ASGI (async views, see restaurant/async_views.py)
+# Start both servers against the same local database first, e.g.
+#   gunicorn littlelemon.wsgi -w 4 -b 127.0.0.1:8000
+#   uvicorn littlelemon.asgi:application --workers 4 --port 8001
+# then run: python manage.py benchmark_read_views [--concurrency 64] [--requests 2000] [--token <auth token>]
+# Each endpoint gets the same number of GET requests from --concurrency client threads with keep-alive connections,
+# and req/s, median and p99 latency are reported per server. The client shares the machine (and the GIL), so compare
+# the two servers with each other rather than reading the numbers as absolute capacity.
+# Raise the 'menu', 'search' and 'staff' rates in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] for the servers while
+# benchmarking, throttled (429) responses are counted but they're not what's being measured.
+class Command(BaseCommand):
+    help = 'Benchmarks the menu, category, search and reservation API views under WSGI against ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', default='http://127.0.0.1:8000', help='Base URL of the WSGI server')
+        parser.add_argument('--asgi', default='http://127.0.0.1:8001', help='Base URL of the ASGI server')
+        parser.add_argument('--concurrency', type=int, default=64, help='Number of concurrent client connections')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and server')
+        parser.add_argument('--warmup', type=int, default=100, help='Untimed requests per endpoint and server')
+        parser.add_argument('--token', help='Auth token of an Admin or Employee, also benchmarks current reservations')
+
+    def handle(self, *args, **options):
+        endpoints = self.endpoints(options['token'])
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+
+        for path in endpoints:
+            self.stdout.write(path)
+            for server in ('wsgi', 'asgi'):
+                base_url = options[server]
+                self.load(base_url, path, headers, options['concurrency'], options['warmup'])
+                latencies, statuses, elapsed = self.load(base_url, path, headers, options['concurrency'], options['requests'])
+                self.report(server.upper(), latencies, statuses, elapsed)
+
+    # Paths of the benchmarked views, using a category and a search word from the database
+    def endpoints(self, token):
+        category_slug = Category.objects.values_list('slug', flat=True).first()
+        title = MenuItem.objects.values_list('title', flat=True).first()
+        if category_slug is None or title is None:
+            raise CommandError('Add some categories and menu items first, e.g. with python manage.py import_menu')
+
+        endpoints = [
+            '/restaurant/api/menu',
+            '/restaurant/api/categories',
+            '/restaurant/api/category?' + urlencode({'slug': category_slug}),
+            '/restaurant/api/search?' + urlencode({'search': tokenize(title)[0]}),
+        ]
+        if token:
+            endpoints.append('/restaurant/api/reservations')
+        return endpoints
+
+    # Sends total GET requests for path from concurrency threads, returns (latencies in ms, status counts, seconds taken)
+    def load(self, base_url, path, headers, concurrency, total):
+        url = urlsplit(base_url)
+        target = url.path.rstrip('/') + path
+        sent = itertools.count()
+        latencies, statuses = [], Counter()
+        lock = threading.Lock()
+
+        def connect():
+            return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+        def worker():
+            connection = connect()
+            timings, codes = [], Counter()
+            while next(sent) < total:
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', target, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    codes['error'] += 1
+                    connection.close()
+                    connection = connect()
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+                codes[response.status] += 1
+            connection.close()
+            with lock:
+                latencies.extend(timings)
+                statuses.update(codes)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, statuses, time.perf_counter() - started
+
+    def report(self, name, latencies, statuses, elapsed):
+        codes = ', '.join(f'{code}: {count}' for code, count in sorted(statuses.items(), key=str))
+        if not latencies:
+            self.stdout.write(f'  {name}: no responses ({codes})')
+            return
+        latencies = sorted(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'  {name}: {len(latencies) / elapsed:.0f} req/s, median {statistics.median(latencies):.1f} ms, '
+            f'p99 {p99:.1f} ms ({codes})'
+        )
@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import slugify
+from restaurant.models import Category, MenuItem
+from restaurant.search import SearchIndex, tokenize
+
+ADJECTIVES = ['crispy', 'spicy', 'grilled', 'smoked', 'roasted', 'creamy', 'tangy', 'honey', 'garlic', 'lemon', 'herbed', 'charred', 'braised', 'sweet', 'zesty']
+INGREDIENTS = ['chicken', 'lamb', 'salmon', 'shrimp', 'eggplant', 'halloumi', 'feta', 'chickpea', 'octopus', 'beef', 'mushroom', 'spinach', 'tomato', 'pistachio', 'fig']
+DISHES = ['souvlaki', 'salad', 'pita', 'bruschetta', 'moussaka', 'risotto', 'flatbread', 'skewers', 'soup', 'pasta', 'tart', 'baklava', 'gyro', 'wrap', 'platter']
+CATEGORIES = ['Starters', 'Mains', 'Desserts', 'Drinks', 'Sides', 'Specials', 'Salads', 'Grill', 'Vegetarian', 'Kids']
+
+
+# Compares the search index (and its suggestions) against the title__icontains queries it replaced, on a synthetic menu
+# Usage: python manage.py benchmark_search [--items 100000] [--queries 500] [--database]
+# Without --database the icontains side is a Python substring scan over the titles, which is what LIKE '%q%' does row by row
+# With --database the synthetic menu is inserted, the real icontains queries are timed, and everything is rolled back
+class Command(BaseCommand):
+    help = 'Benchmarks the menu search index against title__icontains on a synthetic menu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100000, help='Number of synthetic menu items')
+        parser.add_argument('--queries', type=int, default=500, help='Number of queries to time')
+        parser.add_argument('--database', action='store_true', help='Also time icontains against the database (changes are rolled back)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        categories = [(i, title, slugify(title)) for i, title in enumerate(CATEGORIES, 1)]
+        menu_items = []
+        for i in range(1, options['items'] + 1):
+            title = f'{rng.choice(ADJECTIVES)} {rng.choice(INGREDIENTS)} {rng.choice(DISHES)} {i}'.title()
+            menu_items.append((i, title, slugify(title), rng.choice(categories)[0]))
+        queries = self.make_queries(rng, menu_items, options['queries'])
+
+        index = SearchIndex()
+        started = time.perf_counter()
+        index.build(categories, menu_items)
+        self.stdout.write(f"Built index over {len(menu_items)} menu items in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        self.report('Search index', [self.timed(lambda: index.search(query)) for query in queries])
+        self.report('Suggestions (first 3 letters)', [self.timed(lambda: index.suggest(query[:3])) for query in queries])
+
+        titles = [title for _, title, _, _ in menu_items] + [title for _, title, _ in categories]
+        self.report('icontains scan (Python)', [self.timed(lambda: [t for t in titles if query.lower() in t.lower()]) for query in queries])
+
+        if options['database']:
+            self.report('icontains (database)', self.time_database(categories, menu_items, queries))
+
+    # Whole words, prefixes, two word queries and single typos, drawn from the synthetic titles
+    def make_queries(self, rng, menu_items, count):
+        queries = []
+        for _ in range(count):
+            words = [word for word in tokenize(rng.choice(menu_items)[1]) if not word.isdigit()]
+            word = rng.choice(words)
+            kind = rng.randrange(4)
+            if kind == 0:
+                queries.append(word)
+            elif kind == 1:
+                queries.append(word[:max(3, len(word) // 2)])
+            elif kind == 2:
+                queries.append(' '.join(words[:2]))
+            else:
+                i = rng.randrange(1, len(word))
+                queries.append(word[:i] + word[i + 1:])
+        return queries
+
+    def time_database(self, categories, menu_items, queries):
+        timings = []
+        with transaction.atomic():
+            category_objects = Category.objects.bulk_create([
+                Category(title=f'Benchmark {title}', slug=f'benchmark-{slug}') for _, title, slug in categories
+            ])
+            category_ids = {i: category.pk for (i, _, _), category in zip(categories, category_objects)}
+            MenuItem.objects.bulk_create([
+                MenuItem(title=f'Benchmark {title}', slug=f'benchmark-{slug}', unit_price=Decimal('9.99'), category_id=category_ids[category_id])
+                for _, title, slug, category_id in menu_items
+            ], batch_size=1000)
+
+            for query in queries:
+                timings.append(self.timed(lambda: (
+                    list(MenuItem.objects.filter(title__icontains=query).values_list('id', flat=True)),
+                    list(Category.objects.filter(title__icontains=query).values_list('id', flat=True)),
+                )))
+            transaction.set_rollback(True)
+        return timings
+
+    def timed(self, func):
+        started = time.perf_counter()
+        func()
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(f'{name}: mean {statistics.mean(timings):.3f} ms, median {statistics.median(timings):.3f} ms, p99 {p99:.3f} ms')
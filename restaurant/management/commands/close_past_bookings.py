@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from restaurant.booking_status import close_past_bookings
+
+
+# Marks bookings whose slot is over as completed (or missed, for waitlisted bookings)
+# Meant to be run every few minutes from cron: python manage.py close_past_bookings
+class Command(BaseCommand):
+    help = 'Moves past bookings from current to completed and past waitlisted bookings to missed'
+
+    def handle(self, *args, **options):
+        closed = close_past_bookings()
+        self.stdout.write(f"Marked {closed['completed']} booking(s) completed and {closed['missed']} missed")
@@ -0,0 +1,48 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.menu_import import IMPORT_BATCH_SIZE, IMPORT_FORMATS, MenuImportError, parse_menu_file, import_menu
+
+
+# Imports menu items (and any categories they need) from a CSV or JSON file
+# Check a file first with: python manage.py import_menu menu.csv --dry-run
+class Command(BaseCommand):
+    help = 'Imports menu items from a CSV or JSON file, creating missing categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSON file, columns: title, unit_price, category, slug, featured, stock')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='File format, taken from the file extension by default')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be created')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        try:
+            with open(options['path'], 'rb') as menu_file:
+                rows = parse_menu_file(menu_file.read(), file_format)
+        except OSError as error:
+            raise CommandError(f"Can't read {options['path']}: {error}")
+        except MenuImportError as error:
+            raise CommandError(str(error))
+
+        result = import_menu(rows, dry_run=options['dry_run'], batch_size=options['batch_size'])
+
+        for category in result['categories_created']:
+            self.stdout.write(f'+ category {category}')
+        for title in result['items_created']:
+            self.stdout.write(f'+ {title}')
+        for title in result['items_unchanged']:
+            self.stdout.write(f'= {title}')
+        for error in result['errors']:
+            messages = '; '.join(f'{field}: {message}' for field, message in error['errors'].items())
+            self.stderr.write(f"! row {error['row']}: {messages}")
+
+        summary = (
+            f"{len(result['items_created'])} menu item(s) and {len(result['categories_created'])} category(ies) to create, "
+            f"{len(result['items_unchanged'])} already on the menu, {len(result['errors'])} row(s) with errors"
+        )
+        if result['errors']:
+            raise CommandError(f'Nothing imported: {summary}')
+        if options['dry_run']:
+            self.stdout.write(f'Dry run, nothing imported: {summary}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Imported: {summary}'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from restaurant.inventory import release_expired_holds
+
+
+# Puts stock held by carts that haven't been touched for INVENTORY_HOLD_MINUTES back on sale
+# Meant to be run every minute or so from cron: python manage.py release_inventory_holds
+class Command(BaseCommand):
+    help = 'Releases the inventory held by carts whose hold has expired'
+
+    def handle(self, *args, **options):
+        released = release_expired_holds()
+        self.stdout.write(f'Released inventory holds on {released} cart item(s)')
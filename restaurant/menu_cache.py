@@ -0,0 +1,111 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+
+# The public menu is read far more often than it changes. Each menu table (MenuItem, Category) has a change counter
+# and a last modified time in the cache, bumped on every write (see signals.py). They are used for:
+#   - menu snapshots: serialized API pages and the rendered HTML table, cached under the current counters,
+#     so any write makes older snapshots unreachable and they just expire from the cache
+#   - ETag / Last-Modified headers, so clients polling the menu get a 304 without anything being serialized
+# Reading the counters is one cache lookup and never touches the menu rows themselves.
+# The counters live in the TABLE_VERSION_CACHE cache, shared by every worker and kept apart from the default cache so
+# snapshots and throttle counters can't push them out. Snapshots stay in the default cache.
+MENU_CACHE_TIMEOUT = getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60)
+TABLE_VERSION_CACHE = getattr(settings, 'TABLE_VERSION_CACHE', 'default')
+
+MENUITEM_TABLE = 'menuitem'
+CATEGORY_TABLE = 'category'
+# Only bumped when menu item/category titles or category membership change, see search.py
+SEARCH_TABLE = 'search'
+
+
+def table_version_key(table):
+    return f'restaurant:version:{table}'
+
+
+def table_modified_key(table):
+    return f'restaurant:modified:{table}'
+
+
+# Returns {table: (counter, last_modified)} for the given tables with a single cache round trip
+# A counter that was evicted is restarted from the clock, so it can't collide with an older value,
+# and its last modified time becomes now, so clients fetch the data again rather than keep something stale
+def get_table_versions(*tables):
+    versions_cache = caches[TABLE_VERSION_CACHE]
+    keys = [table_version_key(table) for table in tables] + [table_modified_key(table) for table in tables]
+    values = versions_cache.get_many(keys)
+
+    versions = {}
+    for table in tables:
+        counter = values.get(table_version_key(table))
+        modified = values.get(table_modified_key(table))
+        if counter is None or modified is None:
+            modified = timezone.now().replace(microsecond=0)
+            versions_cache.add(table_version_key(table), time.time_ns(), None)
+            versions_cache.set(table_modified_key(table), modified, None)
+            counter = versions_cache.get(table_version_key(table))
+        versions[table] = (counter, modified)
+    return versions
+
+
+# Returns the new counter
+def bump_table_version(table):
+    versions_cache = caches[TABLE_VERSION_CACHE]
+    try:
+        counter = versions_cache.incr(table_version_key(table))
+    except ValueError:
+        counter = time.time_ns()
+        versions_cache.set(table_version_key(table), counter, None)
+    versions_cache.set(table_modified_key(table), timezone.now().replace(microsecond=0), None)
+    return counter
+
+
+# Bumps the table's counter once the current transaction commits
+# Bumping earlier would let a request cache the not yet committed (old) data under the new counter
+def invalidate_table(table):
+    transaction.on_commit(lambda: bump_table_version(table))
+
+
+# Snapshots are stored per page, so the key includes the full request URL (host, cursor and page size)
+def menu_snapshot_key(kind, request):
+    versions = get_table_versions(MENUITEM_TABLE, CATEGORY_TABLE)
+    version = '.'.join(str(versions[table][0]) for table in (MENUITEM_TABLE, CATEGORY_TABLE))
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'restaurant:menu:{version}:{kind}:{url_hash}'
+
+
+# Returns the cached snapshot for this request, calling build() to create and cache it on a miss
+def get_menu_snapshot(kind, request, build):
+    key = menu_snapshot_key(kind, request)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build()
+        cache.set(key, snapshot, MENU_CACHE_TIMEOUT)
+    return snapshot
+
+
+# Builds the etag_func and last_modified_func for django.views.decorators.http.condition from the tables a view reads
+# The ETag also names the representation, since the same URL can be rendered as JSON or as the browsable API, so the
+# views also send Vary: Accept. condition() goes below DRF's decorators (after check_request in the async views), so a
+# conditional request is authenticated and throttled before it can get a 304
+def table_conditions(*tables):
+    # Both functions need the counters, so they're read once per request
+    def versions_for(request):
+        if not hasattr(request, '_table_versions'):
+            request._table_versions = get_table_versions(*tables)
+        return request._table_versions
+
+    def etag(request, *args, **kwargs):
+        versions = versions_for(request)
+        accept = request.headers.get('Accept', '')
+        representation = request.GET.get('format') or ('html' if 'text/html' in accept else 'json')
+        return '-'.join(f'{table}.{versions[table][0]}' for table in tables) + f'-{representation}'
+
+    def last_modified(request, *args, **kwargs):
+        versions = versions_for(request)
+        return max(versions[table][1] for table in tables)
+
+    return etag, last_modified
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils.text import slugify
+import bleach
+from .models import Category, MenuItem
+from .menu_cache import MENUITEM_TABLE, CATEGORY_TABLE, SEARCH_TABLE, invalidate_table
+
+# Bulk menu import, used by manage.py import_menu and menu_import_api_view
+# Rows are {title, unit_price, category, slug (optional), featured (optional), stock or inventory (optional)},
+# category being a category title that's created if it doesn't exist yet.
+# Every row is checked in memory against one fetch of the existing titles and slugs, instead of the serializer's
+# per-row UniqueValidator queries, then categories and menu items are written with bulk_create in batches.
+# Nothing is written if any row has errors. A row matching an existing menu item's title and slug is left alone,
+# so the same file can be imported twice.
+IMPORT_BATCH_SIZE = 1000
+
+IMPORT_FORMATS = ['csv', 'json']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+# Raised when the file itself can't be read, as opposed to rows with invalid values
+class MenuImportError(Exception):
+    pass
+
+
+# Returns the rows (dicts) in a CSV or JSON (list of objects) menu file
+def parse_menu_file(content, file_format):
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise MenuImportError("File must be UTF-8 encoded.")
+
+    if file_format == 'csv':
+        return list(csv.DictReader(io.StringIO(content)))
+    if file_format == 'json':
+        try:
+            rows = json.loads(content)
+        except ValueError as error:
+            raise MenuImportError(f"Invalid JSON: {error}")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise MenuImportError("JSON file must be a list of objects.")
+        return rows
+    raise MenuImportError(f"Unsupported format '{file_format}', use one of: {', '.join(IMPORT_FORMATS)}.")
+
+
+def _clean_text(value):
+    value = str(value or '').strip()
+    # bleach is only needed when there's markup to strip
+    if '<' in value or '>' in value or '&' in value:
+        value = bleach.clean(value, tags=[], strip=True)
+    return value
+
+
+# Validates one row without touching the database, returns (cleaned values, errors)
+def _clean_row(row):
+    errors = {}
+    cleaned = {}
+
+    title = _clean_text(row.get('title'))
+    if len(title) < 3:
+        errors['title'] = "Title must be at least 3 characters long."
+    elif len(title) > 255:
+        errors['title'] = "Title can be at most 255 characters long."
+    cleaned['title'] = title
+
+    slug = str(row.get('slug') or '').strip() or slugify(title)
+    if not re.match(r'^[a-z0-9-]+$', slug) or slug.strip('-') == '':
+        errors['slug'] = "Slug can only contain lowercase letters, numbers, and hyphens, and cannot be blank or only hyphens."
+    cleaned['slug'] = slug
+
+    try:
+        unit_price = Decimal(str(row.get('unit_price', '')).strip())
+        if unit_price < Decimal('0.01'):
+            errors['unit_price'] = "Price must be greater than zero."
+        elif unit_price != unit_price.quantize(Decimal('0.01')) or unit_price >= Decimal('10000'):
+            errors['unit_price'] = "Price can have at most 4 digits before and 2 after the decimal point."
+        cleaned['unit_price'] = unit_price
+    except InvalidOperation:
+        errors['unit_price'] = "Price must be a number."
+
+    stock = row.get('stock', row.get('inventory', 0))
+    try:
+        cleaned['inventory'] = int(stock or 0)
+        if cleaned['inventory'] < 0:
+            errors['stock'] = "Stock cannot be negative."
+    except (TypeError, ValueError):
+        errors['stock'] = "Stock must be a whole number."
+
+    featured = row.get('featured', False)
+    if isinstance(featured, bool):
+        cleaned['featured'] = featured
+    elif str(featured).strip().lower() in TRUE_VALUES:
+        cleaned['featured'] = True
+    elif str(featured).strip().lower() in FALSE_VALUES:
+        cleaned['featured'] = False
+    else:
+        errors['featured'] = "Featured must be true or false."
+
+    category = _clean_text(row.get('category'))
+    if not category:
+        errors['category'] = "Category is required."
+    cleaned['category'] = category
+
+    return cleaned, errors
+
+
+# Checks the rows and, unless dry_run is set or a row has errors, creates the new categories and menu items
+# Returns the diff: {'dry_run', 'categories_created', 'items_created', 'items_unchanged', 'errors'}
+# errors is a list of {'row': <1-based row number>, 'errors': {field: message}}
+def import_menu(rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    existing_items = dict(MenuItem.objects.values_list('title', 'slug'))
+    existing_slugs = set(existing_items.values())
+    existing_categories = dict(Category.objects.values_list('title', 'id'))
+    existing_category_slugs = set(Category.objects.values_list('slug', flat=True))
+
+    new_items = []
+    new_categories = {}   # title -> slug
+    unchanged = []
+    errors = []
+    seen_titles = set()
+    seen_slugs = set()
+
+    for number, row in enumerate(rows, 1):
+        cleaned, row_errors = _clean_row(row)
+        title, slug, category = cleaned['title'], cleaned['slug'], cleaned['category']
+
+        if not row_errors:
+            if title in seen_titles:
+                row_errors['title'] = "Title appears more than once in the file."
+            elif slug in seen_slugs:
+                row_errors['slug'] = "Slug appears more than once in the file."
+            elif existing_items.get(title) == slug:
+                unchanged.append(title)
+                seen_titles.add(title)
+                seen_slugs.add(slug)
+                continue
+            elif title in existing_items:
+                row_errors['title'] = "A menu item with this title already exists."
+            elif slug in existing_slugs:
+                row_errors['slug'] = "A menu item with this slug already exists."
+
+        if not row_errors and category not in existing_categories and category not in new_categories:
+            category_slug = slugify(category)
+            if not category_slug or category_slug in existing_category_slugs or category_slug in new_categories.values():
+                row_errors['category'] = f"Can't create category '{category}', its slug '{category_slug}' is blank or already taken."
+            else:
+                new_categories[category] = category_slug
+
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+            continue
+        seen_titles.add(title)
+        seen_slugs.add(slug)
+        new_items.append(cleaned)
+
+    # Categories only needed by rows with errors aren't created
+    used_categories = {item['category'] for item in new_items}
+    new_categories = {title: slug for title, slug in new_categories.items() if title in used_categories}
+
+    result = {
+        'dry_run': dry_run,
+        'categories_created': sorted(new_categories),
+        'items_created': [item['title'] for item in new_items],
+        'items_unchanged': unchanged,
+        'errors': errors,
+    }
+    if dry_run or errors or not new_items:
+        return result
+
+    with transaction.atomic():
+        if new_categories:
+            Category.objects.bulk_create([Category(title=title, slug=slug) for title, slug in new_categories.items()], batch_size=batch_size)
+            # bulk_create doesn't return primary keys on every database (MySQL), so they're read back in one query
+            existing_categories.update(Category.objects.filter(title__in=new_categories).values_list('title', 'id'))
+            invalidate_table(CATEGORY_TABLE)
+
+        MenuItem.objects.bulk_create([
+            MenuItem(
+                title=item['title'],
+                slug=item['slug'],
+                unit_price=item['unit_price'],
+                inventory=item['inventory'],
+                featured=item['featured'],
+                category_id=existing_categories[item['category']],
+            )
+            for item in new_items
+        ], batch_size=batch_size)
+
+        # bulk_create doesn't send post_save, so the menu snapshots and search indexes are refreshed here
+        invalidate_table(MENUITEM_TABLE)
+        invalidate_table(SEARCH_TABLE)
+
+    return result
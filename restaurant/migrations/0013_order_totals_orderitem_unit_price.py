@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Round
+
+
+TAX_RATE = Decimal('0.10')
+
+
+# Copies the current menu price onto existing order items, then stores each order's totals from those prices
+def backfill_order_totals(apps, schema_editor):
+    MenuItem = apps.get_model('restaurant', 'MenuItem')
+    Order = apps.get_model('restaurant', 'Order')
+    OrderItem = apps.get_model('restaurant', 'OrderItem')
+
+    OrderItem.objects.update(
+        unit_price=Subquery(MenuItem.objects.filter(pk=OuterRef('menuitem_id')).values('unit_price')[:1])
+    )
+
+    item_totals = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(subtotal=Sum(F('unit_price') * F('quantity')))
+        .values('subtotal')
+    )
+    Order.objects.update(
+        subtotal=Coalesce(Subquery(item_totals, output_field=DecimalField(max_digits=10, decimal_places=2)), Decimal('0.00'))
+    )
+    Order.objects.update(tax=Round(F('subtotal') * TAX_RATE, 2))
+    Order.objects.update(total=F('subtotal') + F('tax'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0012_customuser'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Menu item price at the time the order was placed.', max_digits=6),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0014_booking_booking_date_index_usercomments_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='reserved_quantity',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
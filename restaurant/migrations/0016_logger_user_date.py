@@ -0,0 +1,35 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0015_cart_reserved_quantity_hold_expires_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logger',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to=settings.AUTH_USER_MODEL),
+        ),
+        # Added without a default first, so existing logs are left without a date rather than all dated today
+        migrations.AddField(
+            model_name='logger',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='logger',
+            name='date',
+            field=models.DateField(blank=True, default=django.utils.timezone.localdate, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='logger',
+            index=models.Index(fields=['user', 'date'], name='logger_user_date_index'),
+        ),
+    ]
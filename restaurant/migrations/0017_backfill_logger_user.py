@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+# Links existing logs to their employee by matching first and last names, done once here so lookups can use Logger.user
+# Names shared by more than one user can't be told apart and those logs are left unlinked
+def backfill_logger_user(apps, schema_editor):
+    User = apps.get_model('restaurant', 'CustomUser')
+    Logger = apps.get_model('restaurant', 'Logger')
+
+    users = {}
+    for user_id, first_name, last_name in User.objects.exclude(first_name='').exclude(last_name='').values_list('id', 'first_name', 'last_name'):
+        key = (first_name, last_name)
+        users[key] = None if key in users else user_id
+
+    names = Logger.objects.filter(user__isnull=True).values_list('first_name', 'last_name').distinct()
+    for first_name, last_name in names:
+        user_id = users.get((first_name, last_name))
+        if user_id is not None:
+            Logger.objects.filter(user__isnull=True, first_name=first_name, last_name=last_name).update(user_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0016_logger_user_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_logger_user, migrations.RunPython.noop),
+    ]
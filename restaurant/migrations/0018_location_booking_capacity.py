@@ -0,0 +1,71 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Seats of the location created for existing bookings, change it in the admin
+DEFAULT_SEATS = 40
+BOOKING_SLOT_MINUTES = 60
+
+
+# Puts every existing booking in one location and counts its guests into the slot occupancy table
+def create_default_location(apps, schema_editor):
+    Location = apps.get_model('restaurant', 'Location')
+    Booking = apps.get_model('restaurant', 'Booking')
+    SlotOccupancy = apps.get_model('restaurant', 'SlotOccupancy')
+
+    location = Location.objects.create(name='Main dining room', slug='main-dining-room', seats=DEFAULT_SEATS)
+    Booking.objects.filter(location__isnull=True).update(location=location)
+
+    occupancy = {}
+    for booking_date, guests in Booking.objects.filter(reservation_status__in=['current', 'completed']).values_list('booking_date', 'no_of_guests'):
+        moment = timezone.localtime(booking_date)
+        minutes = (moment.hour * 60 + moment.minute) // BOOKING_SLOT_MINUTES * BOOKING_SLOT_MINUTES
+        slot = moment.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+        occupancy[slot] = occupancy.get(slot, 0) + guests
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(location=location, slot=slot, guests=guests) for slot, guests in occupancy.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0017_backfill_logger_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('slug', models.SlugField(max_length=255, unique=True)),
+                ('seats', models.PositiveIntegerField(help_text='Guests that can be seated per booking slot.')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='reservation_status',
+            field=models.CharField(choices=[('current', 'Current'), ('completed', 'Completed'), ('missed', 'Missed'), ('waitlisted', 'Waitlisted')], default='current', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='restaurant.location'),
+        ),
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.DateTimeField()),
+                ('guests', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='restaurant.location')),
+            ],
+            options={
+                'unique_together': {('location', 'slot')},
+            },
+        ),
+        migrations.RunPython(create_default_location, migrations.RunPython.noop),
+    ]
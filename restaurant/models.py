@@ -1,13 +1,30 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.text import slugify
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import timedelta
+from .roles import EMPLOYEE, MANAGER, DELIVERY_CREW, STAFF_ROLES, get_roles
 
 # Create your models here.
 
+# Sales tax applied to orders
+TAX_RATE = Decimal('0.10')
+
+
+# Tax on an amount, rounded to the cent
+def tax_on(amount):
+    return (amount * TAX_RATE).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+# An amount with tax added, rounded the same way order totals are (see Order.calculate_totals)
+# Used for menu item prices and cart totals, so they match what the order will charge
+def price_after_tax(amount):
+    amount = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return amount + tax_on(amount)
+
 # Custom user model, extends Django's AbstractUser model to add custom permissions and prevent clashes with the default auth.User model
 class CustomUser(AbstractUser):
     groups = models.ManyToManyField(
@@ -27,36 +44,39 @@ class CustomUser(AbstractUser):
     )
     
     # Custom properties to check for group memberships and superuser status
+    # Group names are loaded once per user instance (see roles.get_roles), so these checks don't query the database each time
+    @property
+    def roles(self):
+        return get_roles(self)
+    
     @property
     def IsCustomer(self):
         return(
-            self.is_authenticatedand and
+            self.is_authenticated and
             not self.is_superuser and
-            not self.groups.filter(name__in=['Employee', 'Manager', 'Delivery Crew']).exists()
+            self.roles.isdisjoint(STAFF_ROLES)
         )
     
     @property
     def IsEmployee(self):
-        return self.groups.filter(name='Employee').exists()
+        return EMPLOYEE in self.roles
     
     @property
     def IsAdminOrManager(self):
-        return self.is_superuser or self.groups.filter(name='Manager').exists()
+        return self.is_superuser or MANAGER in self.roles
     
-    @property
     def IsOwnerOrAdminOrManager(self, obj):
-        is_owner = (obj.first_name == self.first_name and obj.last_name == self.last_name)
-        is_manager = self.groups.filter(name='Manager').exists()
+        is_owner = obj.user_id == self.id
+        is_manager = MANAGER in self.roles
         return is_owner or is_manager or self.is_superuser
     
     @property
     def IsAdminOrEmployeeButNotDeliveryCrew(self):
-        return self.is_superuser or (self.groups.filter(name='Employee').exists() and not self.groups.filter(name='Delivery Crew').exists())
+        return self.is_superuser or (EMPLOYEE in self.roles and DELIVERY_CREW not in self.roles)
     
-    @property
     def IsOwnerOrEmployeeOrAdmin(self, obj):
         is_owner = (obj.first_name == self.first_name and obj.last_name == self.last_name)
-        is_employee = self.groups.filter(name='Employee').exists()
+        is_employee = EMPLOYEE in self.roles
         return is_owner or is_employee or self.is_superuser
     
     
@@ -70,18 +90,31 @@ class Logger(models.Model):
         ('OUT', 'Logout'),
     ]
     
+    # The employee the log belongs to and the day the shift was worked, shift analytics group on (user, date), see shifts.py
+    # Logs written before these were recorded have them empty and are left out of the analytics
+    # The (user, date) index also serves lookups by user alone, so the foreign key doesn't get its own index
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='logs')
+    date = models.DateField(null=True, blank=True, default=timezone.localdate)
     first_name = models.CharField(max_length=200)
     last_name = models.CharField(max_length=200)
     log_type = models.CharField(max_length=3, choices=LOG_TYPE_CHOICES, default='IN')
     start_time = models.TimeField(null=True, blank=True, help_text="Enter the start time (Login time).")
     end_time = models.TimeField(null=True, blank=True, help_text="Enter the end time (Logout time).")
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='logger_user_date_index'),
+        ]
+    
     @property
     def total_hours(self):
         if self.start_time and self.end_time:
             start_dt = timedelta(hours=self.start_time.hour, minutes=self.start_time.minute)
             end_dt = timedelta(hours=self.end_time.hour, minutes=self.end_time.minute)
             duration = end_dt - start_dt
+            # Shifts can end at midnight (12AM)
+            if duration < timedelta(0):
+                duration += timedelta(days=1)
             return duration.total_seconds() / 3600 # Convert seconds to hours
         return None
     
@@ -94,7 +127,7 @@ class UserComments(models.Model):
     first_name = models.CharField(max_length=200)
     last_name = models.CharField(max_length=200)
     comment = models.CharField(max_length=1000)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     def __str__(self)-> str:
         return f'{self.first_name} {self.last_name}: {self.comment}'
@@ -132,11 +165,28 @@ class MenuItem(models.Model):
         return self.title
     
 
+# Loads the menu item and its category with each cart row, and totals the cart in the database
+class CartQuerySet(models.QuerySet):
+    def with_details(self):
+        return self.select_related('user', 'menuitem__category')
+    
+    def subtotal(self):
+        subtotal = self.aggregate(
+            subtotal=models.Sum(models.F('quantity') * models.F('menuitem__unit_price'), output_field=models.DecimalField(max_digits=10, decimal_places=2))
+        )['subtotal']
+        return subtotal if subtotal is not None else Decimal('0.00')
+
+
 # Table for each user's cart
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField(default=1)
+    # Stock taken out of MenuItem.inventory for this row, and when it goes back on sale if the cart is left alone, see inventory.py
+    reserved_quantity = models.SmallIntegerField(default=0)
+    hold_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    objects = CartQuerySet.as_manager()
     
     # These @properties behave like fields when you access them, but they're not actual database fields, and their values are calculated on-demand.
     @property
@@ -154,6 +204,12 @@ class Cart(models.Model):
         return f'Cart of {self.user.username}'
     
 
+# Loads the users and the order items with their menu items up front, so listing or serializing any number of orders takes a fixed number of queries
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        return self.select_related('user', 'delivery_crew').prefetch_related('orderitem_set__menuitem')
+
+
 # Table for all orders
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -161,21 +217,32 @@ class Order(models.Model):
     order_status = models.BooleanField(db_index=True, default=False)
     ready_for_delivery = models.BooleanField(db_index=True, default=False)
     time = models.DateField(db_index=True)
+    # Totals are stored when the order is placed so order history doesn't change when the menu is repriced
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    
+    objects = OrderQuerySet.as_manager()
     
     def __str__(self)-> str:
         delivery_crew_username = self.delivery_crew.username if self.delivery_crew else "Not assigned"
         status_str = "Delivered" if self.order_status else "Out for Delivery"
         return f'Order {self.id} by {self.user.username} - Delivery Crew: {delivery_crew_username} (Status: {status_str})'
     
-    @property
-    def subtotal(self):
-        subtotal = sum(item.price for item in self.orderitem_set.all())
-        return subtotal.quantize(Decimal(1.1), rounding=ROUND_HALF_UP)
-    
+    # Kept for templates and API output that still use the old name
     @property
     def price_after_tax(self):
-        price_after_tax = self.subtotal * Decimal(1.1)
-        return price_after_tax.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return self.total
+    
+    # Sets subtotal, tax and total from the given order items (defaults to the items saved for this order)
+    # Uses each item's unit_price snapshot, not the current menu price
+    def calculate_totals(self, order_items=None):
+        if order_items is None:
+            order_items = self.orderitem_set.all()
+        subtotal = sum((item.unit_price * item.quantity for item in order_items), Decimal('0.00'))
+        self.subtotal = subtotal.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.tax = tax_on(self.subtotal)
+        self.total = self.subtotal + self.tax
     
     # For deleting items from the cart once the order is placed.
     def delete(self, *args, **kwargs):
@@ -188,6 +255,7 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2, help_text="Menu item price at the time the order was placed.")
         
     class Meta:
         unique_together = ['order', 'menuitem']
@@ -195,14 +263,25 @@ class OrderItem(models.Model):
     def __str__(self)-> str:
         return f'{self.order.id} - {self.menuitem.title} (x{self.quantity})'
     
-    @property
-    def unit_price(self):
-        return self.menuitem.unit_price
-    
     @property
     def price(self):
         price = self.unit_price * self.quantity
-        return price.quantize(Decimal(1.1), rounding=ROUND_HALF_UP)
+        return price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+# Table for the restaurant's dining locations and how many guests each can seat per booking slot
+class Location(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    slug = models.SlugField(max_length=255, unique=True)
+    seats = models.PositiveIntegerField(help_text="Guests that can be seated per booking slot.")
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name)
+        super().save(*args, **kwargs)
+    
+    def __str__(self)-> str:
+        return f'{self.name} ({self.seats} seats)'
+
 
 # Table for reservations booked
 class Booking(models.Model):
@@ -210,11 +289,40 @@ class Booking(models.Model):
         ('current', 'Current'),
         ('completed', 'Completed'),
         ('missed', 'Missed'),
+        ('waitlisted', 'Waitlisted'),
     ]
     name = models.CharField(max_length=255, help_text="Enter First and Last name please.")
     no_of_guests = models.IntegerField(default=1)
-    booking_date = models.DateTimeField()
+    booking_date = models.DateTimeField(db_index=True)
     reservation_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='current')
+    # Left empty, the booking goes to the first location, see capacity.py
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Current/past reservation lists and closing past bookings (booking_status.py) filter on status then date
+            models.Index(fields=['reservation_status', 'booking_date'], name='booking_status_date_index'),
+        ]
+    
+    # The slot occupancy counters are updated by a pre_save signal (see signals.py and capacity.py),
+    # saving in a transaction keeps them from changing without the booking row or the other way around
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def __str__(self)-> str:
+        return f'Reservation by {self.name} for {self.no_of_guests}'
+
+
+# Guests booked per location per booking slot, kept up to date on every booking change so capacity checks
+# are a single conditional UPDATE on one row instead of a COUNT over the bookings, see capacity.py
+class SlotOccupancy(models.Model):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    slot = models.DateTimeField()
+    guests = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['location', 'slot']
     
     def __str__(self)-> str:
-        return f'Reservation by {self.name} for {self.no_of_guests}'
\ No newline at end of file
+        return f'{self.location.name} at {self.slot}: {self.guests} guests'
@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from .roles import DELIVERY_CREW, EMPLOYEE, get_roles
+
+# Order status events, pushed to customers and delivery crew over server-sent events (see async_views.order_events_api_view)
+# instead of them polling /restaurant/api/order. Whenever an order's ready_for_delivery, order_status or delivery crew
+# changes (order_details_api_view and order_details_view), an event goes to the order's customer, its delivery crew
+# (and the previous one, when it's reassigned) and to staff, once the change is committed.
+# The pub/sub is in-process: each stream gets a queue per connection and only sees events published by its own process.
+# Run the event stream on a single ASGI worker with the order updates served by that same process, or put a shared
+# broker (e.g. Redis pub/sub) behind publish() when running several.
+ORDER_EVENTS_KEEPALIVE = getattr(settings, 'ORDER_EVENTS_KEEPALIVE', 15)
+ORDER_EVENTS_QUEUE_SIZE = getattr(settings, 'ORDER_EVENTS_QUEUE_SIZE', 100)
+
+# Channel with the events of every order, for Admin and Employees other than Delivery Crew
+STAFF_CHANNEL = 'staff'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+# Channels a user's stream listens on, the same orders orders_api_view lets them see
+def order_channels(user):
+    roles = get_roles(user)
+    if user.is_superuser or (EMPLOYEE in roles and DELIVERY_CREW not in roles):
+        return [STAFF_CHANNEL, user_channel(user.pk)]
+    return [user_channel(user.pk)]
+
+
+# One open stream. Events are put on its queue from any thread, through the event loop the stream runs on
+# A client that stops reading loses its oldest events rather than holding on to more and more of them
+class Subscription:
+    def __init__(self, channels, max_size=ORDER_EVENTS_QUEUE_SIZE):
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The stream's event loop has closed
+            pass
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    # Waits up to timeout seconds for the next event, None if there wasn't one
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class OrderEventBroker:
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    # Called from the stream's event loop
+    def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscriptions = self._subscriptions.get(channel)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[channel]
+
+    # Sends the event to every stream listening on any of the channels, once per stream
+    def publish(self, channels, event):
+        event = dict(event, id=next(self._ids))
+        with self._lock:
+            subscriptions = set().union(*(self._subscriptions.get(channel, ()) for channel in channels))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+order_events = OrderEventBroker()
+
+
+def order_event(order):
+    return {
+        'order_id': order.pk,
+        'order_status': order.order_status,
+        'ready_for_delivery': order.ready_for_delivery,
+        'delivery_crew': order.delivery_crew.username if order.delivery_crew_id else None,
+    }
+
+
+# Publishes the order's current status once the surrounding transaction commits
+# Pass the delivery crew the order had before a reassignment so they hear they no longer have it
+def publish_order_update(order, previous_delivery_crew_id=None):
+    event = order_event(order)
+    user_ids = {order.user_id, order.delivery_crew_id, previous_delivery_crew_id} - {None}
+    channels = [STAFF_CHANNEL] + [user_channel(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: order_events.publish(channels, event))
+
+
+# Formats an event for a text/event-stream response, events from the snapshot sent on connect have no id
+def format_event(event):
+    data = {key: value for key, value in event.items() if key != 'id'}
+    event_id = f"id: {event['id']}\n" if 'id' in event else ''
+    return f"{event_id}event: order\ndata: {json.dumps(data)}\n\n"
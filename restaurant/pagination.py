@@ -0,0 +1,143 @@
+from django.db.models import Q
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.request import Request
+
+
+# Cursor (keyset) pagination for list endpoints
+# Each page is fetched with WHERE <ordering column> > <cursor position> ... LIMIT page_size on an indexed column,
+# so a page costs the same no matter how far into the table it is and no COUNT(*) is run
+# Responses look like {"next": <url or null>, "previous": <url or null>, "results": [...]}
+class IdCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+    # Both paginate_queryset and apaginate_queryset (for the async views, see async_views.py) build the page from the
+    # same two halves below, so the sync and async views return the same pages, cursors and links. They follow
+    # CursorPagination.paginate_queryset step for step, including its filter that keeps rows with a null in the ordering column
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        # One extra row tells whether there's a following page
+        return self._set_page(list(queryset[self._offset:self._offset + self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page([obj async for obj in queryset[self._offset:self._offset + self.page_size + 1]])
+
+    # Reads the cursor and returns the ordered and filtered queryset to take the page from, None when not paginating
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (self._offset, self._reverse, self._current_position) = (0, False, None)
+        else:
+            (self._offset, self._reverse, self._current_position) = self.cursor
+
+        if self._reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if str(self._current_position) != 'None':
+            order = self.ordering[0]
+            is_reversed = order.startswith('-')
+            order_attr = order.lstrip('-')
+            if self.cursor.reverse != is_reversed:
+                filter_query = Q(**{order_attr + '__lt': self._current_position})
+            else:
+                filter_query = Q(**{order_attr + '__gt': self._current_position})
+            # Rows with a null in the ordering column come last when reversed, keep them
+            if (self._reverse and not is_reversed) or is_reversed:
+                filter_query |= Q(**{order_attr + '__isnull': True})
+            queryset = queryset.filter(filter_query)
+        return queryset
+
+    # Sets the page and its next/previous positions from the fetched rows (page_size + 1 of them at most)
+    def _set_page(self, results):
+        reverse, current_position = self._reverse, self._current_position
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (self._offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (self._offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+# Newest orders first
+# Ordered by id rather than Order.time: time is only a date, so every order placed on the same day would share
+# a cursor position and pages within a day would fall back to a growing offset. Orders get increasing ids as they're placed
+class OrderCursorPagination(IdCursorPagination):
+    ordering = '-id'
+
+
+# Newest comments first
+class CommentCursorPagination(IdCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+# Newest logs first
+class LoggerCursorPagination(IdCursorPagination):
+    ordering = '-id'
+
+
+# Upcoming reservations, soonest first
+class BookingCursorPagination(IdCursorPagination):
+    ordering = ('booking_date', 'id')
+
+
+# Past reservations, most recent first
+class OldBookingCursorPagination(IdCursorPagination):
+    ordering = ('-booking_date', '-id')
+
+
+# Paginates a queryset for an HTML view with the same cursor pagination as the API
+# Returns the rows for the requested page and a dict with the next/previous page links for templates/pagination.html
+def paginate_for_template(request, queryset, pagination_class):
+    paginator = pagination_class()
+    # The cursor paginator reads request.query_params, which plain Django requests don't have
+    try:
+        page = paginator.paginate_queryset(queryset, Request(request))
+    except NotFound:
+        raise Http404("Invalid page cursor.")
+    links = {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+    }
+    return page, links
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .token_cache import token_cache
+from .access_tokens import revoke_user_access_tokens
+
+# Group names used for role based permissions throughout the app
+EMPLOYEE = 'Employee'
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery Crew'
+
+STAFF_ROLES = frozenset([EMPLOYEE, MANAGER, DELIVERY_CREW])
+
+# How long a user's roles stay in the shared cache. Entries are also deleted whenever group membership changes (see signals.py)
+ROLES_CACHE_TIMEOUT = getattr(settings, 'ROLES_CACHE_TIMEOUT', 60 * 15)
+
+
+def roles_cache_key(user_id):
+    return f'restaurant:roles:{user_id}'
+
+
+# Loads the names of every group the user belongs to
+# Uses the prefetched groups if the queryset already did prefetch_related('groups'),
+# otherwise checks the shared cache (keyed by user id) before falling back to a single query
+def load_roles(user):
+    prefetched = getattr(user, '_prefetched_objects_cache', {})
+    if 'groups' in prefetched:
+        return frozenset(group.name for group in prefetched['groups'])
+
+    key = roles_cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, roles, ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+# Removes the cached roles of the given users from the shared cache, and this process's token cache (see token_cache.py)
+# Waits for the surrounding transaction to commit so another request can't re-cache the old membership in between
+# Access tokens carry the roles they were issued with, so the users' existing ones are revoked (see access_tokens.py)
+def invalidate_roles(user_ids):
+    user_ids = list(user_ids)
+    keys = [roles_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        def invalidate():
+            cache.delete_many(keys)
+            token_cache.forget_users(user_ids)
+        transaction.on_commit(invalidate)
+        revoke_user_access_tokens(user_ids)
+
+
+# Returns the user's roles as a frozenset of group names
+# The result is stored on the user instance, and request.user is a new instance for every request,
+# so group membership is only looked up once per request no matter how many checks run
+def get_roles(user):
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        roles = load_roles(user)
+        user._roles = roles
+    return roles
+
+
+# Forgets the roles stored on a user instance, used after that instance's group membership changes
+def clear_roles(user):
+    if getattr(user, '_roles', None) is not None:
+        del user._roles
+
+
+# True if the user is in at least one of the given groups
+def has_role(user, *role_names):
+    return not get_roles(user).isdisjoint(role_names)
+
+
+# Admin (superuser) or Manager
+def is_admin_or_manager(user):
+    return bool(user and user.is_authenticated and (user.is_superuser or has_role(user, MANAGER)))
+
+
+# Admin, or an Employee who is not also Delivery Crew
+def is_admin_or_employee_but_not_delivery_crew(user):
+    if not (user and user.is_authenticated):
+        return False
+    if user.is_superuser:
+        return True
+    roles = get_roles(user)
+    return EMPLOYEE in roles and DELIVERY_CREW not in roles
@@ -0,0 +1,470 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from .menu_cache import SEARCH_TABLE, get_table_versions, bump_table_version
+from .models import Category, MenuItem
+from .suggest import SuggestionTrie, TOP_SUGGESTIONS
+
+# In-process search index for menu items and categories, replaces title__icontains table scans
+# Titles are split into lowercase tokens and kept in an inverted index (token -> documents), plus:
+#   - a sorted vocabulary, so prefix matches ("chick" -> "chicken") are a bisect instead of a scan
+#   - a trigram index over the vocabulary, so misspelled words ("chiken") can still find close tokens
+# Menu items are also indexed under their category's title, at a lower weight, so searching "dessert" finds the desserts.
+# Titles are also kept in a prefix trie (suggest.py) for search-as-you-type suggestions.
+# Each process keeps its own copy. Saves/deletes in this process update it incrementally (see signals.py) and bump a
+# shared counter, other processes see the new counter on their next search and rebuild from the database in the
+# background, answering from their current copy until the new one is swapped in.
+
+logger = logging.getLogger(__name__)
+
+MENUITEM = 'menuitem'
+CATEGORY = 'category'
+
+TITLE_WEIGHT = 2
+CATEGORY_WEIGHT = 1
+
+# Score multipliers for how a query token matched an indexed token
+EXACT_MATCH = 3
+PREFIX_MATCH = 2
+FUZZY_MATCH = 1
+
+# Most indexed tokens a single short prefix can expand to
+MAX_PREFIX_EXPANSIONS = 200
+
+SEARCH_RESULTS_LIMIT = 50
+SUGGESTIONS_LIMIT = 10
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Levenshtein distance, gives up and returns limit + 1 as soon as the distance must be larger than limit
+def edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+# Number of typos allowed for a query token of this length
+def allowed_typos(token):
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+class SearchIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Value of the shared search counter this copy of the index matches, None until built
+        self.version = None
+        self._reset()
+
+    def _reset(self):
+        self._titles = {}                            # (kind, id) -> lowercase title, used to order equal scores
+        self._doc_tokens = {}                        # (kind, id) -> {token: weight} the document is indexed under
+        self._postings = defaultdict(lambda: defaultdict(set))  # token -> {weight: {(kind, id), ...}}
+        # token -> {weight: [(title, (kind, id)), ...]} sorted by title, lets one word searches stop after the best few results
+        self._ranked_postings = defaultdict(lambda: defaultdict(list))
+        self._vocabulary = []                        # every indexed token, sorted
+        self._trigrams = defaultdict(set)            # trigram -> tokens containing it
+        self._menu_items = {}                        # menu item id -> (title, slug, category id)
+        self._category_titles = {}                   # category id -> title
+        self._category_slugs = {}                    # category id -> slug
+        self._suggestions = SuggestionTrie()         # title completions for search-as-you-type
+        self._suggestion_entries = {}                # (kind, id) -> [(phrase, entry), ...] in the trie
+        self._category_items = defaultdict(set)      # category id -> menu item ids
+        self._bulk_loading = False
+
+    # Rebuilds the whole index from (id, title, slug) category rows and (id, title, slug, category_id) menu item rows
+    def build(self, categories, menu_items, version=None):
+        with self.lock:
+            self._reset()
+            # Sorting once at the end is much cheaper than inserting every token and posting in order
+            self._bulk_loading = True
+            self._suggestions.start_bulk_load()
+            for category_id, title, slug in categories:
+                self.upsert_category(category_id, title, slug)
+            for menuitem_id, title, slug, category_id in menu_items:
+                self.upsert_menu_item(menuitem_id, title, slug, category_id)
+            self._bulk_loading = False
+            self._suggestions.finish_bulk_load()
+            self._vocabulary = sorted(self._postings)
+            for by_weight in self._ranked_postings.values():
+                for entries in by_weight.values():
+                    entries.sort()
+            self.version = version
+
+    def _add_token(self, token):
+        if not self._bulk_loading:
+            bisect.insort(self._vocabulary, token)
+        for trigram in trigrams(token):
+            self._trigrams[trigram].add(token)
+
+    def _remove_token(self, token):
+        del self._postings[token]
+        del self._ranked_postings[token]
+        i = bisect.bisect_left(self._vocabulary, token)
+        if i < len(self._vocabulary) and self._vocabulary[i] == token:
+            del self._vocabulary[i]
+        for trigram in trigrams(token):
+            self._trigrams[trigram].discard(token)
+            if not self._trigrams[trigram]:
+                del self._trigrams[trigram]
+
+    def _index(self, key, title, fields):
+        self._unindex(key)
+        weights = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0), weight)
+
+        title = title.lower()
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._add_token(token)
+            self._postings[token][weight].add(key)
+            entries = self._ranked_postings[token][weight]
+            if self._bulk_loading:
+                entries.append((title, key))
+            else:
+                bisect.insort(entries, (title, key))
+        self._titles[key] = title
+        self._doc_tokens[key] = weights
+
+    def _unindex(self, key):
+        title = self._titles.pop(key, None)
+        for token, weight in self._doc_tokens.pop(key, {}).items():
+            entries = self._ranked_postings[token][weight]
+            i = bisect.bisect_left(entries, (title, key))
+            if i < len(entries) and entries[i] == (title, key):
+                del entries[i]
+            keys = self._postings[token][weight]
+            keys.discard(key)
+            if not keys:
+                del self._postings[token][weight]
+                del self._ranked_postings[token][weight]
+            if not self._postings[token]:
+                self._remove_token(token)
+
+    # The trie holds each title under its full text and under every later word, best suggestions first:
+    # titles starting with the prefix, then shorter titles, then alphabetical
+    def _suggest(self, key, title):
+        for phrase, entry in self._suggestion_entries.pop(key, ()):
+            self._suggestions.remove(phrase, entry)
+        words = tokenize(title)
+        entries = []
+        for i in range(len(words)):
+            entry = (i > 0, len(title), title.lower(), key, i)
+            entries.append((' '.join(words[i:]), entry))
+            self._suggestions.insert(' '.join(words[i:]), entry)
+        self._suggestion_entries[key] = entries
+
+    def _unsuggest(self, key):
+        for phrase, entry in self._suggestion_entries.pop(key, ()):
+            self._suggestions.remove(phrase, entry)
+
+    # The upsert/remove methods return True if anything searchable changed
+    def upsert_menu_item(self, menuitem_id, title, slug, category_id):
+        with self.lock:
+            old = self._menu_items.get(menuitem_id)
+            if old == (title, slug, category_id):
+                return False
+            if old is not None:
+                self._category_items[old[2]].discard(menuitem_id)
+            self._menu_items[menuitem_id] = (title, slug, category_id)
+            self._category_items[category_id].add(menuitem_id)
+            if old is None or old[0] != title:
+                self._suggest((MENUITEM, menuitem_id), title)
+            self._index((MENUITEM, menuitem_id), title, [
+                (title, TITLE_WEIGHT),
+                (self._category_titles.get(category_id, ''), CATEGORY_WEIGHT),
+            ])
+            return True
+
+    def remove_menu_item(self, menuitem_id):
+        with self.lock:
+            old = self._menu_items.pop(menuitem_id, None)
+            if old is None:
+                return False
+            self._category_items[old[2]].discard(menuitem_id)
+            self._unindex((MENUITEM, menuitem_id))
+            self._unsuggest((MENUITEM, menuitem_id))
+            return True
+
+    # Renaming a category also re-indexes its menu items, since they're searchable by category title
+    def upsert_category(self, category_id, title, slug):
+        with self.lock:
+            if (self._category_titles.get(category_id), self._category_slugs.get(category_id)) == (title, slug):
+                return False
+            self._category_slugs[category_id] = slug
+            if self._category_titles.get(category_id) == title:
+                return True
+            self._category_titles[category_id] = title
+            self._index((CATEGORY, category_id), title, [(title, TITLE_WEIGHT)])
+            self._suggest((CATEGORY, category_id), title)
+            for menuitem_id in self._category_items.get(category_id, ()):
+                item_title = self._menu_items[menuitem_id][0]
+                self._index((MENUITEM, menuitem_id), item_title, [(item_title, TITLE_WEIGHT), (title, CATEGORY_WEIGHT)])
+            return True
+
+    def remove_category(self, category_id):
+        with self.lock:
+            if self._category_titles.pop(category_id, None) is None:
+                return False
+            self._category_slugs.pop(category_id, None)
+            self._unindex((CATEGORY, category_id))
+            self._unsuggest((CATEGORY, category_id))
+            return True
+
+    # Returns {indexed token: score multiplier} for the indexed tokens a query token matches:
+    # itself, tokens it is a prefix of, and, only if neither exists, tokens within a typo or two of it
+    def _expand_token(self, token):
+        expansions = {}
+        if token in self._postings:
+            expansions[token] = EXACT_MATCH
+
+        i = bisect.bisect_left(self._vocabulary, token)
+        end = min(len(self._vocabulary), i + MAX_PREFIX_EXPANSIONS + 1)
+        while i < end and self._vocabulary[i].startswith(token):
+            expansions.setdefault(self._vocabulary[i], PREFIX_MATCH)
+            i += 1
+
+        typos = allowed_typos(token)
+        if not expansions and typos:
+            query_trigrams = trigrams(token)
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigrams.get(trigram, ()))
+            # Each typo can change at most 3 trigrams
+            min_shared = max(1, len(query_trigrams) - 3 * typos)
+            for candidate, count in shared.items():
+                if count >= min_shared and edit_distance(token, candidate, typos) <= typos:
+                    expansions[candidate] = FUZZY_MATCH
+
+        return expansions
+
+    # Yields (score, title, key) for every document matching the expanded query token, highest score first then by title
+    # A document matching through several indexed tokens is yielded for each, its best score first
+    def _ranked_matches(self, expansions):
+        levels = defaultdict(list)
+        for token, multiplier in expansions.items():
+            for weight, entries in self._ranked_postings[token].items():
+                levels[weight * multiplier].append(entries)
+        for score in sorted(levels, reverse=True):
+            for title, key in heapq.merge(*levels[score]):
+                yield score, title, key
+
+    # Returns up to limit (kind, id) keys matching every word of the query, best match first and then by title
+    # A document scores weight * match multiplier for the best match of each query word, summed over the words
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT):
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+
+        with self.lock:
+            expanded = [self._expand_token(token) for token in dict.fromkeys(tokens)]
+            if not all(expanded):
+                return []
+            if len(expanded) == 1:
+                return self._search_word(expanded[0], limit)
+
+            # Several words: intersect the documents matching each word, then score just those
+            # Done with set and dict operations over whole groups of documents rather than one document at a time
+            expanded.sort(key=self._match_count)
+            candidates = None
+            for expansions in expanded:
+                matching = set().union(*(keys for token in expansions for keys in self._postings[token].values()))
+                candidates = matching if candidates is None else candidates & matching
+                if not candidates:
+                    return []
+
+            totals = dict.fromkeys(candidates, 0)
+            for expansions in expanded:
+                # Lowest score first, so a document matching several ways ends up with its best score
+                levels = sorted(
+                    ((weight * multiplier, keys) for token, multiplier in expansions.items() for weight, keys in self._postings[token].items()),
+                    key=lambda level: level[0],
+                )
+                best = {}
+                for score, keys in levels:
+                    best.update(dict.fromkeys(candidates.intersection(keys), score))
+                for key, score in best.items():
+                    totals[key] += score
+
+            results = []
+            for total in sorted(set(totals.values()), reverse=True):
+                keys = [key for key, score in totals.items() if score == total]
+                results.extend(heapq.nsmallest(limit - len(results), keys, key=self._titles.__getitem__))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def _match_count(self, expansions):
+        return sum(len(keys) for token in expansions for keys in self._postings[token].values())
+
+    # A single word can match a large part of the menu, so its matches are read already ranked and reading
+    # stops after limit documents instead of scoring all of them
+    def _search_word(self, expansions, limit):
+        results = []
+        seen = set()
+        for score, title, key in self._ranked_matches(expansions):
+            if key not in seen:
+                seen.add(key)
+                results.append(key)
+                if len(results) == limit:
+                    break
+        return results
+
+    # Returns up to limit {'type', 'title', 'slug'} completions for what has been typed so far, without touching the database
+    def suggest(self, prefix, limit=SUGGESTIONS_LIMIT):
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+
+        with self.lock:
+            suggestions = []
+            seen = set()
+            for _, _, _, key, _ in self._suggestions.complete(prefix):
+                if key in seen:
+                    continue
+                seen.add(key)
+                kind, object_id = key
+                if kind == MENUITEM:
+                    title, slug, _ = self._menu_items[object_id]
+                else:
+                    title, slug = self._category_titles[object_id], self._category_slugs[object_id]
+                suggestions.append({'type': kind, 'title': title, 'slug': slug})
+                if len(suggestions) == min(limit, TOP_SUGGESTIONS):
+                    break
+            return suggestions
+
+
+search_index = SearchIndex()
+
+_rebuild_lock = threading.Lock()
+_rebuild_thread = None
+
+
+# Builds a new index from the database and swaps it in as this process's index
+# The index being replaced keeps answering searches and suggestions until then
+def rebuild_search_index(version=None):
+    global search_index
+    index = SearchIndex()
+    categories = Category.objects.values_list('id', 'title', 'slug')
+    menu_items = MenuItem.objects.values_list('id', 'title', 'slug', 'category_id')
+    index.build(categories, menu_items, version)
+    search_index = index
+
+
+def _rebuild_in_background(version):
+    try:
+        rebuild_search_index(version)
+    except Exception:
+        # The index is left as it was, the next search starts another rebuild
+        logger.exception('Rebuilding the menu search index failed')
+    finally:
+        # The thread's database connection would otherwise stay open
+        connection.close()
+
+
+# Starts rebuilding the index in a background thread, unless a rebuild is already running, and returns that thread
+def _start_rebuild(version):
+    global _rebuild_thread
+    with _rebuild_lock:
+        if _rebuild_thread is None or not _rebuild_thread.is_alive():
+            _rebuild_thread = threading.Thread(target=_rebuild_in_background, args=(version,), name='search-index-rebuild', daemon=True)
+            _rebuild_thread.start()
+        return _rebuild_thread
+
+
+# Returns the index for this process. Checking whether another process changed the menu is a single lookup on the
+# table version cache (see menu_cache.py), and when one did the index is rebuilt in the background while the current
+# one keeps serving, so a request never waits for a rebuild of an index that already exists.
+# Only a process that has no index yet (its startup build failed) waits for the first build, and not even then with wait=False
+def get_search_index(wait=True):
+    index = search_index
+    version = get_table_versions(SEARCH_TABLE)[SEARCH_TABLE][0]
+    if index.version != version:
+        rebuild = _start_rebuild(version)
+        if index.version is None and wait:
+            rebuild.join()
+            return search_index
+    return index
+
+
+# Builds the index when a server process starts (see littlelemon/wsgi.py and asgi.py), so the first searches and
+# suggestions don't pay for it. If the database isn't ready yet, the first search builds it instead
+def warm_search_index():
+    get_search_index()
+
+
+# Applies change(index) once the current transaction commits, so rolled back writes never reach the index
+# If this process's index was up to date it is updated in place and keeps up with the new counter, as long as no other
+# process bumped the counter between reading and bumping it (the bump gives version + 1). Otherwise the index may be
+# missing that other change, so it's left behind the counter and rebuilt in the background on its next use
+def update_search_index(change):
+    def apply():
+        index = search_index
+        with index.lock:
+            version = get_table_versions(SEARCH_TABLE)[SEARCH_TABLE][0]
+            up_to_date = index.version == version
+            changed = change(index) if up_to_date else True
+            if changed:
+                new_version = bump_table_version(SEARCH_TABLE)
+                if up_to_date and new_version == version + 1:
+                    index.version = new_version
+
+    transaction.on_commit(apply)
+
+
+# Runs a search and loads the matching rows by primary key, keeping the ranking order
+# Returns (menu_items, categories)
+def search_menu(query, limit=SEARCH_RESULTS_LIMIT):
+    keys = get_search_index().search(query, limit)
+    menuitem_ids = [object_id for kind, object_id in keys if kind == MENUITEM]
+    category_ids = [object_id for kind, object_id in keys if kind == CATEGORY]
+
+    menu_items = MenuItem.objects.in_bulk(menuitem_ids) if menuitem_ids else {}
+    categories = Category.objects.in_bulk(category_ids) if category_ids else {}
+    return (
+        [menu_items[object_id] for object_id in menuitem_ids if object_id in menu_items],
+        [categories[object_id] for object_id in category_ids if object_id in categories],
+    )
+
+
+# Same as search_menu, for async views (see async_views.py)
+# Checking (and, after a menu change in another process, rebuilding) the index runs in a worker thread,
+# the rows are loaded with the async ORM
+async def asearch_menu(query, limit=SEARCH_RESULTS_LIMIT):
+    index = await sync_to_async(get_search_index)()
+    keys = index.search(query, limit)
+    menuitem_ids = [object_id for kind, object_id in keys if kind == MENUITEM]
+    category_ids = [object_id for kind, object_id in keys if kind == CATEGORY]
+
+    menu_items = await MenuItem.objects.ain_bulk(menuitem_ids) if menuitem_ids else {}
+    categories = await Category.objects.ain_bulk(category_ids) if category_ids else {}
+    return (
+        [menu_items[object_id] for object_id in menuitem_ids if object_id in menu_items],
+        [categories[object_id] for object_id in category_ids if object_id in categories],
+    )
@@ -5,8 +5,14 @@ from django.utils import timezone
 from django.utils.text import slugify
 from rest_framework.validators import UniqueValidator
 from rest_framework.reverse import reverse
-from .models import Logger, UserComments, Category, MenuItem, Booking, Cart, Order, OrderItem
-from decimal import Decimal, ROUND_HALF_UP
+from rest_framework.authtoken.models import Token
+from djoser.serializers import TokenCreateSerializer as BaseTokenCreateSerializer
+from .authentication import is_token_expired
+from .roles import DELIVERY_CREW, has_role
+from .models import price_after_tax, Logger, UserComments, Category, MenuItem, Booking, Location, Cart, Order, OrderItem
+from .services import update_cart, NotInCartError
+from .inventory import OutOfStockError
+from decimal import Decimal
 from datetime import time
 import re
 import bleach
@@ -73,12 +79,15 @@ class LoggerSerializer(serializers.HyperlinkedModelSerializer):
     
     class Meta:
         model = Logger
-        fields = ['url', 'log_details_url', 'id', 'first_name', 'last_name', 'log_type', 'start_time', 'end_time', 'total_hours']
+        fields = ['url', 'log_details_url', 'id', 'first_name', 'last_name', 'date', 'log_type', 'start_time', 'end_time', 'total_hours']
         read_only_fields = ['id', 'total_hours']
         
+    # Logs that couldn't be linked to an employee have no details page
     def get_log_details_url(self, obj):
+        if obj.user_id is None:
+            return None
         request = self.context.get('request')
-        return reverse('log_details_api_view', args=[obj.user.id], request=request)
+        return f"{reverse('log_details_api_view', request=request)}?user_id={obj.user_id}"
         
     def validate_first_name(self, value):
         if not value.isalpha():
@@ -141,12 +150,12 @@ class UserCommentsSerializer(serializers.ModelSerializer):
 
 
 # Serializes and validates categories, links to category details
-class CategorySerializer(serializers.HyperlinkedModelSerializer):
+class CategorySerializer(serializers.ModelSerializer):
     category_details_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
-        fields = ['url', 'category_details_url', 'id', 'slug', 'title']
+        fields = ['category_details_url', 'id', 'slug', 'title']
         read_only_fields = ['id']
         extra_kwargs = {
             'slug': {
@@ -163,7 +172,7 @@ class CategorySerializer(serializers.HyperlinkedModelSerializer):
         
     def get_category_details_url(self, obj):
         request = self.context.get('request')
-        return reverse('category_details_api_view', args=[obj.slug], request=request)
+        return f"{reverse('category_details_api_view', request=request)}?slug={obj.slug}"
     
     # Ensuring slug only has lowercase letters, numbers, and hyphens. Cannot be blank or only hyphens
     def validate_slug(self, value):
@@ -193,7 +202,7 @@ class CategorySerializer(serializers.HyperlinkedModelSerializer):
     
 
 # Serializes and validates menu items, links to menu item details
-class MenuItemSerializer(serializers.HyperlinkedModelSerializer):
+class MenuItemSerializer(serializers.ModelSerializer):
     slug = serializers.SlugField(required=False, allow_blank=True, allow_null=True)
     stock = serializers.IntegerField(source='inventory')
     price_after_tax = serializers.SerializerMethodField(method_name='calculate_tax')
@@ -203,7 +212,7 @@ class MenuItemSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = MenuItem
-        fields = ['url', 'menuitem_details_url', 'id', 'slug', 'title', 'unit_price', 'price_after_tax', 'category', 'featured', 'stock']
+        fields = ['menuitem_details_url', 'id', 'slug', 'title', 'unit_price', 'price_after_tax', 'category', 'featured', 'stock']
         read_only_fields = ['id']
         extra_kwargs = {
             'unit_price': {'min_value': Decimal('0.01'), 'error_messages': {'min_value': 'Price must be greater than zero.'}},
@@ -222,7 +231,7 @@ class MenuItemSerializer(serializers.HyperlinkedModelSerializer):
         
     def get_menuitem_details_url(self, obj):
         request = self.context.get('request')
-        return reverse('menu_item_api_view', args=[obj.slug], request=request)
+        return f"{reverse('menu_item_api_view', request=request)}?slug={obj.slug}"
     
     # Ensuring slug only has lowercase letters, numbers, and hyphens. Cannot be blank or only hyphens
     def validate_slug(self, value):
@@ -252,7 +261,7 @@ class MenuItemSerializer(serializers.HyperlinkedModelSerializer):
     
     # Calculates price after tax
     def calculate_tax(self, menuitem):
-        return menuitem.unit_price * Decimal(1.1)
+        return price_after_tax(menuitem.unit_price)
     
 
 # Serializes and validates carts, links to menu item details
@@ -261,14 +270,12 @@ class CartSerializer(serializers.HyperlinkedModelSerializer):
     menuitem_title = serializers.CharField(write_only=True) # Allows for the input of a menuitem by a user
     unit_price = serializers.ReadOnlyField() # Shows but does not allow editing/input
     price = serializers.ReadOnlyField() # Shows but does not allow editing/input
-    subtotal = serializers.SerializerMethodField() # Shows but does not allow editing/input
-    price_after_tax = serializers.SerializerMethodField() # Shows but does not allow editing/input
     menuitem_details_url = serializers.SerializerMethodField() # For hyperlink
     
     class Meta:
         model = Cart
-        fields = ['url', 'menuitem_details_url', 'id', 'user_username', 'menuitem_title', 'quantity', 'unit_price', 'price', 'subtotal', 'price_after_tax']
-        read_only_fields = ['id', 'user_username', 'unit_price', 'price', 'subtotal', 'price_after_tax']
+        fields = ['url', 'menuitem_details_url', 'id', 'user_username', 'menuitem_title', 'quantity', 'unit_price', 'price']
+        read_only_fields = ['id', 'user_username', 'unit_price', 'price']
         extra_kwargs = {
             'quantity': {'min_value': 1, 'error_messages': {'min_value': 'Quantity must be greater than zero.'}},
         }
@@ -278,20 +285,7 @@ class CartSerializer(serializers.HyperlinkedModelSerializer):
         request = self.context.get('request')
         return reverse('menu_item_api_view', args=[obj.menuitem.slug], request=request)
     
-    # Calculates subtotal    
-    def get_subtotal(self, obj):
-        user = self.context['request'].user
-        user_cart_items = Cart.objects.filter(user=user)
-        subtotal = sum(item.price for item in user_cart_items)
-        return Decimal(subtotal)
-    
-    # Calculates price after tax
-    def get_price_after_tax(self, obj):
-        subtotal = self.get_subtotal(obj)
-        price_after_tax = subtotal * Decimal(1.1)
-        return price_after_tax
-        
-    # Checks if the user has the menuitem in their cart already or not
+    # Adds the menuitem to the user's cart, or adds to its quantity if it's already there
     def create(self, validated_data):
         user = self.context['request'].user
         title = validated_data.pop('menuitem_title')
@@ -302,19 +296,12 @@ class CartSerializer(serializers.HyperlinkedModelSerializer):
         except MenuItem.DoesNotExist:
             raise serializers.ValidationError({'menuitem_title': 'MenuItem with this title does not exist. Please check spelling and letter-case.'})
         
-        # If item not in cart, the entry is created
-        cart_item, created = Cart.objects.get_or_create(
-            user = user,
-            menuitem = menuitem,
-            defaults = {
-                'quantity': validated_data.get('quantity', 1),
-            }
-        )
-        
-        # If item in cart the quantity is increased instead of a new entry being created
-        if not created:
-            cart_item.quantity += validated_data.get('quantity', 1)
-            cart_item.save()
+        # Adds the item or increases its quantity, holding the stock for it
+        try:
+            update_cart(user, {menuitem.id: validated_data.get('quantity', 1)}, add=True)
+        except OutOfStockError:
+            raise serializers.ValidationError({'quantity': f'Requested quantity exceeds available stock for {menuitem.title}.'})
+        cart_item = Cart.objects.with_details().get(user=user, menuitem=menuitem)
         
         return cart_item
     
@@ -326,87 +313,136 @@ class CartSerializer(serializers.HyperlinkedModelSerializer):
         representation['unit_price'] = "{:.2f}".format(instance.menuitem.unit_price)
         # Format price, total for the menuitems in the cart (unit_price * quantity), and show in output
         representation['price'] = "{:.2f}".format(instance.price)
-        # Format subtotal and show in output 
-        representation['subtotal'] = "{:.2f}".format(self.get_subtotal(instance))
-        # Format price after tax for menu items in cart (subtotal * Decimal(1.1)), and show in output
-        representation['price_after_tax'] = "{:.2f}".format(self.get_price_after_tax(instance))
         # Show category in output
         representation['category'] = instance.menuitem.category.title
         
         return representation
     
 
+# Serializes a user's whole cart: the cart rows plus the subtotal and price after tax for the cart
+# Totals are worked out once per response with a single aggregate query instead of once per row
+# Expects a Cart queryset, ideally from Cart.objects.with_details()
+class CartSummarySerializer(serializers.BaseSerializer):
+    def to_representation(self, cart_items):
+        subtotal = cart_items.subtotal()
+        return {
+            'items': CartSerializer(cart_items, many=True, context=self.context).data,
+            'subtotal': "{:.2f}".format(subtotal),
+            'price_after_tax': "{:.2f}".format(price_after_tax(subtotal)),
+        }
+    
+
+# One menu item quantity to set in the bulk cart update, adds the item if it isn't in the cart yet
+class CartItemQuantitySerializer(serializers.Serializer):
+    menuitem = serializers.CharField(help_text='Menu item title.')
+    quantity = serializers.IntegerField(min_value=1, max_value=32767, error_messages={'min_value': 'Quantity must be greater than zero.'})
+    
+
+# Validates a bulk cart update: {"upsert": [{"menuitem": <title>, "quantity": <n>}, ...], "remove": [<title>, ...]}
+# All menu items are looked up with one query, and if anything is wrong nothing is changed and every problem is reported
+# save() applies the update through services.update_cart, which also checks and holds the stock
+class CartBulkUpdateSerializer(serializers.Serializer):
+    upsert = CartItemQuantitySerializer(many=True, required=False, default=list)
+    remove = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    
+    def validate(self, data):
+        upsert_titles = [item['menuitem'] for item in data['upsert']]
+        remove_titles = data['remove']
+        if not upsert_titles and not remove_titles:
+            raise serializers.ValidationError("Provide menu items to upsert and/or remove.")
+        
+        errors = {}
+        duplicates = {title for title in upsert_titles if upsert_titles.count(title) > 1}
+        if duplicates:
+            errors['upsert'] = [f"Menu item '{title}' is listed more than once." for title in sorted(duplicates)]
+        both = set(upsert_titles) & set(remove_titles)
+        if both:
+            errors['remove'] = [f"Menu item '{title}' can't be both upserted and removed." for title in sorted(both)]
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        menuitems = {menuitem.title: menuitem for menuitem in MenuItem.objects.filter(title__in=set(upsert_titles) | set(remove_titles)).only('id', 'title')}
+        
+        for item in data['upsert']:
+            if item['menuitem'] not in menuitems:
+                errors.setdefault('upsert', []).append(f"MenuItem '{item['menuitem']}' does not exist. Please check spelling and letter-case.")
+        for title in remove_titles:
+            if title not in menuitems:
+                errors.setdefault('remove', []).append(f"MenuItem '{title}' does not exist. Please check spelling and letter-case.")
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        data['menuitems'] = menuitems
+        return data
+    
+    def save(self):
+        menuitems = self.validated_data['menuitems']
+        quantities = {menuitems[item['menuitem']].id: item['quantity'] for item in self.validated_data['upsert']}
+        remove_ids = {menuitems[title].id: title for title in self.validated_data['remove']}
+        try:
+            update_cart(self.context['request'].user, quantities, remove_ids)
+        except NotInCartError as error:
+            raise serializers.ValidationError({'remove': [f"Item '{remove_ids[menuitem_id]}' not found in your cart." for menuitem_id in error.menuitem_ids]})
+        except OutOfStockError as error:
+            raise serializers.ValidationError({'upsert': [f"Requested quantity exceeds available stock for {title}." for title in error.titles]})
+    
+
 # Used to represent the details of a single order item
 # Serializes and validates order item, links to menu item details
-class OrderItemSerializer(serializers.HyperlinkedModelSerializer):
+# Orders, menu items and users have no detail routes to hyperlink to, so they're referenced by id
+class OrderItemSerializer(serializers.ModelSerializer):
     menuitem_title = serializers.ReadOnlyField(source='menuitem.title')
     price = serializers.SerializerMethodField()
     menuitem_details_url = serializers.SerializerMethodField()
     
     class Meta:
         model = OrderItem
-        fields = ['url', 'menuitem_details_url', 'id', 'order', 'menuitem', 'menuitem_title', 'quantity', 'price']
-        read_only_fields = ['id', 'order', 'menuitem_title', 'price']
+        fields = ['menuitem_details_url', 'id', 'order', 'menuitem', 'menuitem_title', 'quantity', 'unit_price', 'price']
+        read_only_fields = ['id', 'order', 'menuitem_title', 'unit_price', 'price']
         extra_kwargs = {
             'quantity': {'min_value': 1, 'error_messages': {'min_value': 'Quantity must be at least 1.'}},
         }
     
     def get_menuitem_details_url(self, obj):
         request = self.context.get('request')
-        return reverse('menu_item_api_view', args=[obj.menuitem.slug], request=request)
+        return f"{reverse('menu_item_api_view', request=request)}?slug={obj.menuitem.slug}"
     
     
+    # Uses the price stored when the order was placed
     def get_price(self, order_item: OrderItem):
-        price = order_item.quantity * order_item.menuitem.unit_price
-        return price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return order_item.price
     
 
 # Used to represent the entire order, which may include a list of OrderItem instances
 # Serializes and validates orders, links to order details
-class OrderSerializer(serializers.HyperlinkedModelSerializer):
+# Users are referenced by id, as in OrderItemSerializer
+class OrderSerializer(serializers.ModelSerializer):
     # For each Order instance being serialized, the serializer should include a list of all related OrderItem instances serialized by OrderItemSerializer
     # orderitem_set refers to a reverse relation from a foreign key
     # Used to include all related 'OrderItem' instances within the serialization of an 'Order'
     order_items = OrderItemSerializer(source='orderitem_set', many=True, read_only=True)
     user_username = serializers.ReadOnlyField(source='user.username')
     delivery_crew_username = serializers.CharField(write_only=True, required=False)
-    subtotal = serializers.SerializerMethodField()
-    price_after_tax = serializers.SerializerMethodField()
+    price_after_tax = serializers.DecimalField(source='total', max_digits=10, decimal_places=2, read_only=True)
     order_details_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Order
-        fields = ['url', 'order_details_url', 'id', 'user', 'user_username', 'delivery_crew', 'delivery_crew_username', 'order_status', 'ready_for_delivery', 'time', 'order_items', 'subtotal', 'price_after_tax']
-        read_only_fields = ['id', 'user', 'user_username', 'subtotal', 'price_after_tax' 'order_items']
+        fields = ['order_details_url', 'id', 'user', 'user_username', 'delivery_crew', 'delivery_crew_username', 'order_status', 'ready_for_delivery', 'time', 'order_items', 'subtotal', 'tax', 'price_after_tax']
+        read_only_fields = ['id', 'user', 'user_username', 'subtotal', 'tax', 'price_after_tax', 'order_items']
         extra_kwargs = {
             'time': {'error_messages': {'required': 'Please provide the time of the order.'}},
         }
     
     def get_order_details_url(self, obj):
         request = self.context.get('request')
-        return reverse('order_details_api_view', args=[obj.id], request=request)
-    
-    def get_subtotal(self, order: Order):
-        subtotal = sum(Decimal(item.quantity) * Decimal(item.menuitem.unit_price) for item in order.orderitem_set.all())
-        return subtotal.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    
-    def get_price_after_tax(self, order: Order):
-        subtotal = self.get_subtotal(order)
-        price_after_tax = subtotal * Decimal(1.1)
-        return price_after_tax.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['subtotal'] = "{:.2f}".format(self.get_subtotal(instance))
-        representation['price_after_tax'] = "{:.2f}".format(self.get_price_after_tax(instance))
-        
-        return representation
+        return f"{reverse('order_details_api_view', request=request)}?order_id={obj.id}"
     
     # Ensure user exists and is a Delivery crew member
     def validate_delivery_crew_username(self, value):
         try:
             user = User.objects.get(username=value)
-            if not user.groups.filter(name='Delivery crew').exists():
+            if not has_role(user, DELIVERY_CREW):
                 raise serializers.ValidationError("User is not a Delivery crew member.")
             return
         except User.DoesNotExist:
@@ -442,10 +478,11 @@ class OrderSerializer(serializers.HyperlinkedModelSerializer):
 # Serializes and validates bookings, links to user instance
 class BookingSerializer(serializers.HyperlinkedModelSerializer):
     user_details_url = serializers.SerializerMethodField()
+    location = serializers.SlugRelatedField(slug_field='slug', queryset=Location.objects.all(), required=False)
     
     class Meta:
         model = Booking
-        fields = ['url', 'user_details_url', 'id', 'name', 'no_of_guests', 'booking_date', 'reservation_status']
+        fields = ['url', 'user_details_url', 'id', 'name', 'no_of_guests', 'booking_date', 'location', 'reservation_status']
         read_only_fields = ['id']
         
     def get_user_details_url(self, obj):
@@ -462,4 +499,14 @@ class BookingSerializer(serializers.HyperlinkedModelSerializer):
     def validate_booking_date(self, value):
             if value < timezone.now():
                 raise serializers.ValidationError("Booking date must be in the future.")
-            return value
\ No newline at end of file
+            return value
+
+
+# Used by djoser's token/login, deletes the user's expired token so djoser issues a new one instead of returning it
+class TokenCreateSerializer(BaseTokenCreateSerializer):
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        token = Token.objects.filter(user=self.user).first()
+        if token is not None and is_token_expired(token.created):
+            token.delete()
+        return attrs
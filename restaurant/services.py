@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import MenuItem, Cart, Order, OrderItem
+from .inventory import take_stock, return_stock, hold_expiry
+
+User = get_user_model()
+
+
+# Raised when a user tries to place an order with nothing in their cart
+class EmptyCartError(Exception):
+    pass
+
+
+# Raised when items to remove aren't in the user's cart, menuitem_ids holds the missing ones
+class NotInCartError(Exception):
+    def __init__(self, menuitem_ids=()):
+        self.menuitem_ids = menuitem_ids
+        super().__init__(f"Not in cart: {', '.join(str(menuitem_id) for menuitem_id in menuitem_ids)}")
+
+
+# A user's cart changes and checkouts run one at a time, by locking their user row first
+# Keeps two requests from the same user from both taking stock for the same cart row
+def _lock_user(user):
+    User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).first()
+
+
+# Sets cart quantities ({menuitem_id: quantity}) and removes menu items from the user's cart in one transaction
+# With add=True the quantities are added to what's already in the cart instead
+# Each cart row holds stock for its whole quantity (see inventory.py), so only the difference is taken or given back
+# Used by the bulk cart endpoint, cart_api_view, cart_view and menu_view
+# Uses the same number of queries however many items change: lock user, lock cart rows, take stock, return stock,
+# one DELETE ... WHERE id IN (...) and one INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE on the Cart (menuitem, user) key
+# Nothing changes if any item to remove isn't in the cart (NotInCartError) or an item is short of stock (OutOfStockError)
+def update_cart(user, quantities=None, remove_ids=(), add=False):
+    quantities = quantities or {}
+    remove_ids = set(remove_ids)
+    with transaction.atomic():
+        _lock_user(user)
+        rows = {
+            row.menuitem_id: row
+            for row in Cart.objects.select_for_update().filter(user=user, menuitem_id__in=set(quantities) | remove_ids).only('id', 'menuitem_id', 'quantity', 'reserved_quantity')
+        }
+        missing = remove_ids - set(rows)
+        if missing:
+            raise NotInCartError(sorted(missing))
+
+        if add:
+            quantities = {menuitem_id: quantity + (rows[menuitem_id].quantity if menuitem_id in rows else 0) for menuitem_id, quantity in quantities.items()}
+
+        held = {menuitem_id: rows[menuitem_id].reserved_quantity if menuitem_id in rows else 0 for menuitem_id in quantities}
+        take_stock({menuitem_id: quantity - held[menuitem_id] for menuitem_id, quantity in quantities.items()})
+        returned = {menuitem_id: held[menuitem_id] - quantity for menuitem_id, quantity in quantities.items()}
+        returned.update({menuitem_id: rows[menuitem_id].reserved_quantity for menuitem_id in remove_ids})
+        return_stock(returned)
+
+        if remove_ids:
+            Cart.objects.filter(id__in=[rows[menuitem_id].id for menuitem_id in remove_ids]).delete()
+        if quantities:
+            expires = hold_expiry()
+            Cart.objects.bulk_create(
+                [
+                    Cart(user=user, menuitem_id=menuitem_id, quantity=quantity, reserved_quantity=quantity, hold_expires_at=expires)
+                    for menuitem_id, quantity in quantities.items()
+                ],
+                update_conflicts=True,
+                update_fields=['quantity', 'reserved_quantity', 'hold_expires_at'],
+                # MySQL always upserts on whichever unique key conflicts and doesn't accept a target
+                unique_fields=['menuitem', 'user'] if connection.features.supports_update_conflicts_with_target else None,
+            )
+
+
+# Turns the user's cart into an order, used by both orders_api_view and orders_view
+# The cart's stock is normally already held, only rows whose hold expired need stock taken again (OutOfStockError if it's gone)
+# Uses the same number of queries no matter how many items are in the cart:
+# lock user, lock cart, take any missing stock, load prices, insert order, bulk insert order items, delete cart
+def place_order(user):
+    with transaction.atomic():
+        _lock_user(user)
+        cart_items = list(Cart.objects.select_for_update().filter(user=user).order_by('menuitem_id'))
+        if not cart_items:
+            raise EmptyCartError()
+
+        take_stock({item.menuitem_id: item.quantity - item.reserved_quantity for item in cart_items})
+
+        # Each order item keeps the menu price at the time of ordering
+        menuitems = MenuItem.objects.only('id', 'title', 'unit_price').in_bulk([item.menuitem_id for item in cart_items])
+        order_items = [
+            OrderItem(menuitem=menuitems[item.menuitem_id], quantity=item.quantity, unit_price=menuitems[item.menuitem_id].unit_price)
+            for item in cart_items
+        ]
+
+        order = Order(user=user, order_status=False, ready_for_delivery=False, time=timezone.now().date())
+        order.calculate_totals(order_items)
+        order.save()
+
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        # The held stock now belongs to the order
+        Cart.objects.filter(id__in=[item.id for item in cart_items]).delete()
+
+    return order
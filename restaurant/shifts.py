@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q, Sum, Count
+from .models import Logger
+
+User = get_user_model()
+
+# Shift analytics for managers: hours worked per employee per day, week or pay period, with overtime and totals
+# The hours are summed in the database, one GROUP BY (user, date) over the logger_user_date_index, so only one row
+# per employee per day comes back however many shifts were logged. Weeks and pay periods are made from those day rows.
+# A log counts as a shift once it has both a start and an end time, shifts ending at midnight count up to midnight.
+PERIODS = ['day', 'week', 'pay_period']
+
+# Pay periods are PAY_PERIOD_DAYS long and one of them starts on PAY_PERIOD_START
+PAY_PERIOD_START = date.fromisoformat(str(getattr(settings, 'PAY_PERIOD_START', '2024-01-01')))
+PAY_PERIOD_DAYS = getattr(settings, 'PAY_PERIOD_DAYS', 14)
+
+OVERTIME_DAILY_HOURS = getattr(settings, 'OVERTIME_DAILY_HOURS', 8)
+OVERTIME_WEEKLY_HOURS = getattr(settings, 'OVERTIME_WEEKLY_HOURS', 40)
+
+# Longest date range one request can cover
+MAX_RANGE_DAYS = 366
+
+
+# Returns (first day, last day) of the period the day falls in
+def period_bounds(day, period):
+    if period == 'day':
+        return day, day
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = PAY_PERIOD_START + timedelta(days=(day - PAY_PERIOD_START).days // PAY_PERIOD_DAYS * PAY_PERIOD_DAYS)
+    return start, start + timedelta(days=PAY_PERIOD_DAYS - 1)
+
+
+def overtime_threshold(period):
+    if period == 'day':
+        return OVERTIME_DAILY_HOURS
+    if period == 'week':
+        return OVERTIME_WEEKLY_HOURS
+    return OVERTIME_WEEKLY_HOURS * PAY_PERIOD_DAYS / 7
+
+
+# Returns [(user_id, date, hours, shifts)] for the logged shifts between start and end (inclusive), ordered by user and date
+def daily_hours(start, end, user_id=None):
+    logs = Logger.objects.filter(
+        user__isnull=False, date__range=(start, end), start_time__isnull=False, end_time__isnull=False
+    )
+    if user_id is not None:
+        logs = logs.filter(user_id=user_id)
+
+    days = logs.values('user_id', 'date').annotate(
+        worked=Sum(F('end_time') - F('start_time')),
+        # end_time - start_time is negative for shifts that end at midnight, they're given their missing day back below
+        overnight=Count('id', filter=Q(end_time__lt=F('start_time'))),
+        shifts=Count('id'),
+    ).order_by('user_id', 'date')
+
+    return [
+        (day['user_id'], day['date'], (day['worked'] + timedelta(days=day['overnight'])).total_seconds() / 3600, day['shifts'])
+        for day in days
+    ]
+
+
+def _hours(value):
+    return round(value, 2)
+
+
+# Returns the hours worked by each employee between start and end (inclusive), grouped by period ('day', 'week' or 'pay_period')
+# Periods at the ends of the range may be partial, only the hours logged within the range are counted
+def shift_analytics(start, end, period='week', user_id=None):
+    threshold = overtime_threshold(period)
+    employees = {}
+
+    for employee_id, day, hours, shifts in daily_hours(start, end, user_id):
+        employee = employees.setdefault(employee_id, {'periods': {}})
+        bounds = period_bounds(day, period)
+        bucket = employee['periods'].setdefault(bounds, {'hours': 0.0, 'shifts': 0})
+        bucket['hours'] += hours
+        bucket['shifts'] += shifts
+
+    names = {
+        row[0]: row[1:] for row in User.objects.filter(id__in=employees).values_list('id', 'username', 'first_name', 'last_name')
+    }
+
+    results = []
+    total_hours = total_overtime = 0.0
+    for employee_id, employee in employees.items():
+        username, first_name, last_name = names.get(employee_id, ('', '', ''))
+        periods = []
+        for (period_start, period_end), bucket in employee['periods'].items():
+            overtime = max(bucket['hours'] - threshold, 0)
+            periods.append({
+                'start': period_start,
+                'end': period_end,
+                'hours': _hours(bucket['hours']),
+                'shifts': bucket['shifts'],
+                'overtime': overtime > 0,
+                'overtime_hours': _hours(overtime),
+            })
+        hours = sum(bucket['hours'] for bucket in employee['periods'].values())
+        overtime = sum(period['overtime_hours'] for period in periods)
+        total_hours += hours
+        total_overtime += overtime
+        results.append({
+            'user_id': employee_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'total_hours': _hours(hours),
+            'overtime_hours': _hours(overtime),
+            'periods': periods,
+        })
+
+    return {
+        'period': period,
+        'from': start,
+        'to': end,
+        'overtime_threshold_hours': _hours(threshold),
+        'employees': results,
+        'total_hours': _hours(total_hours),
+        'overtime_hours': _hours(total_overtime),
+    }
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import Category, MenuItem, Booking
+from .menu_cache import MENUITEM_TABLE, CATEGORY_TABLE, invalidate_table
+from .roles import clear_roles, invalidate_roles
+from .inventory import release_user_holds
+from .search import update_search_index
+from .capacity import update_occupancy, release_booking
+from .authentication import forget_tokens
+from .token_cache import token_cache
+from .access_tokens import revoke_user_access_tokens
+
+User = get_user_model()
+
+
+# Keeps the shared role cache in sync with group membership
+# Covers both directions: user.groups.add/remove/clear and group.user_set.add/remove/clear (used by the employee, manager and delivery crew views)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            clear_roles(instance)
+            invalidate_roles([instance.pk])
+        return
+
+    # Reverse side: instance is the Group, pk_set holds the user ids
+    if action == 'pre_clear':
+        # The memberships are gone after the clear, so remember who was in the group beforehand
+        instance._roles_cleared_user_ids = list(instance.customuser_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_roles(getattr(instance, '_roles_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_roles(pk_set or [])
+
+
+# Renaming a group changes the role names of everyone in it
+@receiver(pre_save, sender=Group)
+def invalidate_roles_on_group_rename(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    old_name = Group.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+    if old_name is not None and old_name != instance.name:
+        invalidate_roles(list(instance.customuser_set.values_list('pk', flat=True)))
+
+
+# Deleting a group removes its memberships without sending m2m_changed
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_delete(sender, instance, **kwargs):
+    invalidate_roles(list(instance.customuser_set.values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_roles_on_user_delete(sender, instance, **kwargs):
+    invalidate_roles([instance.pk])
+
+
+# The user's cart rows are deleted with them, so the stock they held goes back on sale first
+@receiver(pre_delete, sender=User)
+def release_inventory_on_user_delete(sender, instance, **kwargs):
+    release_user_holds(instance.pk)
+
+
+# Keeps the per slot occupancy counters in step with bookings, see capacity.py
+# Booking.save runs in a transaction, so a booking that doesn't fit (SlotFullError) isn't saved and nothing changes
+@receiver(pre_save, sender=Booking)
+def update_occupancy_on_booking_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_occupancy(instance)
+
+
+# Deletes (including queryset deletes) run in a transaction too
+@receiver(post_delete, sender=Booking)
+def release_seats_on_booking_delete(sender, instance, **kwargs):
+    release_booking(instance)
+
+
+# Any change to the menu bumps that table's change counter, which makes the cached menu snapshots and ETags stale
+# This also covers the menu_item_delete_* and category_delete_* views, which delete through the model
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_items_on_change(sender, **kwargs):
+    invalidate_table(MENUITEM_TABLE)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories_on_change(sender, **kwargs):
+    invalidate_table(CATEGORY_TABLE)
+
+
+# Keeps the menu search index and its suggestions in step with titles, slugs and category membership
+# The index is only touched after the transaction commits, and saves that don't change anything searchable
+# (e.g. a price or stock change) leave it and its counter alone
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, **kwargs):
+    menuitem_id, title, slug, category_id = instance.pk, instance.title, instance.slug, instance.category_id
+    update_search_index(lambda index: index.upsert_menu_item(menuitem_id, title, slug, category_id))
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, **kwargs):
+    menuitem_id = instance.pk
+    update_search_index(lambda index: index.remove_menu_item(menuitem_id))
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    category_id, title, slug = instance.pk, instance.title, instance.slug
+    update_search_index(lambda index: index.upsert_category(category_id, title, slug))
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    category_id = instance.pk
+    update_search_index(lambda index: index.remove_category(category_id))
+
+
+# Deleted tokens (logout, rotation, expiry, password change) stop authenticating straight away in this process
+# The access tokens issued for them are revoked as well, see access_tokens.py
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_tokens([instance.key])
+    revoke_user_access_tokens([instance.user_id])
+
+
+# Any change to a user drops the copy kept in the token cache
+# A new password or deactivation revokes the user's API token and access tokens, so other sessions holding them have to log in again
+@receiver(post_save, sender=User)
+def forget_user_on_change(sender, instance, created, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.forget_users([user_id]))
+    if not created and (getattr(instance, '_password', None) is not None or not instance.is_active):
+        Token.objects.filter(user=instance).delete()
+        revoke_user_access_tokens([user_id])
+
+
+# Logging out (CustomLogoutView, djoser's token/logout) revokes the user's API token and access tokens too
+@receiver(user_logged_out)
+def revoke_token_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        Token.objects.filter(user=user).delete()
+        revoke_user_access_tokens([user.pk])
@@ -0,0 +1,135 @@
+import bisect
+import heapq
+
+# Compressed prefix trie (radix tree) for search-as-you-type, kept inside the search index (see search.py)
+# Every title is inserted under its full text and under each later word, so "chi" completes both
+# "Chicken Souvlaki" and "Grilled Chicken". Each node keeps the best TOP_SUGGESTIONS entries of its subtree,
+# so a lookup is a walk down the prefix plus reading one list, however many titles share the prefix.
+
+TOP_SUGGESTIONS = 20
+
+
+class _Node:
+    __slots__ = ('label', 'children', 'entries', 'top')
+
+    def __init__(self, label=''):
+        self.label = label          # edge text leading to this node
+        self.children = {}          # first character of the child's label -> child
+        self.entries = set()        # entries whose phrase ends exactly here
+        self.top = []               # best entries in this subtree, sorted, at most TOP_SUGGESTIONS
+
+
+def _common_prefix_length(a, b):
+    if a.startswith(b):
+        return len(b)
+    length = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b:
+            break
+        length += 1
+    return length
+
+
+class SuggestionTrie:
+    def __init__(self):
+        self._root = _Node()
+        self._bulk_loading = False
+
+    # Entries are sortable tuples, smaller is a better suggestion, and must be unique across phrases
+    def insert(self, phrase, entry):
+        node = self._root
+        path = [node]
+        rest = phrase
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                child = _Node(rest)
+                node.children[rest[0]] = child
+                node, rest = child, ''
+            else:
+                length = _common_prefix_length(rest, child.label)
+                if length < len(child.label):
+                    # Split the edge, the new middle node starts with a copy of the child's best entries
+                    middle = _Node(child.label[:length])
+                    middle.top = list(child.top)
+                    child.label = child.label[length:]
+                    middle.children[child.label[0]] = child
+                    node.children[middle.label[0]] = middle
+                    child = middle
+                node, rest = child, rest[length:]
+            path.append(node)
+
+        node.entries.add(entry)
+        if not self._bulk_loading:
+            for path_node in path:
+                i = bisect.bisect_left(path_node.top, entry)
+                if i < TOP_SUGGESTIONS and (i == len(path_node.top) or path_node.top[i] != entry):
+                    path_node.top.insert(i, entry)
+                    del path_node.top[TOP_SUGGESTIONS:]
+
+    def remove(self, phrase, entry):
+        node = self._root
+        path = [node]
+        rest = phrase
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None or not rest.startswith(child.label):
+                return
+            node, rest = child, rest[len(child.label):]
+            path.append(node)
+
+        if entry not in node.entries:
+            return
+        node.entries.discard(entry)
+
+        # Walk back up, dropping empty nodes, merging nodes left with a single child and refreshing the best entries
+        for depth in range(len(path) - 1, 0, -1):
+            node, parent = path[depth], path[depth - 1]
+            if not node.entries and not node.children:
+                del parent.children[node.label[0]]
+                continue
+            if not node.entries and len(node.children) == 1:
+                (child,) = node.children.values()
+                child.label = node.label + child.label
+                parent.children[child.label[0]] = child
+                path[depth] = child
+                continue
+            if entry in node.top:
+                self._refresh(node)
+        if entry in self._root.top:
+            self._refresh(self._root)
+
+    def _refresh(self, node):
+        node.top = heapq.nsmallest(TOP_SUGGESTIONS, set().union(node.entries, *(child.top for child in node.children.values())))
+
+    # Fills in every node's best entries in one pass after a bulk load
+    def finish_bulk_load(self):
+        self._bulk_loading = False
+        stack = [(self._root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                self._refresh(node)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+
+    def start_bulk_load(self):
+        self._bulk_loading = True
+
+    # Returns the best entries (at most TOP_SUGGESTIONS) whose phrase starts with prefix
+    def complete(self, prefix):
+        node = self._root
+        rest = prefix
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            if rest.startswith(child.label):
+                rest = rest[len(child.label):]
+            elif child.label.startswith(rest):
+                rest = ''
+            else:
+                return []
+            node = child
+        return node.top
@@ -1,3 +1,211 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from . import async_views
+from .inventory import OutOfStockError
+from .models import Category, MenuItem, Cart, Order, OrderItem
+from .services import EmptyCartError, place_order, update_cart
+from .throttles import MenuRateThrottle
 
-# Create your tests here.
+User = get_user_model()
+
+
+# Listing orders loads each page's orders, users, delivery crew and items in a fixed number of queries,
+# however many orders (and items per order) are on the page
+class OrdersQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(username='customer', password='password')
+        category = Category.objects.create(title='Mains')
+        self.menuitems = [
+            MenuItem.objects.create(title=f'Dish {i}', unit_price=Decimal('9.99'), category=category, inventory=100)
+            for i in range(4)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, time=timezone.now().date())
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menuitem=menuitem, quantity=2, unit_price=menuitem.unit_price)
+                for menuitem in self.menuitems
+            ])
+
+    def get_orders(self):
+        response = self.client.get(reverse('orders_api_view'), {'page_size': 50}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.create_orders(1)
+        # Warms the role and table version caches, so both counted requests start from the same state
+        self.get_orders()
+        with CaptureQueriesContext(connection) as one_order:
+            response = self.get_orders()
+        self.assertEqual(len(response.data['results']), 1)
+
+        self.create_orders(49)
+        with self.assertNumQueries(len(one_order)):
+            response = self.get_orders()
+        self.assertEqual(len(response.data['results']), 50)
+
+
+
+# The menu API builds a page in a fixed number of queries however many items are on it, in both the sync view and
+# its async version (async_views.py), and serves a page that's already in the menu snapshot cache without any
+class MenuQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(title='Mains')
+        self.created = 0
+
+    def create_menu_items(self, count):
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Dish {i}', slug=f'dish-{i}', unit_price=Decimal('9.99'), category=self.category, inventory=10)
+            for i in range(self.created, self.created + count)
+        ])
+        self.created += count
+
+    def get_menu(self):
+        response = self.client.get(reverse('menu_api_view'), {'page_size': 50}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def get_menu_async(self):
+        request = AsyncRequestFactory().get(reverse('menu_api_view'), {'page_size': 50}, headers={'accept': 'application/json'})
+        response = async_to_sync(async_views.menu_api_view)(request)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def assert_query_count_does_not_grow(self, get_menu):
+        self.create_menu_items(1)
+        # Warms the table version cache, the snapshots it leaves behind are cleared before each counted request
+        get_menu()
+        cache.clear()
+        with CaptureQueriesContext(connection) as one_item:
+            self.assertEqual(len(get_menu()['results']), 1)
+
+        self.create_menu_items(49)
+        cache.clear()
+        with self.assertNumQueries(len(one_item)):
+            self.assertEqual(len(get_menu()['results']), 50)
+
+        # Served from the snapshot cached by the last request
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_menu()['results']), 50)
+
+    def test_query_count_does_not_grow_with_menu_items(self):
+        self.assert_query_count_does_not_grow(self.get_menu)
+
+    def test_async_query_count_does_not_grow_with_menu_items(self):
+        self.assert_query_count_does_not_grow(self.get_menu_async)
+
+
+
+
+# The async menu view pages through the menu exactly like the sync one: same items, same cursors
+class MenuPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(title='Mains')
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Dish {i}', slug=f'dish-{i}', unit_price=Decimal('9.99'), category=category) for i in range(10)
+        ])
+
+    def walk(self, get):
+        pages, url = [], f"{reverse('menu_api_view')}?page_size=3"
+        while url:
+            # Both views share the menu snapshots, so each page is built by the view being tested
+            cache.clear()
+            page = json.loads(get(url).content)
+            pages.append(([item['id'] for item in page['results']], page['next'], page['previous']))
+            url = page['next']
+        return pages
+
+    def test_async_pages_match_sync_pages(self):
+        sync_pages = self.walk(lambda url: self.client.get(url, headers={'accept': 'application/json'}))
+        async_pages = self.walk(lambda url: async_to_sync(async_views.menu_api_view)(AsyncRequestFactory().get(url)))
+        self.assertEqual(len(sync_pages), 4)
+        self.assertEqual(async_pages, sync_pages)
+
+
+# A conditional request for the menu is throttled like any other, rather than answered with a 304 before the throttle runs
+@mock.patch.object(MenuRateThrottle, 'THROTTLE_RATES', {'menu': '1/minute'})
+class MenuConditionalRequestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        MenuItem.objects.create(title='Dish', slug='dish', unit_price=Decimal('9.99'), category=Category.objects.create(title='Mains'))
+
+    def get_menu(self, **headers):
+        return self.client.get(reverse('menu_api_view'), headers={'accept': 'application/json', **headers})
+
+    def get_menu_async(self, **headers):
+        request = AsyncRequestFactory().get(reverse('menu_api_view'), headers={'accept': 'application/json', **headers})
+        return async_to_sync(async_views.menu_api_view)(request)
+
+    def assert_conditional_request_throttled(self, get_menu):
+        response = get_menu()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept', response['Vary'])
+        response = get_menu(if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 429)
+
+    def test_conditional_request_is_throttled(self):
+        self.assert_conditional_request_throttled(self.get_menu)
+
+    def test_async_conditional_request_is_throttled(self):
+        self.assert_conditional_request_throttled(self.get_menu_async)
+
+
+# Many customers adding the same low-stock item to their carts and checking out at once never oversell it
+# Runs on real transactions (TransactionTestCase), each thread with its own database connection. SQLite locks the whole
+# database for each write and has no SELECT ... FOR UPDATE, so there's no row level concurrency there to test
+@skipUnless(connection.vendor in ('mysql', 'postgresql'), 'Needs a database with row level locking')
+class ConcurrentCheckoutTest(TransactionTestCase):
+    THREADS = 8
+    STOCK = 3
+    QUANTITY = 2
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(title='Desserts')
+        self.menuitem = MenuItem.objects.create(title='Last Cake', unit_price=Decimal('5.00'), category=category, inventory=self.STOCK)
+        self.customers = [User.objects.create_user(username=f'customer{i}', password='password') for i in range(self.THREADS)]
+
+    # A deadlock or lock wait timeout is a refused checkout like running out of stock, the transaction rolled back
+    def shop(self, customer, start):
+        try:
+            start.wait()
+            update_cart(customer, {self.menuitem.id: self.QUANTITY}, add=True)
+            place_order(customer)
+        except (OutOfStockError, EmptyCartError, OperationalError):
+            pass
+        finally:
+            connection.close()
+
+    def test_checkout_never_oversells(self):
+        start = threading.Barrier(self.THREADS)
+        threads = [threading.Thread(target=self.shop, args=(customer, start)) for customer in self.customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.menuitem.refresh_from_db()
+        sold = OrderItem.objects.filter(menuitem=self.menuitem).aggregate(total=Sum('quantity'))['total'] or 0
+        held = Cart.objects.filter(menuitem=self.menuitem).aggregate(total=Sum('reserved_quantity'))['total'] or 0
+        self.assertGreaterEqual(self.menuitem.inventory, 0)
+        self.assertLessEqual(sold, self.STOCK)
+        self.assertEqual(sold + held + self.menuitem.inventory, self.STOCK)
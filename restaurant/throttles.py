@@ -0,0 +1,133 @@
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework.throttling import SimpleRateThrottle
+
+# Request throttling, by scope
+# Each scope has its own rate in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] and is counted per user, or per IP address
+# for anonymous users, so e.g. browsing the menu doesn't use up the allowance for placing orders.
+# Requests are counted with a sliding window: a counter per fixed window in the cache, with the previous window's
+# count weighted by how much of it still overlaps the last <duration> seconds. That's a get_many and an incr per
+# request whatever the rate, and no bursts of twice the rate at window edges.
+# The counters live in the THROTTLE_CACHE cache, which must be shared (e.g. Redis) for limits to hold across worker processes.
+# API views use these classes with @throttle_classes, HTML views with @throttle_view.
+THROTTLE_CACHE = getattr(settings, 'THROTTLE_CACHE', 'default')
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    # Only requests with these methods are counted, None counts every request
+    methods = None
+
+    @property
+    def cache(self):
+        return caches[THROTTLE_CACHE]
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        if self.rate is None or (self.methods and request.method not in self.methods):
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key, previous_key = f'{key}:{window}', f'{key}:{window - 1}'
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.elapsed = (self.now % self.duration) / self.duration
+
+        if self.previous * (1 - self.elapsed) + self.current + 1 > self.num_requests:
+            return False
+
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            # First request of the window, the counter is kept until the next window has used it
+            if not self.cache.add(current_key, 1, self.duration * 2):
+                self.cache.incr(current_key)
+        return True
+
+    # Seconds until the weighted count is low enough for one more request
+    def wait(self):
+        if self.current + 1 > self.num_requests or not self.previous:
+            return self.duration * (1 - self.elapsed)
+        overlap_left = (self.num_requests - 1 - self.current) / self.previous
+        return max((1 - overlap_left - self.elapsed) * self.duration, 0)
+
+
+# Everything not covered by a more specific scope
+class DefaultRateThrottle(SlidingWindowRateThrottle):
+    scope = 'default'
+
+
+# Menu, categories and menu items, API and HTML
+class MenuRateThrottle(SlidingWindowRateThrottle):
+    scope = 'menu'
+
+
+class SearchRateThrottle(SlidingWindowRateThrottle):
+    scope = 'search'
+
+
+# Search-as-you-type sends a request per keystroke, so suggestions get their own, much higher, rate
+class SuggestRateThrottle(SlidingWindowRateThrottle):
+    scope = 'suggest'
+
+
+# Adding, changing and removing cart items
+class CartRateThrottle(SlidingWindowRateThrottle):
+    scope = 'cart'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+# Placing orders
+class OrderRateThrottle(SlidingWindowRateThrottle):
+    scope = 'orders'
+    methods = ('POST',)
+
+
+# Logins, registrations and token requests, kept low to slow down password guessing
+class AuthRateThrottle(SlidingWindowRateThrottle):
+    scope = 'auth'
+    methods = ('POST',)
+
+
+# Staff pages: logs, shift analytics, exports, reservations and user/group management
+class StaffRateThrottle(SlidingWindowRateThrottle):
+    scope = 'staff'
+
+
+# Applies throttle classes to a request in a plain Django (HTML) view, where DRF's @throttle_classes has no effect
+# Returns a 429 Too Many Requests response with a Retry-After header once any of them refuses the request, otherwise None
+# Used directly for throttles that only cover part of a view, e.g. placing an order from orders_view
+def throttle_response(request, throttle_classes):
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            wait = throttle.wait()
+            response = HttpResponse("Too many requests, please try again shortly.", status=429, content_type='text/plain')
+            response['Retry-After'] = str(max(int(wait + 0.999), 1))
+            return response
+    return None
+
+
+# Applies throttle classes to every request of a plain Django (HTML) view, see throttle_response
+def throttle_view(throttle_classes):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = throttle_response(request, throttle_classes)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+# In-process cache for API token authentication, see authentication.py
+# Holds token key -> (user id, token created time) and user id -> (user, roles) in two bounded LRU maps whose entries
+# expire after AUTH_TOKEN_CACHE_TTL seconds, so an authenticated request normally needs no query at all.
+# Entries are dropped in this process when a token is deleted or rotated and when a user or their groups change
+# (see signals.py and roles.py). Other worker processes catch up once their entries expire, so keep the TTL short.
+AUTH_TOKEN_CACHE_SIZE = getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+AUTH_TOKEN_CACHE_TTL = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60)
+
+
+class LRUCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenCache:
+    def __init__(self, max_size=AUTH_TOKEN_CACHE_SIZE, ttl=AUTH_TOKEN_CACHE_TTL):
+        self.tokens = LRUCache(max_size, ttl)
+        self.users = LRUCache(max_size, ttl)
+
+    # Returns (user id, token created time) or None
+    def get_token(self, key):
+        return self.tokens.get(key)
+
+    def set_token(self, key, user_id, created):
+        self.tokens.set(key, (user_id, created))
+
+    # Returns (user, roles) or None
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def set_user(self, user, roles):
+        self.users.set(user.pk, (user, roles))
+
+    def forget_tokens(self, keys):
+        self.tokens.delete_many(keys)
+
+    def forget_users(self, user_ids):
+        self.users.delete_many(user_ids)
+
+    def clear(self):
+        self.tokens.clear()
+        self.users.clear()
+
+
+token_cache = TokenCache()
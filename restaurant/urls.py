@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
-from rest_framework.authtoken.views import obtain_auth_token
+from . import views, async_views
+
+# ASGI processes serve the read-heavy API views with their async versions, see async_views.py
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     path('api/register', views.user_registration_api_view, name='register_api_view'), # API view for users to create an account
@@ -9,16 +12,21 @@ urlpatterns = [
     path('users', views.all_users_view, name='all_users_view'), # HTML view to display users
     path('api/user', views.user_details_api_view, name='user_details_api_view'), # API view to display and update user details
     path('user', views.user_details_view, name='user_details_view'), # HTML view to display and update user details
-    path('api/token', obtain_auth_token, name='api-token-auth'), # API view so user can log in to generate auth tokens
+    path('api/token', views.ObtainExpiringAuthToken.as_view(), name='api-token-auth'), # API view so user can log in to generate auth tokens
+    path('api/token/rotate', views.token_rotate_api_view, name='token_rotate_api_view'), # API view to swap the user's auth token for a new one
+    path('api/token/refresh', views.access_token_api_view, name='access_token_api_view'), # API view to get (or revoke) a short-lived signed access token
     # path('token', views.obtain_auth_token_view, name='token_view'), # HTML view so users can log in to generate auth tokens, if you uncomment out this, comment out below path
     path('accounts/login', views.CustomLoginView.as_view(), name='login_view'), # Django's built-in login view (HTML), keeps user authenticated while session is valid, if you comment out this, uncomment out above path
     path('accounts/logout', views.CustomLogoutView.as_view(), name='logout_view'), # Django's built-in logout view (HTML)
+    path('api/exports/<slug:name>.<slug:export_format>', views.export_api_view, name='export_api_view'), # API view for managers to download orders, logs, bookings or comments as CSV/NDJSON
+    path('api/logger/analytics', views.shift_analytics_api_view, name='shift_analytics_api_view'), # API view for managers to see hours and overtime per employee per day/week/pay period
     path('api/logger', views.logger_api_view, name='logger_api_view'), # API view for employees to log/view hours
     path('logger', views.logger_view, name='logger_view'), # AJAX view for employees to log/view hours
     path('api/log-details', views.log_details_api_view, name='log_details_api_view'), # API view for employees to view their log details
     path('log-details', views.log_details_view, name='log_details_view'), # HTML view for employees to view their log details
     path('', views.index, name='index'), # Home page (HTML)
-    path('api/search', views.search_api_view, name='search_api_view'), # API view to search MenuItems and Categories
+    path('api/search', read_views.search_api_view, name='search_api_view'), # API view to search MenuItems and Categories
+    path('api/search/suggest', views.search_suggest_api_view, name='search_suggest_api_view'), # API view for search-as-you-type title suggestions
     path('search', views.search_view, name='search_view'), # HTML view to search MenuItems and Categories
     path('api/comments', views.comments_api_view, name='comments_api_view'), # API view for comments about restaurant
     path('comments', views.comments_view, name='comments_view'), # HTML view for comments about restaurant
@@ -34,27 +42,32 @@ urlpatterns = [
     path('groups/delivery-crew/users', views.delivery_crew_view, name='delivery_crew_view'), # HTML view to display/add users to Delivery Crew group
     path('api/groups/delivery-crew/users/delete', views.delivery_crew_delete_api_view, name='delivery_crew_delete_api_view'), # API view to remove users from Delivery Crew group
     path('groups/delivery-crew/users/delete', views.delivery_crew_delete_view, name='delivery_crew_delete_view'), # HTML view to remove users from Delivery Crew group
-    path('api/categories', views.categories_api_view, name='categories_api_view'), # API view to display/add categories
+    path('api/categories', read_views.categories_api_view, name='categories_api_view'), # API view to display/add categories
     path('categories', views.categories_view, name='categories_view'), # HTML view to display/add categories
     path('api/category/delete', views.category_delete_api_view, name='category_delete_api_view'), # API view to delete categories
     path('category/delete', views.category_delete_view, name='category_delete_view'), # HTML view to delete categories
-    path('api/category', views.category_details_api_view, name='category_details_api_view'), # API view to display menu items in category
+    path('api/category', read_views.category_details_api_view, name='category_details_api_view'), # API view to display menu items in category
     path('category', views.category_details_view, name='category_details_view'), # HTML view to display menu items in category
-    path('api/menu', views.menu_api_view, name='menu_api_view'), # API view to display menu/add menu items
+    path('api/menu', read_views.menu_api_view, name='menu_api_view'), # API view to display menu/add menu items
     path('menu', views.menu_view, name='menu_view'), # HTML view to display menu/add menu items
+    path('api/menu/import', views.menu_import_api_view, name='menu_import_api_view'), # API view for managers to bulk import menu items from CSV/JSON
     path('api/menu-item', views.menu_item_api_view, name='menu_item_api_view'), # API view to display individual menu items
     path('menu-item', views.menu_item_view, name='menu_item_view'), # HTML view to display individual menu items
     path('api/menu-item/delete', views.menu_item_delete_api_view, name='menu_item_delete_api_view'), # API view to delete menu items
     path('menu-item/delete', views.menu_item_delete_view, name='menu_item_delete_view'), # HTML view to delete menu items
     path('api/cart', views.cart_api_view, name='cart_api_view'), # API view to display, add, delete items in user cart
+    path('api/cart/bulk', views.cart_bulk_api_view, name='cart_bulk_api_view'), # API view to set quantities of and remove several items in user cart at once
     path('cart', views.cart_view, name='cart_view'), # HTML view to display, update, delete items in user cart
     path('api/orders', views.orders_api_view, name='orders_api_view'), # API view to display and create orders
+    path('api/orders/events', async_views.order_events_api_view, name='order_events_api_view'), # Async API view streaming order status events (server-sent events, ASGI only)
     path('orders', views.orders_view, name='orders_view'), # HTML view to display and create orders
     path('api/order', views.order_details_api_view, name='order_details_api_view'), # API view to display, update, and delete orders
     path('order', views.order_details_view, name='order_details_view'), # HTML view to display, update, and delete orders
     path('api/booking', views.booking_api_view, name='booking_api_view'), # API view for users to book a reservation
+    path('api/booking/availability', views.availability_api_view, name='availability_api_view'), # API view for bookable slots and remaining seats over a date range
+    path('api/booking/next-available', views.next_available_api_view, name='next_available_api_view'), # API view for the next times with room for a party
     path('booking', views.booking_view, name='booking_view'), # HTML view for users to book a reservation
-    path('api/reservations', views.reservations_api_view, name='reservations_api_view'), # API view to display current reservations
+    path('api/reservations', read_views.reservations_api_view, name='reservations_api_view'), # API view to display current reservations
     path('reservations', views.reservations_view, name='reservations_view'), # HTML view to display current reservations
     path('api/reservations/old', views.old_reservations_api_view, name='old_reservations_api_view'), # API view to display past reservations
     path('reservations/old', views.old_reservations_view, name='old_reservations_view'), # HTML view to display past reservations
@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.http import JsonResponse, HttpResponse, HttpResponseNotFound
 from django.utils import timezone
 from django.urls import reverse, reverse_lazy
@@ -8,25 +9,42 @@ from django.conf import settings
 from django.contrib import messages # For better user feedback
 from django.contrib.auth import login, authenticate
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator, EmptyPage
 from django.contrib.auth.models import Group
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView # For built-in django login/logout
-from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.http import require_GET, require_POST, condition
+from django.views.decorators.vary import vary_on_headers
+from django.utils.decorators import method_decorator
 from django.utils.text import slugify
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, renderer_classes, permission_classes, throttle_classes
-from rest_framework.renderers import TemplateHTMLRenderer, StaticHTMLRenderer
+from rest_framework.renderers import TemplateHTMLRenderer, StaticHTMLRenderer, JSONRenderer
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.authentication import TokenAuthentication # Might not need
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework import status, viewsets, generics
-from decimal import Decimal
-from .models import Logger, UserComments, MenuItem, Category, Cart, Order, OrderItem, Booking
+from .models import price_after_tax, Logger, UserComments, MenuItem, Category, Cart, Order, Booking, Location
 from .forms import UserRegForm, UserUpdateForm, UserSearchForm, AuthTokenForm, LogForm, LogSearchForm, CommentForm, EmployeeForm, ManagerForm, DeliveryCrewForm, CategoryForm, CategoryDeleteForm, MenuItemForm, MenuItemDeleteForm, CartForm, OrderSearchForm, OrderUpdateForm, OrderAssignDeliveryCrewForm, BookingForm, ReservationSearchForm, ReservationStatusForm, DeleteReservationForm
+from .roles import EMPLOYEE, MANAGER, DELIVERY_CREW, get_roles, has_role, is_admin_or_manager, is_admin_or_employee_but_not_delivery_crew
 from .permissions import IsEmployee, IsAdminOrManager, IsOwnerOrAdminOrManager, IsEmployeeOrAssignedDeliveryCrewOrCustomerOrAdmin, IsAdminOrEmployeeButNotDeliveryCrew
-from .serializers import UserSerializer, UserRegSerializer, LoggerSerializer, UserCommentsSerializer, CategorySerializer, MenuItemSerializer, BookingSerializer, CartSerializer, OrderItemSerializer, OrderSerializer
-from datetime import datetime
+from .pagination import IdCursorPagination, OrderCursorPagination, CommentCursorPagination, LoggerCursorPagination, BookingCursorPagination, OldBookingCursorPagination, paginate_for_template
+from .menu_cache import MENUITEM_TABLE, CATEGORY_TABLE, get_menu_snapshot, table_conditions
+from .services import place_order, update_cart, EmptyCartError, NotInCartError
+from .inventory import OutOfStockError
+from .exports import EXPORTS, EXPORT_FORMATS, export_response
+from .menu_import import MenuImportError, parse_menu_file, import_menu
+from .shifts import PERIODS, MAX_RANGE_DAYS, shift_analytics
+from .capacity import WAITLISTED, SlotFullError, is_bookable, next_available_slots
+from .availability import MAX_AVAILABILITY_DAYS, availability
+from .search import SUGGESTIONS_LIMIT, get_search_index, search_menu
+from .suggest import TOP_SUGGESTIONS
+from .authentication import AccessTokenAuthentication, get_valid_token, rotate_token, token_expires_at
+from .access_tokens import issue_access_token, revoke_access_token, revoke_user_access_tokens
+from .order_events import publish_order_update
+from .throttles import DefaultRateThrottle, MenuRateThrottle, SearchRateThrottle, SuggestRateThrottle, CartRateThrottle, OrderRateThrottle, AuthRateThrottle, StaffRateThrottle, throttle_view, throttle_response
+from .serializers import UserSerializer, UserRegSerializer, LoggerSerializer, UserCommentsSerializer, CategorySerializer, MenuItemSerializer, BookingSerializer, CartSerializer, CartSummarySerializer, CartBulkUpdateSerializer, OrderItemSerializer, OrderSerializer
+from datetime import datetime, date, timedelta
+import os
 import requests
 
 # Create your views here.
@@ -41,7 +59,7 @@ User = get_user_model()
 # View type: Function based, api
 @api_view(['POST'])
 @permission_classes([AllowAny])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle, AuthRateThrottle])
 def user_registration_api_view(request):
     serializer = UserRegSerializer(data=request.data)
     if serializer.is_valid():
@@ -58,7 +76,7 @@ def user_registration_api_view(request):
     # POST: Must submit valid username, email, password, password verification. Creates new user.
 # Endpoint: /restaurant/register
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle, AuthRateThrottle])
 def user_registration_view(request):
     if request.method == 'POST':
         form = UserRegForm(request.POST)
@@ -84,11 +102,13 @@ def user_registration_view(request):
 # View type: Function based, api
 @api_view(['GET'])
 @permission_classes([IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def all_users_api_view(request):
     users = User.objects.all()
-    serializer = UserSerializer(users, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    paginator = IdCursorPagination()
+    page = paginator.paginate_queryset(users, request)
+    serializer = UserSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 
 # All users registered
@@ -99,9 +119,9 @@ def all_users_api_view(request):
 # Endpoint: /restaurant/users
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def all_users_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to view users.")
         return redirect('index')
     
@@ -118,7 +138,8 @@ def all_users_view(request):
     else:
         form = UserSearchForm()
             
-    context = {'users': users, 'form': form}
+    users, page_links = paginate_for_template(request, users, IdCursorPagination)
+    context = {'users': users, 'form': form, 'page_links': page_links}
     return render(request, 'all_users_view.html', context)
         
 
@@ -132,12 +153,12 @@ def all_users_view(request):
 # View type: Function based, api
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle])
 def user_details_api_view(request):
     username = request.data.get('username') or request.user.username
     
     try:
-        if request.user.username == username or request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+        if request.user.username == username or is_admin_or_manager(request.user):
             user = User.objects.get(username=username)
         else:
             return Response({"message": "You do not have permission to view or edit this user's details."}, status=status.HTTP_403_FORBIDDEN)
@@ -164,12 +185,12 @@ def user_details_api_view(request):
 # Endpoint: /restaurant/user
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def user_details_view(request):
     username = request.POST.get('username') or request.user.username
     
     try:
-        if request.user.username == username or request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+        if request.user.username == username or is_admin_or_manager(request.user):
             user = get_object_or_404(User, username=username)
         else:
             messages.error(request, "You do not have permission to view or edit this user's details.")
@@ -199,8 +220,64 @@ def user_details_view(request):
 # To obtain access token, users who have registered send a POST request to '/restaurant/api/token' with their username and password
 # Response will contain token they can use for authentication
 # Include token in Authorization header of any requests that require authentication
+# Tokens expire AUTH_TOKEN_TTL seconds after they're issued, posting the credentials again after that returns a new one
+    # POST: Must submit valid username and password. Returns the token and when it expires, 200
 # Endpoint: /restaurant/api/token
-# View type: Built-in DRF
+# View type: DRF class based, api
+class ObtainExpiringAuthToken(ObtainAuthToken):
+    throttle_classes = [DefaultRateThrottle, AuthRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = get_valid_token(serializer.validated_data['user'])
+        return Response({'token': token.key, 'expires': token_expires_at(token.created)})
+
+
+# Auth Token Rotation
+# Allows authenticated users to swap their token for a new one, the old token stops working straight away
+    # POST: Returns the new token and when it expires, 201
+# Endpoint: /restaurant/api/token/rotate
+# View type: Function based, api
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([DefaultRateThrottle, AuthRateThrottle])
+def token_rotate_api_view(request):
+    token = rotate_token(request.user)
+    return Response({'token': token.key, 'expires': token_expires_at(token.created)}, status=status.HTTP_201_CREATED)
+
+
+# Access Token Refresh
+# Allows authenticated users to exchange their auth token (or session) for a short-lived signed access token
+# Send it as "Authorization: Bearer <access token>", checking it needs no database access (see access_tokens.py)
+    # POST: Returns a new access token and when it expires, 201 (403 when authenticated with an access token)
+# Allows the holder of an access token to revoke it, or revokes every access token of a user authenticated otherwise
+    # DELETE: Revokes the access token(s), 204
+# Endpoint: /restaurant/api/token/refresh
+# View type: Function based, api
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([DefaultRateThrottle, AuthRateThrottle])
+def access_token_api_view(request):
+    from_access_token = isinstance(request.auth, dict)
+
+    if request.method == 'POST':
+        # An access token can't be refreshed with itself, or it would never have to be checked against the database again
+        if from_access_token:
+            return Response({"detail": "Use your auth token to get a new access token."}, status=status.HTTP_403_FORBIDDEN)
+        access, expires = issue_access_token(request.user, get_roles(request.user))
+        return Response({
+            'access': access,
+            'token_type': AccessTokenAuthentication.keyword,
+            'expires': expires,
+        }, status=status.HTTP_201_CREATED)
+
+    elif request.method == 'DELETE':
+        if from_access_token:
+            revoke_access_token(request.auth)
+        else:
+            revoke_user_access_tokens([request.user.pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # Auth Token Generation (Only used if you aren't using Django's built-in login, need to uncomment out url to use)
@@ -210,7 +287,7 @@ def user_details_view(request):
     # POST: Creates auth token if a valid username and password is submitted
 # Endpoint: /restaurant/token
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle, AuthRateThrottle])
 def obtain_auth_token_view(request):
     if request.method == 'POST':
         form = AuthTokenForm(request.POST)
@@ -236,7 +313,7 @@ def obtain_auth_token_view(request):
 # This is set up as the default for HTML authentication right now, but if you want to use above method instead be sure to follow instructions in comments in view and urls.py
 # Endpoint: /restaurant/accounts/login
 # View type: Django built-in class based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@method_decorator(throttle_view([DefaultRateThrottle, AuthRateThrottle]), name='dispatch')
 class CustomLoginView(LoginView):
     def dispatch(self, request, *args, **kwargs):
         response = super().dispatch(request, *args, **kwargs)
@@ -254,12 +331,27 @@ class CustomLoginView(LoginView):
     
 # User logout
 # Logs user out and redirects them to the homepage
+# Logging out also revokes the user's API token (see signals.py)
 # Endpoint: /restaurant/accounts/logout
 # View type: Django built-in class based, HTML
 class CustomLogoutView(LogoutView):
     next_page = 'index' # Redirects users to the homepage after logout
 
 
+# Data exports API
+# Allows only Admin and Managers to download orders (with their items), staff logs, reservations or comments
+    # GET: Streams the whole table as CSV or NDJSON, 200
+# Endpoint: /restaurant/api/exports/<orders|logs|bookings|comments>.<csv|ndjson>
+# View type: Function based, api
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminOrManager])
+@throttle_classes([StaffRateThrottle])
+def export_api_view(request, name, export_format):
+    if name not in EXPORTS or export_format not in EXPORT_FORMATS:
+        return Response({"detail": "Unknown export."}, status=status.HTTP_404_NOT_FOUND)
+    return export_response(name, export_format)
+
+
 # Staff log API
 # Allows only Admin, Managers, or the Employee the log belongs to, to check their shift hours/hours worked
     # GET: Admin and managers can view all logs, employees can only view their own logs, 200
@@ -269,22 +361,24 @@ class CustomLogoutView(LogoutView):
 # View type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsEmployee])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def logger_api_view(request):
     if request.method == 'POST':
         serializer = LoggerSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(user=request.user)
             return Response({"message": "Log entry created successfully."}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     if request.method == 'GET':
-        if request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+        if is_admin_or_manager(request.user):
             logs = Logger.objects.all()
         else:
-            logs = Logger.objects.filter(first_name=request.user.first_name, last_name=request.user.last_name)
-        serializer = LoggerSerializer(logs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            logs = Logger.objects.filter(user=request.user)
+        paginator = LoggerCursorPagination()
+        page = paginator.paginate_queryset(logs, request)
+        serializer = LoggerSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
 
 # Staff log
@@ -295,18 +389,20 @@ def logger_api_view(request):
 # Endpoint: /restaurant/logger
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def logger_view(request):
     user = request.user
     
     if request.method == 'POST' and 'log_hours' in request.POST:
-        if not user.groups.filter(name='Employee').exists() and not user.is_superuser:
+        if not has_role(user, EMPLOYEE) and not user.is_superuser:
             messages.error(request, "Only employees can log their shift hours.")
             return redirect('index') # Redirect after permission check
         
         form = LogForm(request.POST)
         if form.is_valid():
-            form.save()
+            log = form.save(commit=False)
+            log.user = user
+            log.save()
             messages.success(request, "Shift logged successfully.")
             return redirect('logger_view') # Redirect to the same view to clear the form after submission
         
@@ -328,80 +424,115 @@ def logger_view(request):
         form = LogForm()
         
     # Display logged hours
-    if user.groups.filter(name='Manager').exists() or user.is_superuser:
+    if is_admin_or_manager(user):
         logs = Logger.objects.all()
     else:
-        logs = Logger.objects.filter(first_name=user.first_name, last_name=user.last_name)
+        logs = Logger.objects.filter(user=user)
         
     search_form = LogSearchForm()
+    logs, page_links = paginate_for_template(request, logs, LoggerCursorPagination)
         
     context = {
         'form': form,
         'search_form': search_form,
         'logs': logs,
+        'page_links': page_links,
     }
     return render(request, 'logger.html', context)
 
 
 # Log Details
 # Allows Admin, Manager, and employee who created the log to view all logs made by each employee, 200
-    # GET: Displays all logs made by the employee
-# Endpoint: /restaurant/log-details
+    # GET: Displays all logs made by the employee, ?user_id= (defaults to the authenticated user)
+# Endpoint: /restaurant/api/log-details
 # View type: Function based, api
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsOwnerOrAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def log_details_api_view(request):
-    user_id = request.data.get('user_id')
-    if not user_id:
-        return Response({"message": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        user_id = int(request.query_params.get('user_id') or request.data.get('user_id') or request.user.id)
+    except (TypeError, ValueError):
+        return Response({"message": "User ID must be a number."}, status=status.HTTP_400_BAD_REQUEST)
     
     user = request.user
-    if not (user.id == user_id or user.groups.filter(name='Manager').exists() or user.is_superuser):
+    if not (user.id == user_id or is_admin_or_manager(user)):
         return Response({"message": "You do not have permission to view this data."}, status=status.HTTP_403_FORBIDDEN)
     
-    logs = Logger.object.filter(user_id=user_id)
-    if not logs.exists():
+    # Served by the (user, date) index
+    logs = Logger.objects.filter(user_id=user_id)
+    paginator = LoggerCursorPagination()
+    page = paginator.paginate_queryset(logs, request)
+    if not page:
         return Response({"message": "No logs found by this user."}, status=status.HTTP_404_NOT_FOUND)
     
-    serializer = LoggerSerializer(logs, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = LoggerSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 # Log Details
 # Allows Admin, Manager, and employee who created the log to view all logs made by each employee
-    # GET: Displays all logs made by the employee
+    # GET: Displays all logs made by the employee, ?user_id= (defaults to the authenticated user)
 # Endpoint: /restaurant/log-details
 # View type: Function based, HTML
 @login_required
+@throttle_view([StaffRateThrottle])
 def log_details_view(request):
-    user_id = request.POST.get('user_id') if request.method == 'POST' else request.user.id
-    
     user = request.user
     
-    if not (user.id == user_id or user.groups.filter(name='Manager').exists() or user.is_superuser):
+    try:
+        user_id = int(request.POST.get('user_id') or request.GET.get('user_id') or user.id)
+    except ValueError:
+        messages.error(request, "Invalid user.")
+        return redirect('log_details_view') # Redirect after form processing error
+    
+    if not (user.id == user_id or is_admin_or_manager(user)):
         messages.error(request, "You do not have permission to view this data.")
         return redirect('index') # Redirect after permission check
         
-    logs = Logger.objects.filter(user_id=user_id)
-    no_logs_message = None
-    
-    if not logs.exists():
-        no_logs_message = "No logs available for this user."
+    logs, page_links = paginate_for_template(request, Logger.objects.filter(user_id=user_id), LoggerCursorPagination)
     
     context = {
         'logs': logs,
-        'no_logs_message': no_logs_message if not logs.exists() else None, # Only passes message to template if no log exists
+        'page_links': page_links,
+        'no_logs_message': None if logs else "No logs available for this user.", # Only passes message to template if no log exists
     }
     
     return render(request, 'log_details_view.html', context)
 
 
+# Shift analytics API
+# Allows only Admin and Managers to see hours worked per employee, summed in the database
+    # GET: ?period=day|week|pay_period (default week), ?from=YYYY-MM-DD&to=YYYY-MM-DD (default the last 4 weeks), ?user_id= for one employee
+    # Returns each employee's hours, shifts and overtime per period with their totals, and the totals for everyone, 200
+# Endpoint: /restaurant/api/logger/analytics
+# View type: Function based, api
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminOrManager])
+@throttle_classes([StaffRateThrottle])
+def shift_analytics_api_view(request):
+    period = request.query_params.get('period', 'week')
+    if period not in PERIODS:
+        return Response({"message": f"Period must be one of: {', '.join(PERIODS)}."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = date.fromisoformat(request.query_params['to']) if 'to' in request.query_params else timezone.localdate()
+        start = date.fromisoformat(request.query_params['from']) if 'from' in request.query_params else end - timedelta(days=27)
+        user_id = int(request.query_params['user_id']) if 'user_id' in request.query_params else None
+    except ValueError:
+        return Response({"message": "Dates must be YYYY-MM-DD and user_id a number."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start > end or (end - start).days >= MAX_RANGE_DAYS:
+        return Response({"message": f"'from' must be on or before 'to', and at most {MAX_RANGE_DAYS} days apart."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(shift_analytics(start, end, period, user_id), status=status.HTTP_200_OK)
+
+
 # Home Page
 # Allows anyone to view the homepage
     # GET: Displays the homepage
 # Endpoint: /restaurant/index
 # View Type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def index(request):
     current_year = datetime.now().year
     return render(request, 'index.html', {'current_year': current_year})
@@ -414,15 +545,15 @@ def index(request):
 # View Type: Function based, api
 @api_view(['GET'])
 @permission_classes([AllowAny])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([SearchRateThrottle])
 def search_api_view(request):
     query = request.GET.get('search')
     
     if not query:
         return Response({"detail": "Search query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
     
-    menuitem_results = MenuItem.objects.filter(title__icontains=query)
-    category_results = Category.objects.filter(title__icontains=query)
+    # Ranked and typo tolerant, see search.py
+    menuitem_results, category_results = search_menu(query)
     
     menuitem_serializer = MenuItemSerializer(menuitem_results, many=True)
     category_serializer = CategorySerializer(category_results, many=True)
@@ -433,17 +564,35 @@ def search_api_view(request):
     }, status=status.HTTP_200_OK)
     
 
+# Search suggestions API
+# Allows anyone to get MenuItem and Category title completions for what they've typed so far
+    # GET: Displays up to ?limit= (default 10, at most 20) suggestions for ?q=, 200
+# Answered from the in-memory search index, no database queries, and never waits for the index to be rebuilt
+# Endpoint: /restaurant/api/search/suggest
+# View Type: Function based, api
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([SuggestRateThrottle])
+def search_suggest_api_view(request):
+    prefix = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', SUGGESTIONS_LIMIT)), 1), TOP_SUGGESTIONS)
+    except ValueError:
+        return Response({"detail": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({'suggestions': get_search_index(wait=False).suggest(prefix, limit)}, status=status.HTTP_200_OK)
+
+
 # Search
 # Allows anyone to search for titles from MenuItem and Category
     # GET: Displays search results (200)
 # Endpoint: /restaurant/search
 # View Type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([SearchRateThrottle])
 @require_GET
 def search_view(request):
     query = request.GET.get('search', '')
-    menu_items = MenuItem.objects.filter(title__icontains=query) if query else []
-    categories = Category.objects.filter(title__icontains=query) if query else []
+    menu_items, categories = search_menu(query) if query else ([], [])
     
     context = {
         'query': query,
@@ -463,12 +612,14 @@ def search_view(request):
 # View type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle])
 def comments_api_view(request):
     if request.method == 'GET':
         comments = UserComments.objects.all()
-        serializer = UserCommentsSerializer(comments, many=True)
-        return Response(serializer.data)
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(comments, request)
+        serializer = UserCommentsSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     elif request.method == 'POST':
         serializer = UserCommentsSerializer(data=request.data)
@@ -485,7 +636,7 @@ def comments_api_view(request):
     # POST: Submits user comment/review
 # Endpoint: /restaurant/comments
 # View type: Function based, HTML, uses comments_api_view to fetch and display data
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def comments_view(request):
     form = CommentForm()
     
@@ -503,11 +654,12 @@ def comments_view(request):
             messages.error(request, "Error submitting comment.")
             return redirect('comments_view') # Redirect after exception handling
                 
-    comments = UserComments.objects.all()
+    comments, page_links = paginate_for_template(request, UserComments.objects.all(), CommentCursorPagination)
     
     context = {
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'page_links': page_links,
     }
     return render(request, 'comments.html', context)
 
@@ -520,7 +672,7 @@ def comments_view(request):
 # View type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def employee_api_view(request):
     try:
         employee_group = Group.objects.get(name='Employee')
@@ -539,7 +691,7 @@ def employee_api_view(request):
         
         try:
             user = User.objects.get(username=username)
-            if user in employee_group.user_set.all():
+            if has_role(user, EMPLOYEE):
                 return Response({"message": f"User {username} is already an employee."}, status=status.HTTP_400_BAD_REQUEST)
             employee_group.user_set.add(user)
             return Response({"message": f"User {username} added to Employee group."}, status=status.HTTP_201_CREATED)
@@ -554,9 +706,9 @@ def employee_api_view(request):
 # Endpoint: /restaurant/groups/employee/users
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def employee_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to view or add users to the Employee group.")
         return redirect('index') # Redirect after permission check
     
@@ -572,7 +724,7 @@ def employee_view(request):
             username = form.cleaned_data.get('username')
             try:
                 user = User.objects.get(username=username)
-                if user in employee_group.user_set.all():
+                if has_role(user, EMPLOYEE):
                     messages.info(request, f"User {username} is already an employee.")
                     return redirect('employee_view') # Redirect after info message
                 else:
@@ -596,7 +748,7 @@ def employee_view(request):
 # View type: Function based, api
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def employee_delete_api_view(request):
     username = request.data.get('username')
     if not username:
@@ -609,7 +761,7 @@ def employee_delete_api_view(request):
     
     try:
         user = User.objects.get(username=username)
-        if user in employee_group.user_set.all():
+        if has_role(user, EMPLOYEE):
             employee_group.user_set.remove(user)
             return Response({"message": f"User {username} removed from Employee group."}, status=status.HTTP_200_OK)
         else:
@@ -623,9 +775,9 @@ def employee_delete_api_view(request):
 # Endpoint: /restaurant/groups/employee/users/delete
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def employee_delete_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to remove users from the Employee group.")
         return redirect('employee_view') # Redirect after permission check
     
@@ -642,7 +794,7 @@ def employee_delete_view(request):
             username = form.cleaned_data.get('username')
             try:
                 user = User.objects.get(username=username)
-                if user in employee_group.user_set.all():
+                if has_role(user, EMPLOYEE):
                     employee_group.user_set.remove(user)
                     messages.success(request, f"User {username} removed from Employee group.")
                     return redirect('employee_delete_view') # Redirect after successful form processing
@@ -666,7 +818,7 @@ def employee_delete_view(request):
 # View type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def manager_api_view(request):
     try:
         manager_group = Group.objects.get(name='Manager')
@@ -692,9 +844,9 @@ def manager_api_view(request):
         
         try:
             user = User.objects.get(username=username)
-            if user in manager_group.user_set.all():
+            if has_role(user, MANAGER):
                 return Response({"message": f"User {username} is already a manager."}, status=status.HTTP_400_BAD_REQUEST)
-            if user not in employee_group.user_set.all():
+            if not has_role(user, EMPLOYEE):
                 return Response({"message": f"User {username} must be an employee first."}, status=status.HTTP_400_BAD_REQUEST)
             manager_group.user_set.add(user)
             return Response({"message": f"User {username} added to Manager group."}, status=status.HTTP_201_CREATED)
@@ -709,9 +861,9 @@ def manager_api_view(request):
 # Endpoint: /restaurant/groups/manager/users
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def manager_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to view or add users to the Manager group.")
         return redirect('index') # Redirect after permission check
     
@@ -733,10 +885,10 @@ def manager_view(request):
             username = form.cleaned_data.get('username')
             try:
                 user = User.objects.get(username=username)
-                if user in manager_group.user_set.all():
+                if has_role(user, MANAGER):
                     messages.info(request, f"User {username} is already a manager.")
                     return redirect('manager_view') # Redirect after info message
-                elif user not in employee_group.user_set.all():
+                elif not has_role(user, EMPLOYEE):
                     messages.error(request, f"User {username} must be an employee first.")
                     return redirect('manager_view') # Redirect after validation check
                 else:
@@ -760,7 +912,7 @@ def manager_view(request):
 # View type: Function based, api
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def manager_delete_api_view(request):
     username = request.data.get('username')
     if not username:
@@ -773,7 +925,7 @@ def manager_delete_api_view(request):
     
     try:
         user = User.objects.get(username=username)
-        if user in manager_group.user_set.all():
+        if has_role(user, MANAGER):
             manager_group.user_set.remove(user)
             return Response({"message": f"User {username} removed from Manager group. User {username} is still in the Employee group."}, status=status.HTTP_200_OK)
         else:
@@ -787,9 +939,9 @@ def manager_delete_api_view(request):
 # Endpoint: /restaurant/groups/manager/users/delete
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def manager_delete_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to remove users from the Manager group.")
         return redirect('manager_view') # Redirect after permission check
     
@@ -806,7 +958,7 @@ def manager_delete_view(request):
             username = form.cleaned_data.get('username')
             try:
                 user = User.objects.get(username=username)
-                if user in manager_group.user_set.all():
+                if has_role(user, MANAGER):
                     manager_group.user_set.remove(user)
                     messages.success(request, f"User {username} removed from Manager group. User {username} is still in the Employee group.")
                     return redirect('manager_delete_view') # Redirect after successful form processing
@@ -830,7 +982,7 @@ def manager_delete_view(request):
 # view type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsEmployee])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def delivery_crew_api_view(request):
     try:
         delivery_crew_group = Group.objects.get(name='Delivery Crew')
@@ -848,16 +1000,16 @@ def delivery_crew_api_view(request):
         return Response(usernames, status=status.HTTP_200_OK)
     
     elif request.method == 'POST':
-        if request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+        if is_admin_or_manager(request.user):
             username = request.data.get('username')
             if not username:
                 return Response({"message": "Username is required."}, status=status.HTTP_400_BAD_REQUEST)
             
             try:
                 user = User.objects.get(username=username)
-                if user in delivery_crew_group.user_set.all():
+                if has_role(user, DELIVERY_CREW):
                     return Response({"message": f"User {username} is already in Delivery Crew group."}, status=status.HTTP_400_BAD_REQUEST)
-                if not user in employee_group.user_set.all():
+                if not has_role(user, EMPLOYEE):
                     return Response({"message": f"User {username} must be an employee first"}, status=status.HTTP_400_BAD_REQUEST)
                 delivery_crew_group.user_set.add(user)
                 return Response({"message": f"User {username} added to Delivery Crew group."}, status=status.HTTP_201_CREATED)
@@ -874,9 +1026,9 @@ def delivery_crew_api_view(request):
 # Endpoint: /restaurant/groups/delivery-crew/users
 # view type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def delivery_crew_view(request):
-    if not (request.user.groups.filter(name='Employee').exists() or request.user.is_superuser):
+    if not (has_role(request.user, EMPLOYEE) or request.user.is_superuser):
         messages.error(request, "You do not have permission to view the Delivery Crew group.")
         return redirect('index') # Redirect after permission check
     
@@ -893,16 +1045,16 @@ def delivery_crew_view(request):
         return redirect('index') # Redirect after exception handling
         
     if request.method == 'POST':
-        if request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+        if is_admin_or_manager(request.user):
             form = DeliveryCrewForm(request.POST)
             if form.is_valid():
                 username = form.cleaned_data.get('username')
                 try:
                     user = User.objects.get(username=username)
-                    if user in delivery_crew_group.user_set.all():
+                    if has_role(user, DELIVERY_CREW):
                         messages.info(request, f"User {username} is already in Delivery Crew group.")
                         return redirect('delivery_crew_view') # Redirect after info message
-                    elif user not in employee_group.user_set.all():
+                    elif not has_role(user, EMPLOYEE):
                         messages.error(request, f"User {username} must be an employee first.")
                         return redirect('delivery_crew_view') # Redirect after validation check
                     else:
@@ -929,7 +1081,7 @@ def delivery_crew_view(request):
 # View type: Function based, api
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def delivery_crew_delete_api_view(request):
     username = request.data.get('username')
     if not username:
@@ -942,7 +1094,7 @@ def delivery_crew_delete_api_view(request):
     
     try:
         user = User.objects.get(username=username)
-        if user in delivery_crew_group.user_set.all():
+        if has_role(user, DELIVERY_CREW):
             delivery_crew_group.user_set.remove(user)
             return Response({"message": f"User {username} removed from Delivery Crew group. User {username} is still in the Employee group."}, status=status.HTTP_200_OK)
         else:
@@ -956,9 +1108,9 @@ def delivery_crew_delete_api_view(request):
 # Endpoint: /restaurant/groups/delivery-crew/users/delete
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def delivery_crew_delete_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to remove users from the Delivery Crew group.")
         return redirect('delivery_crew_view') # Redirect after permission check
     
@@ -975,7 +1127,7 @@ def delivery_crew_delete_view(request):
             username = form.cleaned_data.get('username')
             try:
                 user = User.objects.get(username=username)
-                if user in delivery_crew_group.user_set.all():
+                if has_role(user, DELIVERY_CREW):
                     delivery_crew_group.user_set.remove(user)
                     messages.success(request, f"User {username} removed from Delivery Crew group. User {username} is still in Employee group.")
                     return redirect('delivery_crew_delete_view') # Redirect after successful form processing
@@ -997,9 +1149,11 @@ def delivery_crew_delete_view(request):
     # POST: Adds a category, 201
 # Endpoint: /restaurant/api/categories
 # View type: Function based, api
+@vary_on_headers('Accept')
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([MenuRateThrottle])
+@condition(*table_conditions(CATEGORY_TABLE))
 def categories_api_view(request):
     if request.method == 'GET':
         categories = Category.objects.all()
@@ -1007,7 +1161,7 @@ def categories_api_view(request):
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        if request.user.is_authenticated and (request.user.groups.filter(name='Manager'.exists()) or request.user.is_superuser):
+        if is_admin_or_manager(request.user):
             serializer = CategorySerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save()
@@ -1023,7 +1177,7 @@ def categories_api_view(request):
     # POST: Adds a category
 # Endpoint: /restaurant/categories
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([MenuRateThrottle])
 def categories_view(request):
     categories = Category.objects.all()
     form = CategoryForm()
@@ -1031,7 +1185,7 @@ def categories_view(request):
     if request.method == 'POST':
         if not request.user.is_authenticated:
             return redirect(settings.LOGIN_URL) # Redirect for unauthenticated users
-        if request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+        if is_admin_or_manager(request.user):
             form = CategoryForm(request.POST)
             if form.is_valid():
                 form.save()
@@ -1051,7 +1205,7 @@ def categories_view(request):
 # View type: Function based, api
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def category_delete_api_view(request):
     slug = request.data.get('slug')
     if not slug:
@@ -1070,9 +1224,9 @@ def category_delete_api_view(request):
 # Endpoint: /restaurant/category/delete
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def category_delete_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to delete categories.")
         return redirect('category_view') # Redirect after permission check
     
@@ -1100,9 +1254,11 @@ def category_delete_view(request):
     # GET: Displays items in category
 # Endpoint: /restaurant/api/category/<slug:category_slug>
 # View type: Function based, api
+@vary_on_headers('Accept')
 @api_view(['GET'])
 @permission_classes([AllowAny])
-@throttle_classes([AllowAny, UserRateThrottle])
+@throttle_classes([MenuRateThrottle])
+@condition(*table_conditions(CATEGORY_TABLE, MENUITEM_TABLE))
 def category_details_api_view(request):
     category_slug = request.GET.get('slug') # Get the category slug from query parameter
     
@@ -1128,7 +1284,7 @@ def category_details_api_view(request):
     # GET: Displays items in category
 # Endpoint: /restaurant/category
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([MenuRateThrottle])
 def category_details_view(request):
     category_slug = request.GET.get('slug')
     
@@ -1154,17 +1310,28 @@ def category_details_view(request):
     # POST: Adds menu item, 201
 # Endpoint: /restaurant/api/menu
 # View type: Function based, api
+@vary_on_headers('Accept')
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([MenuRateThrottle])
+@condition(*table_conditions(MENUITEM_TABLE))
 def menu_api_view(request):
     if request.method == 'GET':
-        menu_items = MenuItem.objects.all()
-        serializer = MenuItemSerializer(menu_items, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build_menu_page():
+            menu_items = MenuItem.objects.all()
+            paginator = IdCursorPagination()
+            page = paginator.paginate_queryset(menu_items, request)
+            serializer = MenuItemSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data).data
+        
+        # JSON responses are served from the menu snapshot cache as already rendered bytes
+        if request.accepted_renderer.format == 'json':
+            content = get_menu_snapshot('json', request, lambda: JSONRenderer().render(build_menu_page()))
+            return HttpResponse(content, content_type='application/json')
+        return Response(build_menu_page(), status=status.HTTP_200_OK)
     
     elif request.method == 'POST':
-        if request.user.is_authenticated and (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+        if is_admin_or_manager(request.user):
             serializer = MenuItemSerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save()
@@ -1174,6 +1341,38 @@ def menu_api_view(request):
             return Response({"message": "Only managers and admin can add menu items."})
 
 
+# Allows only Admin or Managers to bulk import menu items, creating any categories they need
+    # POST: Takes an uploaded CSV/JSON file (multipart field "file") or a JSON body {"items": [...]} or [...]
+    # Add ?dry_run=true to only get the diff: {dry_run, categories_created, items_created, items_unchanged, errors}
+    # 201 when imported, 200 for a dry run, 400 (nothing imported) when any row has errors
+# Endpoint: /restaurant/api/menu/import
+# View type: Function based, api
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminOrManager])
+@throttle_classes([StaffRateThrottle])
+def menu_import_api_view(request):
+    # A JSON body can be the list of items itself
+    data = request.data if isinstance(request.data, dict) else {'items': request.data}
+    dry_run = str(request.query_params.get('dry_run', data.get('dry_run', ''))).lower() in ('1', 'true', 'yes')
+
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            file_format = os.path.splitext(upload.name)[1].lstrip('.').lower()
+            rows = parse_menu_file(upload.read(), file_format)
+        else:
+            rows = data.get('items')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise MenuImportError('Send a CSV/JSON "file" or a list of menu items as "items".')
+    except MenuImportError as error:
+        return Response({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = import_menu(rows, dry_run=dry_run)
+    if result['errors']:
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+
 # Allows anyone to view the menu
     # GET: Displays menu
 # Allows only Admin or Managers to add items to the menu
@@ -1182,9 +1381,8 @@ def menu_api_view(request):
     # POST (add_to_cart): Adds item to cart
 # Endpoint: /restaurant/menu
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([MenuRateThrottle, CartRateThrottle])
 def menu_view(request):
-    menu_items = MenuItem.objects.all()
     form = MenuItemForm()
     cart_form = CartForm()
     
@@ -1193,7 +1391,7 @@ def menu_view(request):
             return redirect(settings.LOGIN_URL) # Redirect for unauthenticated users
         
         if 'add_menu_item' in request.POST:
-            if request.user.groups.filter(name='Manager').exists() or request.user.is_superuser:
+            if is_admin_or_manager(request.user):
                 form = MenuItemForm(request.POST)
                 if form.is_valid():
                     form.save()
@@ -1206,13 +1404,25 @@ def menu_view(request):
         elif 'add_to_cart' in request.POST:
             cart_form = CartForm(request.POST)
             if cart_form.is_valid():
-                cart_item = cart_form.save(commit=False)
-                cart_item.user = request.user
-                cart_item.save()
-                messages.success(request, f"{cart_item.menuitem.title} added to your cart.")
-                return redirect('menu_view') # Redirect after successful form processing
+                menuitem = cart_form.cleaned_data['menuitem']
+                try:
+                    update_cart(request.user, {menuitem.id: cart_form.cleaned_data['quantity']}, add=True)
+                    messages.success(request, f"{menuitem.title} added to your cart.")
+                    return redirect('menu_view') # Redirect after successful form processing
+                except OutOfStockError:
+                    cart_form.add_error('quantity', f"Requested quantity exceeds available stock for {menuitem.title}.")
             
-    context = {'menu_items': menu_items, 'form': form, 'cart_form': cart_form}
+    def render_menu_table():
+        menu_items, page_links = paginate_for_template(request, MenuItem.objects.all(), IdCursorPagination)
+        return render_to_string('menu_items_fragment.html', {'menu_items': menu_items, 'cart_form': cart_form, 'page_links': page_links})
+    
+    # The menu table is served from the menu snapshot cache unless it has to show cart form errors
+    if cart_form.is_bound:
+        menu_table = render_menu_table()
+    else:
+        menu_table = get_menu_snapshot('html', request, render_menu_table)
+    
+    context = {'menu_table': menu_table, 'form': form}
     return render(request, 'menu_view.html', context)
 
 
@@ -1224,7 +1434,7 @@ def menu_view(request):
 # View type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([MenuRateThrottle])
 def menu_item_api_view(request):
     slug = request.GET.get('slug')
     
@@ -1254,7 +1464,7 @@ def menu_item_api_view(request):
     # POST: Adds item to cart, sets the authenticated user as the user id for these cart items
 # Endpoint: /restaurant/menu-item
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([MenuRateThrottle])
 def menu_item_view(request):
     slug = request.GET.get('slug')
     
@@ -1287,7 +1497,7 @@ def menu_item_view(request):
 # View type: Function based, api
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminOrManager])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def menu_item_delete_api_view(request):
     slug = request.data.get('slug')
     if not slug:
@@ -1306,9 +1516,9 @@ def menu_item_delete_api_view(request):
 # Endpoint: /restaurant/menu-item/delete
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def menu_item_delete_view(request):
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not is_admin_or_manager(request.user):
         messages.error(request, "You do not have permission to remove this menu item.")
         return redirect('menu_view') # Redirect after permission check
     
@@ -1333,7 +1543,7 @@ def menu_item_delete_view(request):
 
 
 # Allows only the authenticated user to view menu items in their cart
-    # GET: Displays menu item(s) already in cart, 200
+    # GET: Displays menu item(s) already in cart as {items, subtotal, price_after_tax}, 200
 # Allows only the authenticated user to add menu items to their cart
     # POST: Adds menu item to cart, sets the authenticated user as the user id for these cart items, 201
 # Allows only the authenticated user to remove menu items from their cart
@@ -1342,13 +1552,13 @@ def menu_item_delete_view(request):
 # View type: Function based, api
 @api_view(['GET', 'POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle, CartRateThrottle])
 def cart_api_view(request):
     user = request.user
     
     if request.method == 'GET':
-        cart_items = Cart.objects.filter(user=user)
-        serializer = CartSerializer(cart_items, many=True, context={'request': request})
+        cart_items = Cart.objects.with_details().filter(user=user)
+        serializer = CartSummarySerializer(cart_items, context={'request': request})
         return Response(serializer.data)
     
     elif request.method == 'POST':
@@ -1363,22 +1573,41 @@ def cart_api_view(request):
         if not menuitem_titles:
             return Response({"message": "Menu item name(s) required to delete."}, status=status.HTTP_400_BAD_REQUEST)
         
-        deleted_titles = []
-        for title in menuitem_titles:
-            slug = slugify(title)
-            try:
-                menuitem = MenuItem.objects.get(slug=slug)
-                cart_item = Cart.objects.get(user=user, menuitem=menuitem)
-                cart_item.delete()
-                deleted_titles.append(menuitem.title)
-            except MenuItem.DoesNotExist:
+        # One query for the menu items and one DELETE for the cart rows, nothing is removed if any title is wrong
+        titles_by_slug = {slugify(title): title for title in menuitem_titles}
+        menuitems = {slug: (menuitem_id, title) for slug, menuitem_id, title in MenuItem.objects.filter(slug__in=titles_by_slug).values_list('slug', 'id', 'title')}
+        for slug, title in titles_by_slug.items():
+            if slug not in menuitems:
                 return Response({"message": f"Menu item '{title}' not found."}, status=status.HTTP_404_NOT_FOUND)
-            except Cart.DoesNotExist:
-                return Response({"message": f"Item '{title}' not found in your cart."}, status=status.HTTP_404_NOT_FOUND)
-            
+        
+        try:
+            update_cart(user, remove_ids=[menuitem_id for menuitem_id, _ in menuitems.values()])
+        except NotInCartError as error:
+            titles = {menuitem_id: title for menuitem_id, title in menuitems.values()}
+            return Response({"message": f"Item '{titles[error.menuitem_ids[0]]}' not found in your cart."}, status=status.HTTP_404_NOT_FOUND)
+        
+        deleted_titles = [title for _, title in menuitems.values()]
         return Response({"message": f"Removed item(s) from cart: {', '.join(deleted_titles)}"}, status=status.HTTP_200_OK)
     
   
+# Allows only the authenticated user to change several items in their cart at once
+    # POST: Sets quantities (adding items not in the cart yet) and removes items, then displays the cart, 200
+    # Body: {"upsert": [{"menuitem": <title>, "quantity": <n>}, ...], "remove": [<title>, ...]}
+    # All or nothing: if any item is invalid nothing is changed and every problem is returned, 400
+# Endpoint: /restaurant/api/cart/bulk
+# View type: Function based, api
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([DefaultRateThrottle, CartRateThrottle])
+def cart_bulk_api_view(request):
+    serializer = CartBulkUpdateSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    
+    cart_items = Cart.objects.with_details().filter(user=request.user)
+    return Response(CartSummarySerializer(cart_items, context={'request': request}).data, status=status.HTTP_200_OK)
+    
+
 # Allows only the authenticated user to view menu items in their cart
     # GET: Displays items in the user's cart
 # Allows only the authenticated user to add menu items to their cart
@@ -1388,16 +1617,16 @@ def cart_api_view(request):
 # Endpoint: /restaurant/cart
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle, CartRateThrottle])
 def cart_view(request):
     user = request.user
     
     if not user.is_authenticated:
         return redirect('settings.LOGIN_URL') # Redirect to login for unauthenticated users
     
-    cart_items = Cart.objects.filter(user=user)
-    cart_subtotal = sum(item.price for item in cart_items)
-    cart_price_after_tax = cart_subtotal * Decimal(1.1)
+    cart_items = Cart.objects.with_details().filter(user=user)
+    cart_subtotal = cart_items.subtotal()
+    cart_price_after_tax = price_after_tax(cart_subtotal)
     
     if request.method == 'POST':
         if 'update_cart' in request.POST:
@@ -1409,14 +1638,13 @@ def cart_view(request):
                 try:
                     menuitem = MenuItem.objects.get(title=menuitem_title)
                     cart_item = Cart.objects.get(user=user, menuitem=menuitem)
-                    if new_quantity <= menuitem.inventory:
-                        cart_item.quantity = new_quantity
-                        cart_item.save()
-                        messages.success(request, f"Quantity of {menuitem.title} updated to {new_quantity}.")
-                        return redirect('cart_view') # Redirect after successful form processing
-                    else:
-                        messages.error(request, f"Requested quantity exceeds available stock for {menuitem.title}. Available stock: {menuitem.inventory}")
-                        return redirect('cart_view') # Redirect after error message
+                    update_cart(user, {menuitem.id: new_quantity})
+                    messages.success(request, f"Quantity of {menuitem.title} updated to {new_quantity}.")
+                    return redirect('cart_view') # Redirect after successful form processing
+                except OutOfStockError:
+                    # The stock this cart already holds is still available to it
+                    messages.error(request, f"Requested quantity exceeds available stock for {menuitem.title}. Available stock: {menuitem.inventory + cart_item.reserved_quantity}")
+                    return redirect('cart_view') # Redirect after error message
                 except MenuItem.DoesNotExist:
                     messages.error(request, "Menu item not found.")
                     return redirect('cart_view') # Redirect after exception handling
@@ -1428,21 +1656,19 @@ def cart_view(request):
                 return redirect('cart_view') # Redirect after invalid form handling
             
         elif 'remove_selected' in request.POST:
-            selected_items = request.POST.getlist('selected_items')
-            deleted_titles = []
-            for item_id in selected_items:
-                try:
-                    menuitem = MenuItem.objects.get(id=item_id)
-                    cart_item = Cart.objects.get(user=user, menuitem=menuitem)
-                    cart_item.delete()
-                    deleted_titles.append(menuitem.title)
-                except MenuItem.DoesNotExist:
-                    messages.error(request, "Menu item not found.")
-                    return redirect('cart_view') # Redirect after exception handling
-                except Cart.DoesNotExist:
-                    messages.error(request, f"Item '{menuitem.title}' not found in your cart.")
-                    return redirect('cart_view') # Redirect after exception handling
-                    
+            selected_ids = set(request.POST.getlist('selected_items'))
+            selected = [item for item in cart_items if str(item.menuitem_id) in selected_ids]
+            if len(selected) != len(selected_ids):
+                messages.error(request, "Selected item(s) not found in your cart.")
+                return redirect('cart_view') # Redirect after error message
+            
+            try:
+                update_cart(user, remove_ids=[item.menuitem_id for item in selected])
+            except NotInCartError:
+                messages.error(request, "Selected item(s) not found in your cart.")
+                return redirect('cart_view') # Redirect after exception handling
+            deleted_titles = [item.menuitem.title for item in selected]
+            
             if deleted_titles:
                 messages.success(request, f"Removed item(s) from your cart: {', '.join(deleted_titles)}")
             return redirect('cart_view') # Redirect after successful form processing
@@ -1451,9 +1677,8 @@ def cart_view(request):
         form = CartForm()
         
     
-    serializer = CartSerializer(cart_items, many=True, context={'request': request})
     context = {
-        'cart_items': serializer.data,
+        'cart_items': cart_items,
         'cart_subtotal': "{:.2f}".format(cart_subtotal),
         'cart_price_after_tax': "{:.2f}".format(cart_price_after_tax),
         'form': form,
@@ -1464,51 +1689,43 @@ def cart_view(request):
 # Allows only Employees other than Delivery Crew to view all orders. Allows Delivery Crew to view only the orders assigned to them
     # GET: Displays orders, 200
 # Allows only authenticated users to create an order
-    # POST: Creates new order for current user, gets cart items, adds them to the order, then deletes them from the cart for the user, 201
+    # POST: Creates new order for current user from their cart in one transaction, reduces menu item stock, then empties the cart, 201 (409 if an item is out of stock)
 # Endpoint: /restaurant/api/orders
 # View type: Function based, api
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsEmployeeOrAssignedDeliveryCrewOrCustomerOrAdmin])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle, OrderRateThrottle])
 def orders_api_view(request):
     user = request.user
     
     if request.method == 'GET':
-        if user.is_superuser or user.groups.filter(name='Employee').exists():
-            if user.groups.filter(name='Delivery Crew').exists():
+        if user.is_superuser or has_role(user, EMPLOYEE):
+            if has_role(user, DELIVERY_CREW):
                 # Delivery Crew can only view orders assigned to them
-                orders = Order.objects.filter(delivery_crew=user)
+                orders = Order.objects.with_details().filter(delivery_crew=user)
             else:
                 # Employees (excluding Delivery Crew) can view all orders
-                orders = Order.objects.all()
+                orders = Order.objects.with_details()
         else:
             # Customers can view only their own orders
-            orders = Order.objects.filter(user=user)
+            orders = Order.objects.with_details().filter(user=user)
         
-        serializer = OrderSerializer(orders, many=True, context={'request', request})
-        return Response(serializer.data)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(orders, request)
+        serializer = OrderSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
     
     elif request.method == 'POST':
-        cart_items = Cart.objects.filter(user=user)
-        if not cart_items.exists():
+        try:
+            order = place_order(user)
+        except EmptyCartError:
             return Response({"message": "Cart is empty. Please add items to your cart to place an order."}, status=status.HTTP_400_BAD_REQUEST)
+        except OutOfStockError as e:
+            return Response({"message": f"Not enough stock for: {', '.join(e.titles)}. Please update your cart."}, status=status.HTTP_409_CONFLICT)
         
-        total = sum(item.menuitem.price * item.quantity for item in cart_items)
-        order_data = {
-            'user': user.id,
-            'order_status': False,
-            'ready_for_delivery': False,
-            'total': total,
-            'time': timezone.now().date()
-        }
-        serializer = OrderSerializer(data=order_data, context={'request': request})
-        if serializer.is_valid():
-            order = serializer.save()
-            for item in cart_items:
-                OrderItem.objects.create(order=order, menuitem=item.menuitem, quantity=item.quantity)
-            cart_items.delete()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        order = Order.objects.with_details().get(id=order.id)
+        serializer = OrderSerializer(order, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
     
 
 # Allows only Employees other than Delivery Crew to view all orders. Allows Delivery Crew to view only the orders assigned to them
@@ -1518,7 +1735,7 @@ def orders_api_view(request):
 # Endpoint: /restaurant/orders
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def orders_view(request):
     user = request.user
     
@@ -1528,14 +1745,14 @@ def orders_view(request):
         form = OrderSearchForm(request.POST)
         if form.is_valid():
             query = form.cleaned_data['query']
-            if user.is_superuser() or user.groups.filter(name='Employee').exists() and not user.groups.filter(name='Delivery Crew').exists():
-                orders = Order.objects.filter(
+            if is_admin_or_employee_but_not_delivery_crew(user):
+                orders = Order.objects.select_related('user').filter(
                     Q(user__username__icontains=query) |
                     Q(order_status__icontains=query) |
                     Q(delivery_crew__username__icontains=query)
                 )
             else:
-                orders = Order.objects.filter(user=user, user__username__icontains=query)
+                orders = Order.objects.select_related('user').filter(user=user, user__username__icontains=query)
         else:
             messages.error(request, "There was an error with your search.")
             return redirect('orders_view') # Redirect after form processing error
@@ -1545,39 +1762,39 @@ def orders_view(request):
             if not user.is_authenticated:
                 return redirect('settings.LOGIN_URL') # Redirect to login for unauthenticated users
             
-            if not cart_items.exists():
+            # Only placing an order counts against the orders rate, searching the order history doesn't
+            throttled = throttle_response(request, [OrderRateThrottle])
+            if throttled is not None:
+                return throttled
+            
+            try:
+                place_order(user)
+            except EmptyCartError:
                 messages.error(request, "Cart is empty. Please add items to your cart to place an order.")
                 return redirect('orders_view')  # Redirect after exception handling
-        
-            total = sum(item.menuitem.price * item.quantity for item in cart_items)
-            order = Order.objects.create(
-                user=user,
-                order_status=False,
-                ready_for_delivery=False,
-                total=total,
-                time=timezone.now().date()
-            )
-        
-            for item in cart_items:
-                OrderItem.objects.create(order=order, menuitem=item.menuitem, quantity=item.quantity)
-                
-            cart_items.delete()
+            except OutOfStockError as e:
+                messages.error(request, f"Not enough stock for: {', '.join(e.titles)}. Please update your cart.")
+                return redirect('cart_view')  # Redirect after exception handling
+            
             messages.success(request, "Order placed successfully.")
             return redirect('orders_view') # Redirect after successful form processing
             
-        if user.is_superuser or user.groups.filter(name='Employee').exists():
-            if user.groups.filter(name='Delivery Crew').exists():
+        if user.is_superuser or has_role(user, EMPLOYEE):
+            if has_role(user, DELIVERY_CREW):
                 # Delivery Crew can only view orders assigned to them
-                orders = Order.objects.filter(delivery_crew=user)
+                orders = Order.objects.select_related('user').filter(delivery_crew=user)
             else:
                 # Employees (excluding Delivery Crew) can view all orders
-                orders = Order.objects.all()
+                orders = Order.objects.select_related('user')
         else:
             # Customers can view only their own orders
-            orders = Order.objects.filter(user=user)
+            orders = Order.objects.select_related('user').filter(user=user)
         
+    # The order history only shows stored totals, so the order items don't need to be loaded
+    orders, page_links = paginate_for_template(request, orders, OrderCursorPagination)
     context = {
         'orders': orders,
+        'page_links': page_links,
         'form': form,
         'cart_items': cart_items,
     }
@@ -1595,18 +1812,19 @@ def orders_view(request):
     # PATCH: Updates order status, 0 (False, not yet delivered) or 1 (True, delivered), 200
 # Allows only Admin or Managers to delete the order
     # DELETE: Deletes order, 200
+# Status changes are also pushed to /restaurant/api/orders/events streams, see order_events.py
 # Endpoint: /restaurant/api/order
 # View type: Function based, api
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated, IsEmployeeOrAssignedDeliveryCrewOrCustomerOrAdmin])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle])
 def order_details_api_view(request):
     order_id = request.GET.get('order_id')
     
     if not order_id:
         return Response({"message": "Order ID is required."}, status=status.HTTP_400_BAD_REQUEST)
     
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.with_details(), id=order_id)
     user = request.user
     
     if request.method == 'GET':
@@ -1614,10 +1832,12 @@ def order_details_api_view(request):
         return Response(serializer.data)
     
     elif request.method == 'PUT':
-        if not user.groups.filter(name='Delivery Crew').exists():
+        if not has_role(user, DELIVERY_CREW):
+            previous_delivery_crew_id = order.delivery_crew_id
             serializer = OrderSerializer(order, data=request.data, partial=True, context={'request': request})
             if serializer.is_valid():
                 serializer.save()
+                publish_order_update(order, previous_delivery_crew_id)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         else:
@@ -1625,23 +1845,25 @@ def order_details_api_view(request):
         
     elif request.method == 'PATCH':
         if 'ready_for_delivery' in request.data:
-            if not user.groups.filter(name='Delivery Crew').exists():
+            if not has_role(user, DELIVERY_CREW):
                 order.ready_for_delivery = request.data['ready_for_delivery']
                 order.save()
+                publish_order_update(order)
                 return Response({"message": "Order ready-for-delivery status updated."}, status=status.HTTP_200_OK)
             else:
                 return Response({"message": "Delivery Crew cannot update this status."}, status=status.HTTP_403_FORBIDDEN)
             
         if 'order_status' in request.data:
-            if user.groups.filter(name='Manager').exists() or user.groups.filter(name='Delivery Crew').exists() or user.is_superuser:
+            if has_role(user, MANAGER, DELIVERY_CREW) or user.is_superuser:
                 order.order_status = request.data['order_status']
                 order.save()
+                publish_order_update(order)
                 return Response({"message": "Order delivery status updated."}, status=status.HTTP_200_OK)
             else:
                 return Response({"message": "Only Delivery Crew, Managers, or Admin can update delivery status."}, status=status.HTTP_403_FORBIDDEN)
             
     elif request.method == 'DELETE':
-        if user.groups.filter(name='Manager').exists() or user.is_superuser:
+        if is_admin_or_manager(user):
             order.delete()
             return Response({"message": "Order deleted."}, status=status.HTTP_200_OK)
         else:
@@ -1659,10 +1881,11 @@ def order_details_api_view(request):
 # Allows only Admin or Managers to delete the order
     # POST (delete_order): Deletes order
 # Uses .has_permission for conditional auth
+# Status changes are also pushed to /restaurant/api/orders/events streams, see order_events.py
 # Endpoint: /restaurant/order
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def order_details_view(request):
     order_id = request.GET.get('order_id')
     
@@ -1670,7 +1893,7 @@ def order_details_view(request):
         messages.error(request, "Order ID is required.")
         return redirect('orders_view')
     
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.with_details(), id=order_id)
     user = request.user
     
     if not IsEmployeeOrAssignedDeliveryCrewOrCustomerOrAdmin().has_permission(request, view=None):
@@ -1682,13 +1905,14 @@ def order_details_view(request):
             return redirect('settings.LOGIN_URL') # Redirect to login for unauthenticated users
         
         if 'update_order' in request.POST:
-            if user.groups.filter(name='Delivery Crew').exists() and not user.is_superuser:
+            if has_role(user, DELIVERY_CREW) and not user.is_superuser:
                 messages.error(request, "You do not have permission to update this order.")
                 return redirect('order_details_view', order_id=order.id) # Redirect after permission check
             else:
                 form = OrderUpdateForm(request.POST, instance=order)
                 if form.is_valid():
                     form.save()
+                    publish_order_update(order)
                     messages.success(request, "Ready for Delivery status updated successfully.")
                     return redirect('order_details_view', order_id=order.id) # Redirect after successful form processing
                 else:
@@ -1696,7 +1920,7 @@ def order_details_view(request):
                     return redirect('order_details_view', order_id=order.id) # Redirect after form error
                     
         elif 'assign_delivery_crew' in request.POST:
-            if user.groups.filter(name='Delivery Crew').exists() and not user.is_superuser:
+            if has_role(user, DELIVERY_CREW) and not user.is_superuser:
                 messages.error(request, "You do not have permission to assign Delivery Crew to orders.")
                 return redirect('order_details_view', order_id=order.id) # Redirect after permission check
             else:
@@ -1705,12 +1929,14 @@ def order_details_view(request):
                     delivery_crew_username = form.cleaned_data.get('delivery_crew_username')
                     try:
                         delivery_crew = User.objects.get(username=delivery_crew_username)
-                        if not delivery_crew.groups.filter(name='Delivery Crew').exists():
+                        if not has_role(delivery_crew, DELIVERY_CREW):
                             messages.error(request, "User is not a Delivery Crew member.")
                             return redirect('order_details_view', order_id=order.id) # Redirect after validation check
                         else:
+                            previous_delivery_crew_id = order.delivery_crew_id
                             order.delivery_crew = delivery_crew
                             order.save()
+                            publish_order_update(order, previous_delivery_crew_id)
                             messages.success(request, "Delivery Crew assigned successfully.")
                             return redirect('order_details_view', order_id=order.id) # Redirect after successful form processing
                     except User.DoesNotExist:
@@ -1721,10 +1947,11 @@ def order_details_view(request):
                     return redirect('order_details_view', order_id=order.id) # Redirect after form processing error
             
         elif 'order_status' in request.POST:
-            if user.groups.filter(name='Manager').exists() or user.groups.filter(name='Delivery Crew').exists() or user.is_superuser:
+            if has_role(user, MANAGER, DELIVERY_CREW) or user.is_superuser:
                 form = OrderUpdateForm(request.POST, instance=order)
                 if form.is_valid():
                     form.save()
+                    publish_order_update(order)
                     messages.success(request, "Order delivery status updated successfully.")
                     return redirect('order_details_view', order_id=order.id) # Redirect after successful form processing
                 else:
@@ -1735,7 +1962,7 @@ def order_details_view(request):
                 return redirect('order_details_view', order_id=order.id) # Redirect after permission check
         
         elif 'delete_order' in request.POST:
-            if user.groups.filter(name='Manager').exists() or user.is_superuser:
+            if is_admin_or_manager(user):
                 order.delete()
                 messages.success(request, "Order deleted successfully.")
                 return redirect('orders_view') # Redirect after successful form processing
@@ -1757,38 +1984,32 @@ def order_details_view(request):
     return render(request, 'order_details_view.html', context)
 
 
-# Business hours dictionary with days as keys and tuples of open and close hours as values
-BUSINESS_HOURS = {
-    0: (11, 21), # Monday
-    1: (11, 21), # Tuesday
-    2: (11, 21), # Wednesday
-    3: (11, 21), # Thursday
-    4: (11, 21), # Friday
-    5: (11, 22), # Saturday
-    6: (12, 20) # Sunday
-}
-
-
 # Allows anyone to book a reservation during business hours (up to 1 hour before close)
     # POST: Creates a booking, 201
-# Endpoint: /restaurant/api/bookings
+    # When the slot is full: with "waitlist": true the booking is waitlisted, 202, otherwise it's rejected with the next available slots, 409
+# Endpoint: /restaurant/api/booking
 # View type: Function based, api
 @api_view(['POST'])
 @permission_classes([AllowAny])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle])
 def booking_api_view(request):
     serializer = BookingSerializer(data=request.data)
     if serializer.is_valid():
         booking_date = serializer.validated_data['booking_date']
-        day_of_week = booking_date.weekday()
-        open_hour, close_hour = BUSINESS_HOURS[day_of_week]
         
-        if not open_hour <= booking_date.hour < close_hour -1:
+        if not is_bookable(booking_date):
             return Response(
                 {"message": "Bookings can only be made during business hours and up to an hour before closing."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        serializer.save()
+        try:
+            serializer.save()
+        except SlotFullError as e:
+            if str(request.data.get('waitlist', '')).lower() in ('1', 'true', 'yes'):
+                serializer.save(reservation_status=WAITLISTED)
+                return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+            next_slots = next_available_slots(serializer.validated_data['no_of_guests'], serializer.validated_data.get('location'), after=booking_date, limit=3)
+            return Response({"message": str(e), "next_available": next_slots}, status=status.HTTP_409_CONFLICT)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1796,10 +2017,10 @@ def booking_api_view(request):
 # Allows anyone to view the booking page
     # GET: Displays booking page
 # Allows anyone to book a reservation during business hours (up to 1 hour before close)
-    # POST: Creates a reservation
+    # POST: Creates a reservation, or waitlists it if the slot is full and the waitlist box is ticked
 # Endpoint: /restaurant/bookings
 # View type: Function based, HTML
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def booking_view(request):
     form = BookingForm()
     
@@ -1807,17 +2028,25 @@ def booking_view(request):
         form = BookingForm(request.POST)
         if form.is_valid():
             booking_date = form.cleaned_data['booking_date']
-            day_of_week = booking_date.weekday()
-            
-            open_hour, close_hour = BUSINESS_HOURS[day_of_week]
             
-            if not (open_hour <= booking_date.hour < close_hour - 1):
+            if not is_bookable(booking_date):
                 messages.error(request, "Bookings can only be made during business hours and up to an hour before closing.")
                 return redirect('booking_view') # Redirect after validation check
-            else:
+            
+            try:
                 form.save()
                 messages.success(request, "Booking made successfully.")
-                return redirect('reservation_details_view') # Redirect after successful form processing
+            except SlotFullError as e:
+                if 'waitlist' not in request.POST:
+                    next_slots = next_available_slots(form.cleaned_data['no_of_guests'], location=form.cleaned_data['location'], after=booking_date, limit=3)
+                    times = ', '.join(f"{timezone.localtime(slot['slot']):%a %b %d %I:%M %p}" for slot in next_slots)
+                    messages.error(request, f"{e} Next available: {times or 'none in the next month'}.")
+                    return redirect('booking_view') # Redirect after capacity check
+                booking = form.save(commit=False)
+                booking.reservation_status = WAITLISTED
+                booking.save()
+                messages.success(request, "That time is full, you've been added to the waitlist.")
+            return redirect('reservation_details_view') # Redirect after successful form processing
         else:
             messages.error(request, "There was an error with your booking.")
             return redirect('booking_view') # Redirect after form processing error
@@ -1833,19 +2062,80 @@ def booking_view(request):
     return render(request, 'booking_view.html', context)
 
 
+# Allows anyone to see every bookable slot and the seats it has left, so times can be picked before booking
+    # GET: ?from=YYYY-MM-DD (default today), ?to=YYYY-MM-DD (default a week from from), ?location=<slug> (default the main location)
+    # Returns {location, seats, days: [{date, slots: [{slot, remaining}]}]}, 200
+# Endpoint: /restaurant/api/booking/availability
+# View type: Function based, api
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([DefaultRateThrottle])
+def availability_api_view(request):
+    try:
+        first_day = date.fromisoformat(request.query_params['from']) if 'from' in request.query_params else timezone.localdate()
+        last_day = date.fromisoformat(request.query_params['to']) if 'to' in request.query_params else first_day + timedelta(days=6)
+    except ValueError:
+        return Response({"message": "Dates must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if first_day > last_day or (last_day - first_day).days >= MAX_AVAILABILITY_DAYS:
+        return Response({"message": f"'from' must be on or before 'to', and at most {MAX_AVAILABILITY_DAYS} days apart."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if 'location' in request.query_params:
+        location = Location.objects.filter(slug=request.query_params['location']).first()
+    else:
+        location = Location.objects.order_by('id').first()
+    if location is None:
+        return Response({"message": "Location not found."}, status=status.HTTP_404_NOT_FOUND)
+    
+    first_day = max(first_day, timezone.localdate())
+    days = availability(location, first_day, last_day) if first_day <= last_day else []
+    return Response({"location": location.slug, "seats": location.seats, "days": days}, status=status.HTTP_200_OK)
+
+
+# Allows anyone to find the next times with room for their party
+    # GET: ?guests= (default 2), ?location=<slug> (default the main location), ?after=<ISO datetime> (default now), ?limit= (default 5, up to 20)
+    # Returns [{slot, location, remaining}], soonest first, 200
+# Endpoint: /restaurant/api/booking/next-available
+# View type: Function based, api
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([DefaultRateThrottle])
+def next_available_api_view(request):
+    try:
+        guests = int(request.query_params.get('guests', 2))
+        limit = min(int(request.query_params.get('limit', 5)), 20)
+        after = datetime.fromisoformat(request.query_params['after']) if 'after' in request.query_params else timezone.now()
+    except ValueError:
+        return Response({"message": "guests and limit must be numbers and after an ISO date/time."}, status=status.HTTP_400_BAD_REQUEST)
+    if guests < 1 or limit < 1:
+        return Response({"message": "guests and limit must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(after):
+        after = timezone.make_aware(after)
+    
+    location = None
+    if 'location' in request.query_params:
+        location = Location.objects.filter(slug=request.query_params['location']).first()
+        if location is None:
+            return Response({"message": "Location not found."}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(next_available_slots(guests, location, after=max(after, timezone.now()), limit=limit), status=status.HTTP_200_OK)
+
+
 # Allows only Admin or Employees (excluding Delivery Crew) to view current reservations that have been made
     # GET: Displays currently booked reservations, 200
 # Endpoint: /restaurant/api/reservations
 # View type: Function based, api
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminOrEmployeeButNotDeliveryCrew])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def reservations_api_view(request):
     bookings = Booking.objects.filter(reservation_status='current')
-    if not bookings.exists():
+    paginator = BookingCursorPagination()
+    page = paginator.paginate_queryset(bookings, request)
+    if not page and not paginator.has_previous:
         return Response({"message": "No current reservations."}, status=status.HTTP_200_OK)
-    serializer = BookingSerializer(bookings, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = BookingSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 
 # Allows only Admin or Employees (excluding Delivery Crew) to view current reservations that have been made
@@ -1854,7 +2144,7 @@ def reservations_api_view(request):
 # Endpoint: /restaurant/reservations
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def reservations_view(request):
     if not IsAdminOrEmployeeButNotDeliveryCrew().has_permission(request, view=None):
         messages.error(request, "You do not have permission to view reservations.")
@@ -1877,9 +2167,10 @@ def reservations_view(request):
     else:
         form = ReservationSearchForm()
     
-    context = {'bookings': bookings, 'form': form}
+    bookings, page_links = paginate_for_template(request, bookings, BookingCursorPagination)
+    context = {'bookings': bookings, 'form': form, 'page_links': page_links}
     
-    if not bookings.exists():
+    if not bookings and not page_links['previous']:
         context['no_reservations_message'] = "No current reservations."
         
     return render(request, 'reservations_view.html', context)
@@ -1891,11 +2182,13 @@ def reservations_view(request):
 # View type: Function based, api
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminOrEmployeeButNotDeliveryCrew])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([StaffRateThrottle])
 def old_reservations_api_view(request):
     bookings = Booking.objects.filter(reservation_status__in=['completed', 'missed'])
-    serializer = BookingSerializer(bookings, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    paginator = OldBookingCursorPagination()
+    page = paginator.paginate_queryset(bookings, request)
+    serializer = BookingSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 
 # Allows only Admin or Employees (excluding Delivery Crew) to view past reservations that have been made (either completed or missed)
@@ -1904,7 +2197,7 @@ def old_reservations_api_view(request):
 # Endpoint: /restaurant/reservations/old
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([StaffRateThrottle])
 def old_reservations_view(request):
     if not IsAdminOrEmployeeButNotDeliveryCrew().has_permission(request, view=None):
         messages.error(request, "You do not have permission to view reservations.")
@@ -1927,7 +2220,8 @@ def old_reservations_view(request):
     else:
         form = ReservationSearchForm()
     
-    context = {'bookings': bookings, 'form': form}
+    bookings, page_links = paginate_for_template(request, bookings, OldBookingCursorPagination)
+    context = {'bookings': bookings, 'form': form, 'page_links': page_links}
     return render(request, 'old_reservations_view.html', context)
 
 
@@ -1941,7 +2235,7 @@ def old_reservations_view(request):
 # View type: Function based, api
 @api_view(['GET', 'POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_classes([DefaultRateThrottle])
 def reservation_details_api_view(request):
     reservation_id = request.GET.get('reservation_id')
     
@@ -1952,13 +2246,13 @@ def reservation_details_api_view(request):
     user = request.user
     
     if request.method == 'GET':
-        if not (user.groups.filter(name='Employee').exclude(name='Delivery Crew').exists() or user.is_superuser or booking.name == user.get_full_name()):
+        if not (has_role(user, EMPLOYEE) or user.is_superuser or booking.name == user.get_full_name()):
             return Response({"message": "You do not have permission to view this reservation."}, status=status.HTTP_403_FORBIDDEN)
         serializer = BookingSerializer(booking)
         return Response(serializer.data)
     
     elif request.method == 'POST':
-        if not (user.groups.filter(name='Employee').exclude(name='Delivery Crew').exists() or user.is_superuser):
+        if not (has_role(user, EMPLOYEE) or user.is_superuser):
             return Response({"message": "You do not have permission to update this reservation."}, status=status.HTTP_403_FORBIDDEN)
         
         reservation_status = request.data.get('reservation_status')
@@ -1966,11 +2260,14 @@ def reservation_details_api_view(request):
             return Response({"message": "Invalid status. Choose either 'completed' or 'missed'."}, status=status.HTTP_400_BAD_REQUEST)
         
         booking.reservation_status = reservation_status
-        booking.save()
+        try:
+            booking.save()
+        except SlotFullError as e:
+            return Response({"message": str(e)}, status=status.HTTP_409_CONFLICT)
         return Response({"message": "Reservation status updated successfully."})
     
     elif request.method == 'DELETE':
-        if not (user.groups.filter(name='Manager').exists() or user.is_superuser):
+        if not is_admin_or_manager(user):
             return Response({"message": "You do not have permission to delete this reservation."}, status=status.HTTP_403_FORBIDDEN)
         
         booking.delete()
@@ -1986,7 +2283,7 @@ def reservation_details_api_view(request):
 # Endpoint: /restaurant/reservation
 # View type: Function based, HTML
 @login_required
-@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@throttle_view([DefaultRateThrottle])
 def reservation_details_view(request):
     reservation_id = request.GET.get('reservation_id')
     
@@ -1997,7 +2294,7 @@ def reservation_details_view(request):
     reservation = get_object_or_404(Booking, id=reservation_id)
     user = request.user
     
-    if not (user.groups.filter(name='Employee').exists() or reservation.user == user or user.is_superuser):
+    if not (has_role(user, EMPLOYEE) or reservation.user == user or user.is_superuser):
         messages.error(request, "You do not have permission to view this reservation.")
         return redirect('index') # Redirect after permission check
     
@@ -2006,10 +2303,14 @@ def reservation_details_view(request):
             return redirect('settings.LOGIN_URL') # Redirect to login for unauthenticated users
         
         if 'reservation_status' in request.POST:
-            if user.groups.filter(name='Employee').exclude(name='Delivery Crew').exists() or user.is_superuser:
+            if has_role(user, EMPLOYEE) or user.is_superuser:
                 form = ReservationStatusForm(request.POST, instance=reservation)
                 if form.is_valid():
-                    form.save()
+                    try:
+                        form.save()
+                    except SlotFullError as e:
+                        messages.error(request, str(e))
+                        return redirect('reservation_details_view', reservation_id=reservation.id) # Redirect after capacity check
                     messages.success(request, "Reservation status updated successfully.")
                     return redirect('reservation_details_view', reservation_id=reservation.id) # Redirect after successful form processing
                 else:
@@ -2020,7 +2321,7 @@ def reservation_details_view(request):
                 return redirect('reservation_details_view', reservation_id=reservation.id)
             
         elif 'remove_selected' in request.POST:
-            if user.groups.filter(name='Manager').exists() or user.is_superuser:
+            if is_admin_or_manager(user):
                 form = DeleteReservationForm(request.POST)
                 if form.is_valid():
                     reservation.delete()